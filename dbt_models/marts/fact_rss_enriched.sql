@@ -1,6 +1,7 @@
 {{ 
   config(
     materialized='incremental',
+    incremental_strategy='merge',
     unique_key='event_id'
   ) 
 }}
@@ -23,11 +24,15 @@ with base as (
         hour(f.published_at) as published_hour
 
     from {{ ref('fact_rss_events') }} f
+
+    -- Step 2: Incremental logic - watermark on load_timestamp (with lookback) instead of
+    -- an event_id NOT IN anti-join over the whole target; merge on event_id absorbs the overlap
+    {% if is_incremental() %}
+    where f.load_timestamp > (
+        select dateadd(hour, -{{ var('lookback_hours', 3) }}, coalesce(max(load_timestamp), '1900-01-01'::timestamp_ltz))
+        from {{ this }}
+    )
+    {% endif %}
 )
 
--- Step 2: Incremental logic
 select * from base
-
-{% if is_incremental() %}
-  where event_id not in (select event_id from {{ this }})
-{% endif %}
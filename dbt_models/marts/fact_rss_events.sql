@@ -1,6 +1,7 @@
 {{ 
     config(
     materialized='incremental',
+    incremental_strategy='merge',
     unique_key='event_id'
     ) 
 }}
@@ -21,6 +22,14 @@ with base as (
         case when c.summary is not null then regexp_count(c.summary, '\\s+') + 1 else 0 end as summary_word_count
 
     from {{ ref('rss_clean') }} c
+
+    {% if is_incremental() %}
+    -- Only articles (re)loaded since the last run, with a lookback for late arrivals
+    where c.load_timestamp > (
+        select dateadd(hour, -{{ var('lookback_hours', 3) }}, coalesce(max(load_timestamp), '1900-01-01'::timestamp_ltz))
+        from {{ this }}
+    )
+    {% endif %}
 )
 
 select
@@ -1,6 +1,8 @@
 {{ config(
     materialized='incremental',
-    unique_key='date_source'
+    incremental_strategy='merge',
+    unique_key='date_source',
+    on_schema_change='append_new_columns'
     ) 
 }}
 
@@ -11,40 +13,54 @@ WITH article_sentiment AS (
         CASE
             WHEN "title_sentiment_label" IS NOT NULL THEN "title_sentiment_label"
             ELSE "summary_sentiment_label"
-        END AS overall_sentiment_label
+        END AS overall_sentiment_label,
+        "scored_at" AS scored_at
     FROM {{ source('rss', 'fact_rss_sentiment') }}
 ),
 
+{% if is_incremental() %}
+-- (date, source) partitions that received newly scored rows since the last run,
+-- including late articles for earlier days and today's still-growing partition
+affected_partitions AS (
+    SELECT DISTINCT date, SOURCE_ID
+    FROM article_sentiment
+    WHERE scored_at > (
+        SELECT COALESCE(MAX(last_scored_at), '1900-01-01'::timestamp_ltz)
+        FROM {{ this }}
+    )
+),
+{% endif %}
+
 daily_overall_sentiment AS (
     SELECT
-        date,
-        SOURCE_ID,
-        SUM(CASE WHEN overall_sentiment_label = 'positive' THEN 1 ELSE 0 END) AS positive_count,
-        SUM(CASE WHEN overall_sentiment_label = 'neutral' THEN 1 ELSE 0 END) AS neutral_count,
-        SUM(CASE WHEN overall_sentiment_label = 'negative' THEN 1 ELSE 0 END) AS negative_count,
+        s.date,
+        s.SOURCE_ID,
+        SUM(CASE WHEN s.overall_sentiment_label = 'positive' THEN 1 ELSE 0 END) AS positive_count,
+        SUM(CASE WHEN s.overall_sentiment_label = 'neutral' THEN 1 ELSE 0 END) AS neutral_count,
+        SUM(CASE WHEN s.overall_sentiment_label = 'negative' THEN 1 ELSE 0 END) AS negative_count,
         COUNT(*) AS total_count,
         ROUND(
-            100.0 * SUM(CASE WHEN overall_sentiment_label = 'positive' THEN 1 ELSE 0 END) / NULLIF(COUNT(*),0),
+            100.0 * SUM(CASE WHEN s.overall_sentiment_label = 'positive' THEN 1 ELSE 0 END) / NULLIF(COUNT(*),0),
             2
         ) AS positive_pct,
         ROUND(
-            100.0 * SUM(CASE WHEN overall_sentiment_label = 'neutral' THEN 1 ELSE 0 END) / NULLIF(COUNT(*),0),
+            100.0 * SUM(CASE WHEN s.overall_sentiment_label = 'neutral' THEN 1 ELSE 0 END) / NULLIF(COUNT(*),0),
             2
         ) AS neutral_pct,
         ROUND(
-            100.0 * SUM(CASE WHEN overall_sentiment_label = 'negative' THEN 1 ELSE 0 END) / NULLIF(COUNT(*),0),
+            100.0 * SUM(CASE WHEN s.overall_sentiment_label = 'negative' THEN 1 ELSE 0 END) / NULLIF(COUNT(*),0),
             2
         ) AS negative_pct,
-        CONCAT(TO_VARCHAR(date), '_', SOURCE_ID) AS date_source
-    FROM article_sentiment
-    GROUP BY date, SOURCE_ID
+        CONCAT(TO_VARCHAR(s.date), '_', COALESCE(s.SOURCE_ID, 'unknown')) AS date_source,
+        MAX(s.scored_at) AS last_scored_at
+    FROM article_sentiment s
+    {% if is_incremental() %}
+    -- Recompute affected partitions in full, so the merged row is the complete aggregate
+    JOIN affected_partitions a
+        ON a.date = s.date
+        AND EQUAL_NULL(a.SOURCE_ID, s.SOURCE_ID)
+    {% endif %}
+    GROUP BY s.date, s.SOURCE_ID
 )
 
 SELECT * FROM daily_overall_sentiment
-
-{% if is_incremental() %}
-WHERE date_source > (
-    SELECT COALESCE(MAX(date_source), '1900-01-01_0') 
-    FROM {{ this }}
-)
-{% endif %}
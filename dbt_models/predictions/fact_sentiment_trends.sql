@@ -1,15 +1,43 @@
 {{ config(
     materialized='incremental',
-    unique_key='date'
+    incremental_strategy='merge',
+    unique_key='date',
+    on_schema_change='append_new_columns'
 ) }}
 
-WITH sentiment_data AS (
+WITH scored AS (
     SELECT
         DATE(published_at) AS date,
         "title_sentiment_label" AS sentiment_label,
-        COUNT(*) AS sentiment_count
+        "scored_at" AS scored_at
     FROM {{ source('rss', 'fact_rss_sentiment') }}
-    GROUP BY DATE(published_at), "title_sentiment_label"
+),
+
+{% if is_incremental() %}
+-- Days that received newly scored rows since the last run (late articles and today's partial day)
+affected_dates AS (
+    SELECT DISTINCT date
+    FROM scored
+    WHERE scored_at > (
+        SELECT COALESCE(MAX(last_scored_at), '1900-01-01'::timestamp_ltz)
+        FROM {{ this }}
+    )
+),
+{% endif %}
+
+sentiment_data AS (
+    SELECT
+        s.date,
+        s.sentiment_label,
+        COUNT(*) AS sentiment_count,
+        MAX(s.scored_at) AS last_scored_at
+    FROM scored s
+    {% if is_incremental() %}
+    -- Recompute affected days in full, so the merged row is the complete aggregate
+    JOIN affected_dates a
+        ON a.date = s.date
+    {% endif %}
+    GROUP BY s.date, s.sentiment_label
 ),
 
 daily_sentiment AS (
@@ -30,13 +58,10 @@ daily_sentiment AS (
         ROUND(
             100.0 * SUM(CASE WHEN sentiment_label = 'negative' THEN sentiment_count ELSE 0 END) / NULLIF(SUM(sentiment_count), 0),
             2
-        ) AS negative_pct
+        ) AS negative_pct,
+        MAX(last_scored_at) AS last_scored_at
     FROM sentiment_data
     GROUP BY date
 )
 
 SELECT * FROM daily_sentiment
-
-{% if is_incremental() %}
-WHERE date > (SELECT COALESCE(MAX(date), '1900-01-01') FROM {{ this }})
-{% endif %}
@@ -1,17 +1,48 @@
 {{ config(
     materialized='incremental',
-    unique_key='date_source'
+    incremental_strategy='merge',
+    unique_key='date_source',
+    on_schema_change='append_new_columns'
     )
 }}
 
-WITH sentiment_data AS (
+WITH scored AS (
     SELECT
         DATE(PUBLISHED_AT) AS date,
         SOURCE_ID,
         "title_sentiment_label" AS sentiment_label,
-        COUNT(*) AS sentiment_count
+        "scored_at" AS scored_at
     FROM {{ source('rss', 'fact_rss_sentiment') }}
-    GROUP BY DATE(PUBLISHED_AT), SOURCE_ID, "title_sentiment_label"
+),
+
+{% if is_incremental() %}
+-- (date, source) partitions that received newly scored rows since the last run,
+-- including late articles for earlier days and today's still-growing partition
+affected_partitions AS (
+    SELECT DISTINCT date, SOURCE_ID
+    FROM scored
+    WHERE scored_at > (
+        SELECT COALESCE(MAX(last_scored_at), '1900-01-01'::timestamp_ltz)
+        FROM {{ this }}
+    )
+),
+{% endif %}
+
+sentiment_data AS (
+    SELECT
+        s.date,
+        s.SOURCE_ID,
+        s.sentiment_label,
+        COUNT(*) AS sentiment_count,
+        MAX(s.scored_at) AS last_scored_at
+    FROM scored s
+    {% if is_incremental() %}
+    -- Recompute affected partitions in full, so the merged row is the complete aggregate
+    JOIN affected_partitions a
+        ON a.date = s.date
+        AND EQUAL_NULL(a.SOURCE_ID, s.SOURCE_ID)
+    {% endif %}
+    GROUP BY s.date, s.SOURCE_ID, s.sentiment_label
 ),
 
 daily_source_sentiment AS (
@@ -34,16 +65,10 @@ daily_source_sentiment AS (
             100.0 * SUM(CASE WHEN sentiment_label = 'negative' THEN sentiment_count ELSE 0 END) / NULLIF(SUM(sentiment_count),0),
             2
         ) AS negative_pct,
-        CONCAT(TO_VARCHAR(date), '_', SOURCE_ID) AS date_source
+        CONCAT(TO_VARCHAR(date), '_', COALESCE(SOURCE_ID, 'unknown')) AS date_source,
+        MAX(last_scored_at) AS last_scored_at
     FROM sentiment_data
     GROUP BY date, SOURCE_ID
 )
 
 SELECT * FROM daily_source_sentiment
-
-{% if is_incremental() %}
-WHERE date_source > (
-    SELECT COALESCE(MAX(date_source), '1900-01-01_0') 
-    FROM {{ this }}
-)
-{% endif %}
@@ -1,18 +1,34 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    incremental_strategy='merge',
+    unique_key='base_key',
+    on_schema_change='append_new_columns'
+) }}
 
 with src as (
     select *
     from {{ source('rss', 'rss_staging') }}
+
+    {% if is_incremental() %}
+    -- Only rows Snowpipe loaded since the last run, with a lookback for late-committing loads
+    where load_timestamp > (
+        select dateadd(hour, -{{ var('lookback_hours', 3) }}, coalesce(max(load_timestamp), '1900-01-01'::timestamp_ltz))
+        from {{ this }}
+    )
+    {% endif %}
 ),
 
 flattened as (
     select
+        -- One row per staged message; lets the lookback window be re-merged without duplicates
+        md5(concat_ws('|', coalesce(id, ''), coalesce(rss_entry:link::string, ''), to_varchar(load_timestamp))) as base_key,
         id,
         rss_entry:link::string       as link,
         coalesce(try_to_timestamp_tz(rss_entry:"published"::string), load_timestamp) as published_at,
         rss_entry:source::string     as source,
         rss_entry:summary::string    as summary_html,
         rss_entry:title::string      as title,
+        rss_entry:near_duplicate_of::string as near_duplicate_of,   -- set by the producer (NEAR_DUP_MODE=tag)
         load_timestamp
     from src
 )
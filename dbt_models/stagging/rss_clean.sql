@@ -1,7 +1,22 @@
-{{ config(materialized='table') }}
+{{ config(
+    materialized='incremental',
+    incremental_strategy='merge',
+    unique_key='clean_id'
+) }}
 
 with base as (
     select * from {{ ref('rss_base') }}
+    where link is not null
+      -- Syndicated copies tagged by the producer: the original article is kept and scored once
+      and near_duplicate_of is null
+
+    {% if is_incremental() %}
+    -- New rows only (plus lookback); the dedup window below then runs over this slice, not the history
+    and load_timestamp > (
+        select dateadd(hour, -{{ var('lookback_hours', 3) }}, coalesce(max(load_timestamp), '1900-01-01'::timestamp_ltz))
+        from {{ this }}
+    )
+    {% endif %}
 ),
 
 deduped as (
@@ -25,4 +40,5 @@ cleaned as (
     where rn = 1
 )
 
+-- merge on clean_id: a newer load of a known link replaces the stored row, as the full rebuild did
 select * from cleaned
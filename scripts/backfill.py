@@ -0,0 +1,315 @@
+"""
+Parallel backfill / reprocessing of archived raw batches into partitioned Parquet
+
+    python backfill.py --start 2025-01-01 --end 2025-03-31 --source-dir local_bucket --output backfill_out
+    python backfill.py --start 2025-01-01 --end 2025-01-07 --bucket my-bucket --output backfill_out --distilbert
+
+- Lists raw_rss_feed/<date>/rss_batch_* objects for every day in the range, both the legacy JSON
+  arrays (rss_batch_*_part*.json) and the gzip NDJSON files of batch_sink.py (partitioned workers included)
+- Parses files on a process pool; the next day's files are parsed while the current day is scored
+- Normalizes records the way rss_base / rss_clean do (HTML stripped from the summary, published
+  parsed with the load time as fallback, clean_id = md5(link)) and keeps the latest load of every
+  link: days are processed newest first, so the first time a link is seen is its latest load;
+  near-duplicates tagged by the producer are skipped, as rss_clean does
+- Dedup spans the whole output directory, so separate runs compose: links already in newer partitions
+  are skipped, older partitions lose the rows this run supersedes, and a day left without rows has
+  its partition removed
+- Scores titles and summaries with the memoized, multi-process TextBlob SentimentEngine
+  (same columns and labels as rss_sentiment.py); --distilbert adds rss_ml predictions via the prediction cache
+- Writes <output>/load_date=YYYY-MM-DD/part-00000.parquet, replacing the partition atomically, so
+  re-running a range is idempotent. Bulk load e.g. with
+      COPY INTO <table> FROM @<stage>/ FILE_FORMAT = (TYPE = PARQUET) MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import shutil
+import hashlib
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from batch_sink import GCSBackend, LocalDirBackend
+from sentiment_engine import SentimentEngine, label_scores
+import metrics
+
+# -----------------------------
+# Backfill Configuration
+# -----------------------------
+RAW_FOLDER = "raw_rss_feed"
+FILE_PREFIX = "rss_batch"         # replays (rss_replay_*) repeat archived messages and are skipped
+PARSE_WORKERS = os.cpu_count() or 1
+PARQUET_COMPRESSION = "snappy"
+OUTPUT_FILE = "part-00000.parquet"
+
+FILE_NAME_TIME = re.compile(r"_(\d{8}T\d{6})_part")      # rss_batch[_pN]_20250101T120000_part3...
+LEGACY_FILE_TIME = re.compile(r"_(\d{8}_\d{6})")         # upload_to_gcs(): rss_batch_20250101_120000_part3.json
+PARTITION_DIR = re.compile(r"^load_date=(\d{4}-\d{2}-\d{2})$")
+HTML_TAG = re.compile(r"<[^>]+>")
+
+FILES_PARSED = metrics.counter("backfill_files_total", "Archived raw files parsed")
+ROWS_WRITTEN = metrics.counter("backfill_rows_total", "Deduplicated rows written to Parquet")
+
+# -----------------------------
+# Listing
+# -----------------------------
+def date_range(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+def list_day(backend, day, folder=RAW_FOLDER):
+    names = []
+    for name in backend.list(f"{folder}/{day.isoformat()}/"):
+        file_name = name.rsplit("/", 1)[-1]
+        if file_name.startswith(FILE_PREFIX) and file_name.endswith((".json", ".ndjson.gz")):
+            names.append(name)
+    return names
+
+# -----------------------------
+# Parsing and normalization (runs in the worker processes)
+# -----------------------------
+def file_load_time(object_name, day):
+    file_name = object_name.rsplit("/", 1)[-1]
+    match = FILE_NAME_TIME.search(file_name)
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+    match = LEGACY_FILE_TIME.search(file_name)
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").replace(tzinfo=timezone.utc)
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def parse_published(value, fallback):
+    if not value:
+        return fallback
+    try:
+        parsed = parsedate_to_datetime(value)          # RSS: RFC 822 dates
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))   # Atom: ISO 8601
+        except ValueError:
+            return fallback
+    return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def read_messages(backend, object_name):
+    with backend.open(object_name) as raw:
+        if object_name.endswith(".gz"):
+            with gzip.open(raw, "rt", encoding="utf-8") as lines:
+                return [json.loads(line) for line in lines if line.strip()]
+        return json.load(raw)
+
+def normalize(message, load_time):
+    entry = message.get("rss_entry") or {}
+    link = entry.get("link")
+    if not link or entry.get("near_duplicate_of"):
+        return None
+    summary_html = entry.get("summary")
+    return {
+        "clean_id": hashlib.md5(link.encode("utf-8")).hexdigest(),
+        "msg_id": message.get("msg_id"),
+        "link": link,
+        "title": entry.get("title"),
+        "summary": HTML_TAG.sub("", summary_html) if summary_html else summary_html,
+        "source": entry.get("source"),
+        "published_at": parse_published(entry.get("published"), load_time),
+        "load_timestamp": load_time,
+    }
+
+_backend = None
+
+def _init_worker(backend):
+    # One backend (and storage client) per worker process instead of one per file
+    global _backend
+    _backend = backend
+
+def parse_file(task):
+    object_name, day = task
+    load_time = file_load_time(object_name, day)
+    rows = []
+    for message in read_messages(_backend, object_name):
+        row = normalize(message, load_time)
+        if row is not None:
+            rows.append(row)
+    return rows
+
+# -----------------------------
+# Dedup, scoring and output
+# -----------------------------
+def dedupe_latest(rows, seen):
+    """Keep the latest load of every link not yet in `seen` (links of newer days); updates `seen`."""
+    rows.sort(key=lambda row: row["load_timestamp"], reverse=True)
+    kept = []
+    for row in rows:
+        if row["clean_id"] not in seen:
+            seen.add(row["clean_id"])
+            kept.append(row)
+    return kept
+
+def score(df, engine, distilbert=None):
+    df["title_sentiment_score"] = engine.polarity(df["title"].tolist())
+    df["summary_sentiment_score"] = engine.polarity(df["summary"].tolist())
+    df["title_sentiment_label"] = label_scores(df["title_sentiment_score"].to_numpy())
+    df["summary_sentiment_label"] = label_scores(df["summary_sentiment_score"].to_numpy())
+    if distilbert is not None:
+        import rss_ml
+        cache, model = distilbert["cache"], distilbert["model"]
+        texts = rss_ml.article_texts(df["title"], df["summary"])
+        results, distilbert["model"] = rss_ml.predict(texts, cache, model)
+        df["predicted_sentiment"] = [r["label"].upper() for r in results]
+        df["confidence"] = [r["score"] for r in results]
+    return df
+
+def partition_path(output_dir, day):
+    return os.path.join(output_dir, f"load_date={day.isoformat()}")
+
+def list_partitions(output_dir):
+    """Return {day: partition directory} of the partitions already written to `output_dir`."""
+    partitions = {}
+    for name in os.listdir(output_dir):
+        match = PARTITION_DIR.match(name)
+        if match and os.path.exists(os.path.join(output_dir, name, OUTPUT_FILE)):
+            partitions[date.fromisoformat(match.group(1))] = os.path.join(output_dir, name)
+    return partitions
+
+def read_partition(partition, columns=None):
+    return pq.read_table(os.path.join(partition, OUTPUT_FILE), columns=columns)
+
+def write_table(table, output_dir, day):
+    partition = partition_path(output_dir, day)
+    tmp_partition = f"{partition}.tmp"
+    shutil.rmtree(tmp_partition, ignore_errors=True)
+    os.makedirs(tmp_partition)
+    pq.write_table(table, os.path.join(tmp_partition, OUTPUT_FILE), compression=PARQUET_COMPRESSION)
+    # Swap the finished partition in, so a rerun never leaves a half-written day behind
+    shutil.rmtree(partition, ignore_errors=True)
+    os.replace(tmp_partition, partition)
+    return partition
+
+def write_partition(df, output_dir, day):
+    return write_table(pa.Table.from_pandas(df, preserve_index=False), output_dir, day)
+
+def clear_partition(output_dir, day):
+    shutil.rmtree(partition_path(output_dir, day), ignore_errors=True)
+
+def drop_superseded(partitions, seen, output_dir):
+    """Remove the rows of `partitions` (older days) whose link a newer load in `seen` replaced; returns rows removed."""
+    if not seen:
+        return 0
+    value_set = pa.array(sorted(seen))
+    removed = 0
+    for day, partition in sorted(partitions.items()):
+        table = read_partition(partition)
+        keep = pc.invert(pc.is_in(table["clean_id"], value_set=value_set))
+        kept = table.filter(keep)
+        if kept.num_rows == table.num_rows:
+            continue
+        removed += table.num_rows - kept.num_rows
+        if kept.num_rows:
+            write_table(kept, output_dir, day)
+        else:
+            clear_partition(output_dir, day)
+        print(f"♻️ {day}: removed {table.num_rows - kept.num_rows} rows superseded by newer loads")
+    return removed
+
+# -----------------------------
+# Run
+# -----------------------------
+def run_backfill(backend, start, end, output_dir, workers=PARSE_WORKERS, distilbert=False, folder=RAW_FOLDER):
+    """
+    Reprocess every day in [start, end] into `output_dir`, deduplicated against the partitions already
+    there; returns {"files", "rows_in", "rows_out", "rows_superseded", "seconds"}.
+    """
+    started = time.perf_counter()
+    days = list(date_range(start, end))[::-1]          # newest first: first sighting = latest load
+    os.makedirs(output_dir, exist_ok=True)
+    existing = list_partitions(output_dir)
+    # Links in newer partitions (earlier runs) already have a later load than anything in this range
+    seen = set()
+    for day, partition in existing.items():
+        if day > end:
+            seen.update(read_partition(partition, ["clean_id"])["clean_id"].to_pylist())
+    run_seen = set()
+    stats = {"files": 0, "rows_in": 0, "rows_out": 0, "rows_superseded": 0}
+    engine = SentimentEngine(workers=workers)
+    model_state = None
+    if distilbert:
+        import rss_ml
+        from prediction_cache import PredictionCache
+        model_state = {"cache": PredictionCache(rss_ml.MODEL_ID), "model": None}
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(backend,)) as pool:
+        def submit(day):
+            names = list_day(backend, day, folder)
+            return names, pool.map(parse_file, [(name, day) for name in names])
+
+        pending = submit(days[0]) if days else None
+        try:
+            for index, day in enumerate(days):
+                names, parsed = pending
+                rows = [row for file_rows in parsed for row in file_rows]
+                # Parse the next day on the pool while this one is deduplicated, scored and written
+                pending = submit(days[index + 1]) if index + 1 < len(days) else None
+
+                FILES_PARSED.inc(len(names))
+                stats["files"] += len(names)
+                stats["rows_in"] += len(rows)
+                kept = dedupe_latest(rows, seen)
+                run_seen.update(row["clean_id"] for row in kept)
+                if not kept:
+                    # Every link has a newer load: drop what an earlier run wrote for this day
+                    clear_partition(output_dir, day)
+                    print(f"✅ {day}: {len(names)} files, {len(rows)} records -> 0 rows")
+                    continue
+                df = score(pd.DataFrame(kept), engine, model_state)
+                write_partition(df, output_dir, day)
+                ROWS_WRITTEN.inc(len(df))
+                stats["rows_out"] += len(df)
+                print(f"✅ {day}: {len(names)} files, {len(rows)} records -> {len(df)} rows")
+        finally:
+            engine.close()
+            if model_state:
+                model_state["cache"].close()
+
+    stats["rows_superseded"] = drop_superseded(
+        {day: partition for day, partition in existing.items() if day < start}, run_seen, output_dir
+    )
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill archived raw RSS batches into partitioned Parquet.")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, required=True, help="last day (YYYY-MM-DD)")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--source-dir", help="local directory with the bucket layout (LocalDirBackend)")
+    source.add_argument("--bucket", help="GCS bucket name")
+    parser.add_argument("--service-account-file", default=os.getenv("GCP_SERVICE_ACCOUNT_FILE"))
+    parser.add_argument("--folder", default=RAW_FOLDER)
+    parser.add_argument("--output", required=True, help="output directory for load_date=... partitions")
+    parser.add_argument("--workers", type=int, default=PARSE_WORKERS, help="parse and TextBlob worker processes")
+    parser.add_argument("--distilbert", action="store_true", help="also score with DistilBERT (rss_ml.py)")
+    args = parser.parse_args(argv)
+    if args.end < args.start:
+        parser.error("--end is before --start")
+
+    metrics.init_from_env()
+    backend = LocalDirBackend(args.source_dir) if args.source_dir else \
+        GCSBackend(args.bucket, args.service_account_file)
+    stats = run_backfill(backend, args.start, args.end, args.output, args.workers, args.distilbert, args.folder)
+    rate = stats["rows_in"] / stats["seconds"] if stats["seconds"] else 0
+    print(f"🎯 Backfill finished: {stats['files']} files, {stats['rows_in']} records -> {stats['rows_out']} rows "
+          f"({stats['rows_superseded']} older rows superseded) in {stats['seconds']}s ({rate:,.0f} records/s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
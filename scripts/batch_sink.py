@@ -0,0 +1,288 @@
+"""
+Streaming, gzip-compressed NDJSON sink for mq_consumer.py
+
+- Records are serialized once, straight into a gzip spool file (one compact JSON object per line)
+- Files roll by compressed size or age instead of a fixed message count, so Snowpipe sees fewer, larger files
+- One storage client per process (GCSBackend), created on first use and reused for every upload
+- LocalDirBackend writes the same object layout to a directory for offline runs and tests
+- OrderedUploader uploads sealed files on a bounded thread pool and reports them back
+  in the order they were sealed, so callers can ack/checkpoint only after a durable write
+"""
+
+import os
+import gzip
+import json
+import time
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime
+import metrics
+
+# -----------------------------
+# Sink Configuration
+# -----------------------------
+ROLL_MAX_BYTES = 64 * 1024 * 1024     # roll once the compressed file reaches this size
+ROLL_MAX_AGE = 15 * 60                # ... or once its first record is this old (seconds)
+SPOOL_DIR = "sink_spool"              # local staging area for files being written
+FILE_PREFIX = "rss_batch"
+FILE_SUFFIX = ".ndjson.gz"
+UPLOAD_WORKERS = 2                    # concurrent uploads
+UPLOAD_RETRY_DELAY = 5                # first retry delay (seconds), doubled up to UPLOAD_RETRY_MAX
+UPLOAD_RETRY_MAX = 300
+UPLOAD_STOP_GRACE = 30                # after a drain timeout, seconds running attempts get before being left behind
+
+UPLOAD_FAILURES = metrics.counter("sink_upload_failures_total", "Failed upload attempts (retried)")
+
+# -----------------------------
+# Storage backends
+# -----------------------------
+class GCSBackend:
+    def __init__(self, bucket_name, service_account_file=None):
+        self.bucket_name = bucket_name
+        self.service_account_file = service_account_file
+        self._bucket = None
+
+    def _get_bucket(self):
+        if self._bucket is None:
+            from google.cloud import storage
+            from google.oauth2 import service_account
+            if self.service_account_file:
+                credentials = service_account.Credentials.from_service_account_file(self.service_account_file)
+                client = storage.Client(credentials=credentials)
+            else:
+                client = storage.Client()
+            self._bucket = client.bucket(self.bucket_name)
+        return self._bucket
+
+    def __getstate__(self):
+        # The storage client is not picklable; a copy sent to another process creates its own
+        state = dict(self.__dict__)
+        state["_bucket"] = None
+        return state
+
+    def upload_file(self, local_path, object_name):
+        blob = self._get_bucket().blob(object_name)
+        blob.upload_from_filename(local_path, content_type="application/gzip")
+
+    def exists(self, object_name):
+        return self._get_bucket().blob(object_name).exists()
+
+    def list(self, prefix):
+        return [blob.name for blob in self._get_bucket().list_blobs(prefix=prefix)]
+
+    def open(self, object_name):
+        return self._get_bucket().blob(object_name).open("rb")
+
+    def __str__(self):
+        return f"gs://{self.bucket_name}"
+
+class LocalDirBackend:
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, object_name):
+        return os.path.join(self.root, *object_name.split("/"))
+
+    def upload_file(self, local_path, object_name):
+        target = self._path(object_name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_target = f"{target}.tmp"
+        shutil.copyfile(local_path, tmp_target)
+        os.replace(tmp_target, target)
+
+    def exists(self, object_name):
+        return os.path.exists(self._path(object_name))
+
+    def list(self, prefix):
+        names = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                rel = os.path.relpath(os.path.join(dirpath, filename), self.root).replace(os.sep, "/")
+                if rel.startswith(prefix):
+                    names.append(rel)
+        return sorted(names)
+
+    def open(self, object_name):
+        return open(self._path(object_name), "rb")
+
+    def __str__(self):
+        return self.root
+
+# -----------------------------
+# Rolling NDJSON sink
+# -----------------------------
+class SealedFile:
+    def __init__(self, local_path, object_name, records):
+        self.local_path = local_path
+        self.object_name = object_name
+        self.records = records
+
+class NDJSONSink:
+    def __init__(self, backend, folder, spool_dir=SPOOL_DIR, prefix=FILE_PREFIX,
+                 max_bytes=ROLL_MAX_BYTES, max_age=ROLL_MAX_AGE, max_records=None):
+        self.backend = backend
+        self.folder = folder
+        self.spool_dir = spool_dir
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_records = max_records
+        self.part_number = 1
+        self.current_date = datetime.utcnow().date()
+        self._raw = None
+        self._gzip = None
+        self._path = None
+        self._object_name = None
+        self._records = 0
+        self._opened_at = None
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def _open(self):
+        now = datetime.utcnow()
+        if now.date() != self.current_date:
+            self.current_date = now.date()
+            self.part_number = 1
+            print("🔄 Part number reset to 1 for new day.")
+        file_name = f"{self.prefix}_{now.strftime('%Y%m%dT%H%M%S')}_part{self.part_number}{FILE_SUFFIX}"
+        self._object_name = f"{self.folder}/{now.strftime('%Y-%m-%d')}/{file_name}"
+        self._path = os.path.join(self.spool_dir, file_name)
+        self._raw = open(self._path, "wb")
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6)
+        self._records = 0
+        self._opened_at = time.monotonic()
+        self.part_number += 1
+
+    def write(self, record):
+        self.write_raw(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    def write_raw(self, line):
+        # `line` is one already-serialized JSON document without a trailing newline
+        if self._gzip is None:
+            self._open()
+        self._gzip.write(line)
+        self._gzip.write(b"\n")
+        self._records += 1
+
+    @property
+    def records(self):
+        return self._records
+
+    def should_roll(self):
+        if not self._records:
+            return False
+        return (self._raw.tell() >= self.max_bytes
+                or time.monotonic() - self._opened_at >= self.max_age
+                or (self.max_records is not None and self._records >= self.max_records))
+
+    def roll(self):
+        """Close the current spool file and return it as a SealedFile (None if empty)."""
+        if self._gzip is None:
+            return None
+        self._gzip.close()
+        self._raw.close()
+        sealed = SealedFile(self._path, self._object_name, self._records)
+        self._gzip = self._raw = self._path = self._object_name = None
+        self._records = 0
+        if not sealed.records:
+            os.remove(sealed.local_path)
+            return None
+        return sealed
+
+    def upload(self, sealed):
+        self.backend.upload_file(sealed.local_path, sealed.object_name)
+        size_kb = os.path.getsize(sealed.local_path) / 1024
+        os.remove(sealed.local_path)
+        print(f"✅ Uploaded {sealed.object_name} to {self.backend} (records: {sealed.records}, {size_kb:.0f} KiB)")
+
+    def flush(self):
+        sealed = self.roll()
+        if sealed:
+            self.upload(sealed)
+        return sealed
+
+# -----------------------------
+# Background uploads, completed in seal order
+# -----------------------------
+class UploadAborted(Exception):
+    """Raised for a sealed file whose upload was given up by stop(); the file stays in the spool."""
+
+class OrderedUploader:
+    def __init__(self, sink, workers=UPLOAD_WORKERS, max_pending=None):
+        self.sink = sink
+        self.max_pending = max_pending or workers * 2
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sink-upload")
+        self._pending = deque()   # (future, token) in seal order
+        self._stop = threading.Event()
+
+    def _upload_with_retry(self, sealed):
+        delay = UPLOAD_RETRY_DELAY
+        while not self._stop.is_set():
+            try:
+                with metrics.span("sink_upload"):
+                    self.sink.upload(sealed)
+                return sealed
+            except Exception as exc:
+                UPLOAD_FAILURES.inc()
+                # Never drop a sealed file: keep retrying, the unacked window throttles the broker meanwhile
+                print(f"❌ Upload of {sealed.object_name} failed ({exc}), retrying in {delay}s...")
+                if self._stop.wait(delay):
+                    break
+                delay = min(delay * 2, UPLOAD_RETRY_MAX)
+        raise UploadAborted(sealed.local_path)
+
+    def stop(self):
+        """Give up retrying: uploads still failing end with UploadAborted and leave their file in the spool."""
+        self._stop.set()
+
+    def submit(self, sealed, token):
+        """Queue `sealed` for upload; `token` is handed back by completed() once it is durable."""
+        self._pending.append((self._pool.submit(self._upload_with_retry, sealed), token))
+
+    def full(self):
+        return len(self._pending) >= self.max_pending
+
+    def __len__(self):
+        return len(self._pending)
+
+    def completed(self):
+        """Return tokens of uploads finished so far, stopping at the first one still running."""
+        tokens = []
+        while self._pending and self._pending[0][0].done():
+            future, token = self._pending.popleft()
+            future.result()
+            tokens.append(token)
+        return tokens
+
+    def drain(self, timeout=None):
+        """
+        Block until every queued upload is durable and return their tokens in order. With `timeout`,
+        stop retrying once it has passed, give running attempts UPLOAD_STOP_GRACE more seconds, and
+        return the tokens up to the first file that was given up (or is still hanging); the files not
+        returned stay queued (len(self)) and in the spool.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        tokens = []
+        while self._pending:
+            future, token = self._pending[0]
+            try:
+                future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                if self._stop.is_set():
+                    break         # an upload call hangs past the grace period: leave it behind
+                self.stop()
+                deadline = time.monotonic() + UPLOAD_STOP_GRACE
+                continue
+            except UploadAborted:
+                break
+            self._pending.popleft()
+            tokens.append(token)
+        return tokens
+
+    def close(self):
+        self.stop()
+        # Do not wait for uploads a bounded drain left behind: a hung call would block shutdown
+        self._pool.shutdown(wait=not self._pending, cancel_futures=True)
@@ -0,0 +1,418 @@
+"""
+End-to-end pipeline benchmark with local stand-ins (no RabbitMQ, GCS or Snowflake needed)
+
+Runs the real pipeline code against:
+  feeds      : synthetic RSS 2.0 documents served by a local HTTP server (ETag / 304 aware),
+               with a share of stories syndicated across feeds under new links
+  broker     : InMemoryBroker, an append-only stream with the ConfirmedPublisher interface
+  bucket     : LocalDirBackend (batch_sink.py) in a temporary directory
+  warehouse  : SQLite with the tables of RSS_DB_DDL.txt
+
+Stages timed (throughput and per-operation latency):
+  fetch_parse      fetch_feeds + feedparser, cold (200) and warm (304) cycles
+  dedup            LinkIndex.filter_new + near-duplicate screen
+  publish          mq_producer.publish_entries in confirmed batches
+  consume_flush    consumer loop: NDJSON sink, rolls and ordered uploads
+  trends           streaming trend aggregator + trending terms updates
+  load             Snowpipe stand-in: NDJSON files -> RSS_STAGING -> FACT_RSS_ENRICHED
+  sentiment        rss_sentiment.score_sentiment on unscored rows, written to FACT_RSS_SENTIMENT
+
+    python bench_pipeline.py --feeds 20 --items 200 --json bench.json
+    python bench_pipeline.py --json bench.json --baseline previous.json --tolerance 0.2   # exit 1 on regression
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import random
+import shutil
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import threading
+import numpy as np
+from types import SimpleNamespace
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import mq_producer
+from bench_sentiment import synthetic_corpus
+from dedup_store import LinkIndex
+from near_dup import NearDupIndex
+from feed_fetcher import fetch_feeds
+from mq_publisher import message_id_for
+from batch_sink import NDJSONSink, OrderedUploader, LocalDirBackend
+
+# -----------------------------
+# Benchmark Configuration
+# -----------------------------
+DDL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "RSS_DB_DDL.txt")
+RECORDS_PER_FILE = 2000           # consumer roll size (stands in for ROLL_MAX_BYTES at bench scale)
+SENTIMENT_CHUNK_ROWS = 5000
+
+# -----------------------------
+# Synthetic RSS corpus
+# -----------------------------
+def synthetic_feeds(num_feeds, items_per_feed, syndication_ratio=0.1, seed=7):
+    """Return {path: RSS 2.0 XML bytes}; a share of items re-appear in other feeds under new links."""
+    rng = random.Random(seed)
+    corpus = synthetic_corpus(num_feeds * items_per_feed, dup_ratio=0.0, seed=seed)
+    rows = list(zip(corpus["title"], corpus["summary"]))
+    now = datetime.now(timezone.utc)
+    feeds = {}
+    for f in range(num_feeds):
+        items = []
+        for i in range(items_per_feed):
+            title, summary = rows[f * items_per_feed + i]
+            if f and rng.random() < syndication_ratio:
+                title, summary = rows[rng.randrange(f * items_per_feed)]   # syndicated copy
+            published = format_datetime(now - timedelta(minutes=rng.randint(0, 24 * 60)))
+            items.append(
+                f"<item><title>{escape(title)}</title><link>https://feed{f}.example.com/a/{i}</link>"
+                f"<description>{escape(summary)}</description><pubDate>{published}</pubDate></item>"
+            )
+        feeds[f"/feed{f}.xml"] = (
+            f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>Synthetic Feed {f}</title><link>https://feed{f}.example.com/</link>"
+            f"<description>bench</description>{''.join(items)}</channel></rss>"
+        ).encode("utf-8")
+    return feeds
+
+def serve_feeds(feeds):
+    etags = {path: hashlib.md5(body).hexdigest() for path, body in feeds.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = feeds.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == etags[self.path]:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/rss+xml")
+            self.send_header("ETag", etags[self.path])
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# -----------------------------
+# In-memory broker (stream semantics, ConfirmedPublisher interface)
+# -----------------------------
+class InMemoryBroker:
+    def __init__(self):
+        self.log = []             # (properties, body); the list index is the stream offset
+
+    def publish_batch(self, messages, exchange="", routing_key=None):
+        now = int(time.time())
+        for key, body in messages:
+            properties = SimpleNamespace(message_id=message_id_for(key), timestamp=now,
+                                         headers={"x-stream-offset": len(self.log)})
+            self.log.append((properties, body))
+        return [key for key, _ in messages], []
+
+    def deliveries(self, start_offset=0):
+        for offset in range(start_offset, len(self.log)):
+            properties, body = self.log[offset]
+            yield SimpleNamespace(delivery_tag=offset + 1), properties, body
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def close(self):
+        pass
+
+# -----------------------------
+# SQLite warehouse built from RSS_DB_DDL.txt
+# -----------------------------
+TABLE_RE = re.compile(r"create or replace (?:TRANSIENT )?TABLE (\w+) \((.*?)\n\);", re.S | re.I)
+COLUMN_RE = re.compile(r'^\s*("[^"]+"|\w+)\s+(\w+)')
+
+def sqlite_type(snowflake_type, definition):
+    snowflake_type = snowflake_type.upper()
+    if snowflake_type == "NUMBER":
+        return "INTEGER" if re.search(r"NUMBER\(\d+,0\)", definition, re.I) else "REAL"
+    if snowflake_type in ("FLOAT", "DOUBLE"):
+        return "REAL"
+    return "TEXT"
+
+def create_warehouse(path, ddl_file=DDL_FILE):
+    conn = sqlite3.connect(path)
+    with open(ddl_file, "r", encoding="utf-8") as f:
+        ddl = f.read().replace("\r\n", "\n")
+    for table, body in TABLE_RE.findall(ddl):
+        columns = []
+        for line in body.split("\n"):
+            match = COLUMN_RE.match(line)
+            if match:
+                columns.append(f"{match.group(1)} {sqlite_type(match.group(2), line)}")
+        conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+    conn.commit()
+    return conn
+
+# -----------------------------
+# Measurements
+# -----------------------------
+def summarize(items, seconds, latencies=None, **extra):
+    result = {"items": items, "seconds": round(seconds, 4),
+              "items_per_second": round(items / seconds, 1) if seconds > 0 else None}
+    if latencies:
+        lat = np.asarray(latencies) * 1000.0
+        result["latency_ms"] = {"p50": round(float(np.percentile(lat, 50)), 3),
+                                "p95": round(float(np.percentile(lat, 95)), 3),
+                                "max": round(float(lat.max()), 3)}
+    result.update(extra)
+    return result
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+# -----------------------------
+# Stages
+# -----------------------------
+def bench_fetch(urls):
+    feed_cache = {}
+    (entries, fetched), cold_s = timed(mq_producer.fetch_rss_entries, feed_cache, urls)
+    for result in fetched:
+        feed_cache[result["url"]] = result["cache"]
+    warm, warm_s = timed(fetch_feeds, urls, feed_cache)
+    unchanged = sum(1 for r in warm if r["status"] == "not_modified")
+    stage = summarize(len(entries), cold_s, [r["elapsed"] for r in fetched],
+                      feeds=len(urls), warm_seconds=round(warm_s, 4), warm_not_modified=unchanged)
+    return entries, stage
+
+def bench_dedup(entries, workdir):
+    links = LinkIndex(os.path.join(workdir, "links.sqlite"), legacy_json=None)
+    near_dups = NearDupIndex(os.path.join(workdir, "near_dup.sqlite"))
+    started = time.perf_counter()
+    new_entries = links.filter_new(entries)
+    screened = near_dups.screen(new_entries)
+    elapsed = time.perf_counter() - started
+    tagged = sum(1 for _, match in screened if match)
+    publish = [e if m is None else {**e, "near_duplicate_of": m["link"], "near_duplicate_similarity": m["similarity"]}
+               for e, m in screened]
+    return publish, links, near_dups, summarize(len(entries), elapsed, near_duplicates=tagged)
+
+def bench_publish(broker, entries, links, near_dups):
+    latencies = []
+    started = time.perf_counter()
+    confirmed = []
+    for start in range(0, len(entries), mq_producer.PUBLISH_BATCH_SIZE):
+        batch = entries[start:start + mq_producer.PUBLISH_BATCH_SIZE]
+        t0 = time.perf_counter()
+        batch_confirmed, _, _ = mq_producer.publish_entries(broker, batch, start + 1)
+        latencies.append(time.perf_counter() - t0)
+        confirmed.extend(batch_confirmed)
+    links.add_many(confirmed)
+    links.flush()
+    near_dups.add_many(confirmed)
+    return summarize(len(confirmed), time.perf_counter() - started, latencies)
+
+def bench_consume(broker, workdir, records_per_file):
+    backend = LocalDirBackend(os.path.join(workdir, "bucket"))
+    sink = NDJSONSink(backend, "raw_rss_feed", spool_dir=os.path.join(workdir, "spool"),
+                      max_records=records_per_file)
+    uploader = OrderedUploader(sink, workers=2, max_pending=2)
+    sealed_at = {}
+    flush_latencies = []
+    acked = None
+
+    def ack(tokens):
+        nonlocal acked
+        for token in tokens:
+            flush_latencies.append(time.perf_counter() - sealed_at.pop(token))
+            acked = token
+
+    started = time.perf_counter()
+    messages = 0
+    last = None
+    for method, properties, body in broker.deliveries():
+        sink.write_raw(body)
+        last = (method.delivery_tag, properties.headers["x-stream-offset"])
+        messages += 1
+        if sink.should_roll() and not uploader.full():
+            sealed = sink.roll()
+            sealed_at[last] = time.perf_counter()
+            uploader.submit(sealed, last)
+        ack(uploader.completed())
+    sealed = sink.roll()
+    if sealed:
+        sealed_at[last] = time.perf_counter()
+        uploader.submit(sealed, last)
+    ack(uploader.drain())
+    uploader.close()
+    elapsed = time.perf_counter() - started
+    files = backend.list("raw_rss_feed/")
+    return backend, files, summarize(messages, elapsed, flush_latencies, files=len(files), acked_offset=acked[1])
+
+def bench_trends(broker):
+    from trend_aggregator import TrendAggregator
+    from trending_terms import TrendingTerms
+    trends, terms = TrendAggregator(), TrendingTerms()
+    latencies = []
+    started = time.perf_counter()
+    for _, properties, body in broker.deliveries():
+        t0 = time.perf_counter()
+        offset = properties.headers["x-stream-offset"]
+        trends.update_message(body, properties, offset)
+        terms.update_message(body, offset)
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    snapshot = trends.snapshot()
+    return summarize(len(latencies), elapsed, latencies, counted=snapshot["total"])
+
+def bench_load(backend, files, warehouse):
+    started = time.perf_counter()
+    rows = 0
+    for name in files:
+        with backend.open(name) as raw, gzip.open(raw, "rt", encoding="utf-8") as lines:
+            batch = []
+            for line in lines:
+                message = json.loads(line)
+                batch.append((message["msg_id"], json.dumps(message["rss_entry"])))
+            warehouse.executemany(
+                "INSERT INTO RSS_STAGING (ID, RSS_ENTRY, LOAD_TIMESTAMP) VALUES (?, ?, CURRENT_TIMESTAMP)", batch
+            )
+            rows += len(batch)
+    # Stand-in for the dbt staging models: one flattened, deduplicated row per link
+    warehouse.execute("""
+        INSERT INTO FACT_RSS_ENRICHED (EVENT_ID, TITLE, SUMMARY, SOURCE_ID, PUBLISHED_AT, LOAD_TIMESTAMP,
+                                       TITLE_WORD_COUNT, SUMMARY_WORD_COUNT)
+        SELECT lower(hex(json_extract(RSS_ENTRY, '$.link'))), json_extract(RSS_ENTRY, '$.title'),
+               json_extract(RSS_ENTRY, '$.summary'), json_extract(RSS_ENTRY, '$.source'),
+               json_extract(RSS_ENTRY, '$.published'), MAX(LOAD_TIMESTAMP),
+               length(json_extract(RSS_ENTRY, '$.title')) - length(replace(json_extract(RSS_ENTRY, '$.title'), ' ', '')) + 1,
+               length(json_extract(RSS_ENTRY, '$.summary')) - length(replace(json_extract(RSS_ENTRY, '$.summary'), ' ', '')) + 1
+        FROM RSS_STAGING
+        GROUP BY json_extract(RSS_ENTRY, '$.link')
+    """)
+    warehouse.commit()
+    enriched = warehouse.execute("SELECT COUNT(*) FROM FACT_RSS_ENRICHED").fetchone()[0]
+    return summarize(rows, time.perf_counter() - started, enriched_rows=enriched)
+
+def bench_sentiment(warehouse, chunk_rows, workers):
+    import pandas as pd
+    from rss_sentiment import score_sentiment
+    from sentiment_engine import SentimentEngine
+
+    query = """
+        SELECT e.* FROM FACT_RSS_ENRICHED e
+        WHERE NOT EXISTS (SELECT 1 FROM FACT_RSS_SENTIMENT s WHERE s.EVENT_ID = e.EVENT_ID)
+    """
+    engine = SentimentEngine(workers=workers) if workers else SentimentEngine()
+    latencies = []
+    rows = 0
+    started = time.perf_counter()
+    try:
+        for chunk in pd.read_sql_query(query, warehouse, chunksize=chunk_rows):
+            t0 = time.perf_counter()
+            scored = score_sentiment(chunk, engine)
+            scored["scored_at"] = datetime.now(timezone.utc).isoformat()
+            scored.to_sql("FACT_RSS_SENTIMENT", warehouse, if_exists="append", index=False)
+            latencies.append(time.perf_counter() - t0)
+            rows += len(chunk)
+    finally:
+        engine.close()
+    warehouse.commit()
+    return summarize(rows, time.perf_counter() - started, latencies)
+
+# -----------------------------
+# Regression check against a previous result file
+# -----------------------------
+def compare(results, baseline, tolerance):
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or not previous.get("items_per_second") or not current.get("items_per_second"):
+            continue
+        ratio = current["items_per_second"] / previous["items_per_second"]
+        current["vs_baseline"] = round(ratio, 3)
+        if ratio < 1.0 - tolerance:
+            regressions.append(f"{stage}: {current['items_per_second']:,.0f}/s vs "
+                               f"{previous['items_per_second']:,.0f}/s ({ratio:.2f}x)")
+    return regressions
+
+# -----------------------------
+# Main
+# -----------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with local stand-ins.")
+    parser.add_argument("--feeds", type=int, default=20)
+    parser.add_argument("--items", type=int, default=200, help="items per feed")
+    parser.add_argument("--syndication", type=float, default=0.1, help="share of items syndicated from other feeds")
+    parser.add_argument("--records-per-file", type=int, default=RECORDS_PER_FILE)
+    parser.add_argument("--workers", type=int, default=None, help="TextBlob worker processes")
+    parser.add_argument("--workdir", help="keep stand-in state here instead of a temp directory")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="previous --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop vs baseline")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.makedirs(workdir, exist_ok=True)
+    server = serve_feeds(synthetic_feeds(args.feeds, args.items, args.syndication))
+    urls = [f"http://127.0.0.1:{server.server_address[1]}/feed{f}.xml" for f in range(args.feeds)]
+    stages = {}
+    try:
+        entries, stages["fetch_parse"] = bench_fetch(urls)
+        entries, links, near_dups, stages["dedup"] = bench_dedup(entries, workdir)
+        broker = InMemoryBroker()
+        stages["publish"] = bench_publish(broker, entries, links, near_dups)
+        links.close()
+        near_dups.close()
+        backend, files, stages["consume_flush"] = bench_consume(broker, workdir, args.records_per_file)
+        stages["trends"] = bench_trends(broker)
+        warehouse = create_warehouse(os.path.join(workdir, "warehouse.sqlite"))
+        stages["load"] = bench_load(backend, files, warehouse)
+        stages["sentiment"] = bench_sentiment(warehouse, SENTIMENT_CHUNK_ROWS, args.workers)
+        warehouse.close()
+    finally:
+        server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "config": {"feeds": args.feeds, "items_per_feed": args.items, "syndication": args.syndication,
+                   "records_per_file": args.records_per_file, "workers": args.workers},
+        "stages": stages,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+
+    print("\n📊 Pipeline benchmark")
+    for stage, r in stages.items():
+        latency = r.get("latency_ms")
+        latency_text = f"  p50 {latency['p50']:.2f}ms p95 {latency['p95']:.2f}ms" if latency else ""
+        print(f"{stage:<14} {r['items']:>8} items  {r['seconds']:8.3f}s  {r['items_per_second'] or 0:>12,.0f}/s{latency_text}")
+    for regression in regressions:
+        print(f"❌ Regression: {regression}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
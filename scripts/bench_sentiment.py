@@ -0,0 +1,137 @@
+"""
+Benchmark: row-wise TextBlob apply (old rss_sentiment.py path) vs SentimentEngine
+
+Builds a synthetic corpus of RSS-like titles and summaries with a configurable share of
+syndicated repeats, scores it both ways, checks the results match and prints the timings.
+
+    python bench_sentiment.py --rows 20000 --dup-ratio 0.3 --workers 4 [--json results.json]
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import pandas as pd
+from textblob import TextBlob
+from sentiment_engine import SentimentEngine, label_scores
+
+# -------------------------------
+# Synthetic corpus
+# -------------------------------
+SUBJECTS = ["OpenAI", "Google DeepMind", "Meta", "Anthropic", "Nvidia", "A startup", "Researchers",
+            "The EU", "Microsoft", "A new open-source project"]
+VERBS = ["releases", "unveils", "struggles with", "announces", "delays", "criticizes", "wins", "loses",
+         "improves", "abandons"]
+OBJECTS = ["a faster language model", "its vision benchmark", "a controversial chatbot",
+           "an excellent robotics platform", "a terrible safety report", "new GPU clusters",
+           "a disappointing quarterly result", "a brilliant reasoning method", "AI regulation", "layoffs"]
+TAILS = ["amid growing concerns.", "to widespread praise.", "with mixed reactions.", "after months of delays.",
+         "and investors are happy.", "but critics remain worried.", "in a surprising move.", ""]
+
+def synthetic_corpus(rows, dup_ratio, seed=42):
+    rng = random.Random(seed)
+    unique_rows = max(1, int(rows * (1 - dup_ratio)))
+    base = []
+    for _ in range(unique_rows):
+        title = f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)}"
+        summary = " ".join(
+            f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(TAILS)}"
+            for _ in range(rng.randint(2, 5))
+        )
+        base.append((title, summary))
+    # Syndicated copies: same text, sometimes with different surrounding whitespace
+    corpus = list(base)
+    while len(corpus) < rows:
+        title, summary = rng.choice(base)
+        corpus.append((f" {title} " if rng.random() < 0.5 else title, summary))
+    rng.shuffle(corpus)
+    return pd.DataFrame(corpus, columns=["title", "summary"])
+
+# -------------------------------
+# Baseline: the previous row-wise apply path
+# -------------------------------
+def baseline_score(text):
+    if not isinstance(text, str):
+        return 0
+    return TextBlob(text).sentiment.polarity
+
+def baseline_label(score):
+    if score > 0.1:
+        return "positive"
+    elif score < -0.1:
+        return "negative"
+    else:
+        return "neutral"
+
+def run_baseline(df):
+    out = pd.DataFrame(index=df.index)
+    out["title_sentiment_score"] = df["title"].apply(baseline_score)
+    out["summary_sentiment_score"] = df["summary"].apply(baseline_score)
+    out["title_sentiment_label"] = out["title_sentiment_score"].apply(baseline_label)
+    out["summary_sentiment_label"] = out["summary_sentiment_score"].apply(baseline_label)
+    return out
+
+def run_engine(df, engine):
+    out = pd.DataFrame(index=df.index)
+    out["title_sentiment_score"] = engine.polarity(df["title"].tolist())
+    out["summary_sentiment_score"] = engine.polarity(df["summary"].tolist())
+    out["title_sentiment_label"] = label_scores(out["title_sentiment_score"].to_numpy())
+    out["summary_sentiment_label"] = label_scores(out["summary_sentiment_score"].to_numpy())
+    return out
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+# -------------------------------
+# Main
+# -------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark TextBlob apply vs SentimentEngine.")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dup-ratio", type=float, default=0.3, help="share of rows that repeat another row")
+    parser.add_argument("--workers", type=int, default=None, help="engine worker processes (default: all CPUs)")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    df = synthetic_corpus(args.rows, args.dup_ratio)
+    print(f"Corpus: {len(df)} rows, dup ratio {args.dup_ratio}")
+
+    baseline, baseline_s = timed(run_baseline, df)
+    print(f"apply baseline : {baseline_s:8.2f}s  ({len(df) / baseline_s:,.0f} rows/s)")
+
+    engine = SentimentEngine(workers=args.workers) if args.workers else SentimentEngine()
+    try:
+        cold, cold_s = timed(run_engine, df, engine)
+        print(f"engine (cold)  : {cold_s:8.2f}s  ({len(df) / cold_s:,.0f} rows/s)")
+        warm, warm_s = timed(run_engine, df, engine)
+        print(f"engine (warm)  : {warm_s:8.2f}s  ({len(df) / warm_s:,.0f} rows/s)")
+    finally:
+        engine.close()
+
+    max_diff = float((baseline[["title_sentiment_score", "summary_sentiment_score"]]
+                      - cold[["title_sentiment_score", "summary_sentiment_score"]]).abs().to_numpy().max())
+    labels_match = bool((baseline["title_sentiment_label"] == cold["title_sentiment_label"]).all()
+                        and (baseline["summary_sentiment_label"] == cold["summary_sentiment_label"]).all())
+    print(f"max |score diff| = {max_diff:.2e}, labels identical: {labels_match}")
+    print(f"speedup cold {baseline_s / cold_s:.1f}x, warm {baseline_s / warm_s:.1f}x")
+
+    results = {
+        "rows": len(df),
+        "dup_ratio": args.dup_ratio,
+        "workers": engine.workers,
+        "baseline_seconds": baseline_s,
+        "engine_cold_seconds": cold_s,
+        "engine_warm_seconds": warm_s,
+        "max_score_diff": max_diff,
+        "labels_identical": labels_match,
+    }
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0 if labels_match else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
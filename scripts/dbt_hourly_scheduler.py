@@ -1,8 +1,14 @@
+import json
+import os
 import subprocess
 import sys
 import time
+import urllib.error
+import urllib.request
 from datetime import datetime
 from pathlib import Path
+from dbt.cli.main import dbtRunner
+import metrics
 
 # -----------------------------
 # Paths
@@ -11,6 +17,49 @@ DBT_PROJECT_PATH = r"PROJECT PATH"
 DBT_PROFILE_DIR = r"DBT Profile directory"  # <-- Update this to your actual profiles.yml folder
 PYTHON_SCRIPT_PATH = r"Script path for rss_sentiment.py to call inside the script"
 
+# -----------------------------
+# Resident sentiment service (sentiment_service.py); falls back to PYTHON_SCRIPT_PATH if unreachable
+# -----------------------------
+SENTIMENT_SERVICE_URL = os.getenv("SENTIMENT_SERVICE_URL", "http://127.0.0.1:8765")
+SENTIMENT_JOB = "textblob"        # "textblob" (rss_sentiment.py) or "distilbert" (rss_ml.py)
+# Opt-in jobs run through the service after SENTIMENT_JOB succeeds, e.g. "cascade" (rss_cascade.py ->
+# FACT_RSS_SENTIMENT_UNIFIED, not read by the marts); they never fail the stage and need the service
+EXTRA_SENTIMENT_JOBS = [job for job in os.getenv("EXTRA_SENTIMENT_JOBS", "").split(",") if job.strip()]
+SENTIMENT_JOB_TIMEOUT = 3600      # seconds
+
+# -----------------------------
+# Triggering
+# -----------------------------
+TRIGGER_MODE = os.getenv("SCHEDULER_TRIGGER_MODE", "event")   # "event" (watermark-driven) or "hourly"
+POLL_INTERVAL = 60                     # seconds between watermark polls
+RETRY_BASE_DELAY = 60                  # first retry of a failed stage (seconds), doubled per failure
+RETRY_MAX_DELAY = 3600
+SCHEDULER_STATE_FILE = "scheduler_state.json"
+FLUSH_EVENT_FILE = os.getenv("FLUSH_EVENT_FILE", "consumer_flush_event.json")  # touched by mq_consumer.py
+
+# Cheap change detectors per stage input: MAX/COUNT are answered from table metadata
+WATERMARK_QUERIES = {
+    "RSS_STAGING": "SELECT MAX(LOAD_TIMESTAMP), COUNT(*) FROM RSS_STAGING",
+    "FACT_RSS_ENRICHED": "SELECT MAX(LOAD_TIMESTAMP), COUNT(*) FROM FACT_RSS_ENRICHED",
+    "FACT_RSS_SENTIMENT": 'SELECT MAX("scored_at"), COUNT(*) FROM FACT_RSS_SENTIMENT',
+}
+
+# -----------------------------
+# dbt Execution
+# -----------------------------
+DBT_THREADS = 8                               # independent models in a stage build in parallel
+DBT_TIMINGS_FILE = "dbt_node_timings.jsonl"   # one JSON line per node per build
+
+MODEL_SECONDS = metrics.histogram("dbt_model_seconds", "dbt node execution time, by model and status")
+STAGE_SECONDS = metrics.histogram("dbt_stage_seconds", "Wall time of one dbt build per stage")
+DBT_COMMON_ARGS = [
+    "--target", "prod",
+    "--profile", "scheduler",
+    "--profiles-dir", DBT_PROFILE_DIR,
+    "--project-dir", DBT_PROJECT_PATH
+]
+DBT_PROJECT_INPUTS = ["dbt_project.yml", "models", "macros", "snapshots", "seeds", "packages.yml"]
+
 # -----------------------------
 # Model Sequences
 # -----------------------------
@@ -31,52 +80,147 @@ analytical_models = [
 ]
 
 # -----------------------------
-# Function to run dbt model sequence
-# -----------------------------
-def run_dbt_sequence(models_list):
-    for model in models_list:
-        print(f"[{datetime.now()}] 🚀 Starting dbt run for model: {model}")
-        result_run = subprocess.run(
-            [
-                "dbt", "run",
-                "--models", model,
-                "--target", "prod",
-                "--profile", "scheduler",
-                "--profiles-dir", DBT_PROFILE_DIR
-            ],
-            cwd=DBT_PROJECT_PATH,
-            stdout=sys.stdout,
-            stderr=sys.stderr
-        )
-        if result_run.returncode != 0:
-            print(f"[{datetime.now()}] ❌ dbt run FAILED for model: {model}")
-            return False
-        print(f"[{datetime.now()}] ✅ dbt run completed for model: {model}")
-
-        print(f"[{datetime.now()}] Starting dbt test for model: {model}")
-        result_test = subprocess.run(
-            [
-                "dbt", "test",
-                "--models", model,
-                "--target", "prod",
-                "--profile", "scheduler",
-                "--profiles-dir", DBT_PROFILE_DIR
-            ],
-            cwd=DBT_PROJECT_PATH,
-            stdout=sys.stdout,
-            stderr=sys.stderr
-        )
-        if result_test.returncode != 0:
-            print(f"[{datetime.now()}] ⚠️ dbt test FAILED for model: {model}")
-            return False
-        print(f"[{datetime.now()}] ✅ dbt test completed for model: {model}\n")
+# Parsed manifest, reused across builds until the project changes
+# -----------------------------
+_manifest = None
+_manifest_stamp = None
+
+def project_stamp():
+    latest = 0.0
+    for name in DBT_PROJECT_INPUTS:
+        path = Path(DBT_PROJECT_PATH) / name
+        if path.is_file():
+            latest = max(latest, path.stat().st_mtime)
+        elif path.is_dir():
+            for child in path.rglob("*"):
+                latest = max(latest, child.stat().st_mtime)
+    return latest
+
+def get_manifest():
+    global _manifest, _manifest_stamp
+    stamp = project_stamp()
+    if _manifest is None or stamp != _manifest_stamp:
+        print(f"[{datetime.now()}] 📦 Parsing dbt project...")
+        result = dbtRunner().invoke(["parse", *DBT_COMMON_ARGS])
+        if not result.success:
+            raise RuntimeError(f"dbt parse failed: {result.exception}")
+        _manifest, _manifest_stamp = result.result, stamp
+    return _manifest
+
+# -----------------------------
+# Per-node timings from run results
+# -----------------------------
+def record_node_timings(stage, run_results):
+    rows = []
+    for node_result in run_results:
+        timing = {t.name: t for t in (node_result.timing or [])}
+        execute = timing.get("execute")
+        rows.append({
+            "stage": stage,
+            "unique_id": node_result.node.unique_id,
+            "resource_type": str(node_result.node.resource_type),
+            "status": str(node_result.status),
+            "execution_time": round(node_result.execution_time or 0.0, 3),
+            "started_at": execute.started_at.isoformat() if execute and execute.started_at else None,
+            "completed_at": execute.completed_at.isoformat() if execute and execute.completed_at else None,
+            "thread_id": node_result.thread_id,
+        })
+
+    with open(DBT_TIMINGS_FILE, "a") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+            MODEL_SECONDS.observe(row["execution_time"], model=row["unique_id"], status=row["status"])
+
+    for row in sorted(rows, key=lambda r: -r["execution_time"]):
+        print(f"    {row['execution_time']:8.2f}s  {row['status']:<8} {row['unique_id']}")
+    return rows
+
+# -----------------------------
+# Function to run dbt model sequence (one `dbt build` per stage)
+# -----------------------------
+def run_dbt_sequence(models_list, stage="dbt"):
+    # dbt orders the selected models by their refs and runs independent ones on parallel threads;
+    # `build` also runs each model's tests right after it, replacing the separate run/test calls.
+    print(f"[{datetime.now()}] 🚀 Starting dbt build for stage '{stage}': {' '.join(models_list)}")
+    started = time.perf_counter()
+    try:
+        runner = dbtRunner(manifest=get_manifest())
+    except RuntimeError as exc:
+        print(f"[{datetime.now()}] ❌ {exc}")
+        return False
+    result = runner.invoke([
+        "build",
+        "--select", *models_list,
+        "--threads", str(DBT_THREADS),
+        *DBT_COMMON_ARGS
+    ])
+    elapsed = time.perf_counter() - started
+    STAGE_SECONDS.observe(elapsed, stage=stage, status="ok" if result.success else "error")
+
+    if result.result is not None and hasattr(result.result, "results"):
+        record_node_timings(stage, result.result.results)
+    if not result.success:
+        print(f"[{datetime.now()}] ❌ dbt build FAILED for stage '{stage}' after {elapsed:.1f}s")
+        return False
+    print(f"[{datetime.now()}] ✅ dbt build completed for stage '{stage}' in {elapsed:.1f}s\n")
     return True
 
 # -----------------------------
 # Function to run Python sentiment script
 # -----------------------------
+def run_sentiment_job(job=SENTIMENT_JOB):
+    # Returns True/False for a finished job, None if no service is running (connection refused).
+    # Any other failure (timeout, reset, bad response) is False: the service may still be scoring,
+    # so starting the script as well would score the same rows twice.
+    request = urllib.request.Request(
+        f"{SENTIMENT_SERVICE_URL}/jobs/{job}",
+        data=json.dumps({}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    try:
+        try:
+            with urllib.request.urlopen(request, timeout=SENTIMENT_JOB_TIMEOUT) as response:
+                result = json.loads(response.read())
+        except urllib.error.HTTPError as exc:
+            result = json.loads(exc.read() or b"{}")
+    except urllib.error.URLError as exc:
+        if isinstance(exc.reason, ConnectionRefusedError):
+            return None
+        print(f"[{datetime.now()}] ❌ Sentiment job '{job}' request failed: {exc.reason}")
+        return False
+    except ConnectionRefusedError:
+        return None
+    except OSError as exc:          # TimeoutError, ConnectionResetError, ...
+        print(f"[{datetime.now()}] ❌ Sentiment job '{job}' request failed: {exc!r}")
+        return False
+    except ValueError as exc:       # json.JSONDecodeError, e.g. an HTML error page from a proxy
+        print(f"[{datetime.now()}] ❌ Sentiment job '{job}' returned an unreadable response: {exc}")
+        return False
+    if not isinstance(result, dict):
+        print(f"[{datetime.now()}] ❌ Sentiment job '{job}' returned an unexpected response: {result!r}")
+        return False
+
+    if result.get("status") != "ok":
+        print(f"[{datetime.now()}] ❌ Sentiment job '{job}' failed: {result.get('error')}")
+        return False
+    print(f"[{datetime.now()}] ✅ Sentiment job '{job}' scored {result.get('rows')} rows "
+          f"in {result.get('latency_seconds')}s (resident service).\n")
+    return True
+
 def run_sentiment_script():
-    print(f"[{datetime.now()}] 🧠 Running sentiment analysis Python script...")
+    print(f"[{datetime.now()}] 🧠 Running sentiment analysis...")
+    service_result = run_sentiment_job()
+    if service_result is not None:
+        if service_result:
+            for job in EXTRA_SENTIMENT_JOBS:
+                run_sentiment_job(job.strip())
+        return service_result
+
+    print(f"[{datetime.now()}] ⚠️ Sentiment service not running at {SENTIMENT_SERVICE_URL}, starting script...")
+    if EXTRA_SENTIMENT_JOBS:
+        print(f"[{datetime.now()}] ⚠️ Skipping {', '.join(EXTRA_SENTIMENT_JOBS)}: extra jobs need the service")
+    started = time.perf_counter()
     result = subprocess.run(
         ["python", PYTHON_SCRIPT_PATH],
         stdout=sys.stdout,
@@ -85,32 +229,154 @@ def run_sentiment_script():
     if result.returncode != 0:
         print(f"[{datetime.now()}] ❌ Sentiment script failed!")
         return False
-    print(f"[{datetime.now()}] ✅ Sentiment analysis completed successfully.\n")
+    print(f"[{datetime.now()}] ✅ Sentiment analysis completed successfully "
+          f"in {time.perf_counter() - started:.1f}s (cold start).\n")
     return True
 
+# -----------------------------
+# Watermarks (change detection without running any model)
+# -----------------------------
+_watermark_conn = None
+
+def read_watermark(table):
+    global _watermark_conn
+    try:
+        if _watermark_conn is None or _watermark_conn.is_closed():
+            from rss_sentiment import connect_snowflake
+            _watermark_conn = connect_snowflake()
+        cursor = _watermark_conn.cursor()
+        cursor.execute(WATERMARK_QUERIES[table])
+        max_ts, row_count = cursor.fetchone()
+        return f"{max_ts}|{row_count}"
+    except Exception as exc:
+        print(f"[{datetime.now()}] ⚠️ Could not read watermark for {table}: {exc}")
+        _watermark_conn = None
+        return None
+
+def flush_event_stamp():
+    try:
+        return os.path.getmtime(FLUSH_EVENT_FILE)
+    except OSError:
+        return None
+
+# -----------------------------
+# Stages with their own retry/backoff and input watermark
+# -----------------------------
+class Stage:
+    def __init__(self, name, input_table, run):
+        self.name = name
+        self.input_table = input_table
+        self.run = run
+        self.done_watermark = None     # input watermark of the last successful run
+        self.failures = 0
+        self.next_attempt_at = 0.0
+
+    def to_state(self):
+        return {"done_watermark": self.done_watermark, "failures": self.failures}
+
+    def load_state(self, state):
+        self.done_watermark = state.get("done_watermark")
+        self.failures = state.get("failures", 0)
+
+STAGES = [
+    Stage("staging", "RSS_STAGING", lambda: run_dbt_sequence(staging_models, stage="staging")),
+    Stage("sentiment", "FACT_RSS_ENRICHED", lambda: run_sentiment_script()),
+    Stage("analytics", "FACT_RSS_SENTIMENT", lambda: run_dbt_sequence(analytical_models, stage="analytics")),
+]
+
+def load_scheduler_state():
+    if os.path.exists(SCHEDULER_STATE_FILE):
+        with open(SCHEDULER_STATE_FILE, "r") as f:
+            state = json.load(f)
+        for stage in STAGES:
+            stage.load_state(state.get(stage.name, {}))
+
+def save_scheduler_state():
+    tmp_path = f"{SCHEDULER_STATE_FILE}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({stage.name: stage.to_state() for stage in STAGES}, f)
+    os.replace(tmp_path, SCHEDULER_STATE_FILE)
+
+def run_changed_stages():
+    """Run, in order, every stage whose input changed since its last success. Returns True if any ran."""
+    ran_any = False
+    for stage in STAGES:
+        watermark = read_watermark(stage.input_table)
+        if watermark is None:
+            return ran_any                       # warehouse unreachable: try again next poll
+        if watermark == stage.done_watermark and stage.failures == 0:
+            continue                             # inputs unchanged, nothing to do for this stage
+        if time.time() < stage.next_attempt_at:
+            return ran_any                       # still backing off; downstream waits for it
+
+        print(f"[{datetime.now()}] ⏱️ Input {stage.input_table} changed, running stage '{stage.name}'...")
+        ran_any = True
+        if stage.run():
+            stage.done_watermark = watermark
+            stage.failures = 0
+            stage.next_attempt_at = 0.0
+            save_scheduler_state()
+        else:
+            stage.failures += 1
+            delay = min(RETRY_BASE_DELAY * 2 ** (stage.failures - 1), RETRY_MAX_DELAY)
+            stage.next_attempt_at = time.time() + delay
+            save_scheduler_state()
+            print(f"[{datetime.now()}] ❌ Stage '{stage.name}' failed ({stage.failures}x), retrying in {delay}s.\n")
+            return ran_any
+    return ran_any
+
+# -----------------------------
+# MAIN LOOP: event-driven (default)
+# -----------------------------
+def run_event_loop():
+    print(f"[{datetime.now()}] Starting dbt + sentiment scheduler (event-driven, polling every {POLL_INTERVAL}s)...")
+    load_scheduler_state()
+    last_flush_stamp = flush_event_stamp()
+    while True:
+        if run_changed_stages():
+            print(f"[{datetime.now()}] ✅ Changed stages processed.\n")
+
+        # Sleep until the next poll, waking early when the consumer reports a flush
+        deadline = time.time() + POLL_INTERVAL
+        while time.time() < deadline:
+            stamp = flush_event_stamp()
+            if stamp != last_flush_stamp:
+                last_flush_stamp = stamp
+                print(f"[{datetime.now()}] 📥 Consumer flush event received.")
+                break
+            time.sleep(1)
+
 # -----------------------------
 # MAIN LOOP: Run hourly
 # -----------------------------
-print(f"[{datetime.now()}] Starting dbt + sentiment hourly scheduler (foreground)...")
+def run_hourly_loop():
+    print(f"[{datetime.now()}] Starting dbt + sentiment hourly scheduler (foreground)...")
 
-while True:
-    print(f"[{datetime.now()}] ⏱️ Starting new hourly cycle...\n")
+    while True:
+        print(f"[{datetime.now()}] ⏱️ Starting new hourly cycle...\n")
 
-    if not run_dbt_sequence(staging_models):
-        print(f"[{datetime.now()}] ❌ Stopping this cycle due to failure in staging/enrichment models.\n")
-        time.sleep(3600)
-        continue
+        if not run_dbt_sequence(staging_models, stage="staging"):
+            print(f"[{datetime.now()}] ❌ Stopping this cycle due to failure in staging/enrichment models.\n")
+            time.sleep(3600)
+            continue
 
-    if not run_sentiment_script():
-        print(f"[{datetime.now()}] ❌ Stopping this cycle due to Python sentiment failure.\n")
-        time.sleep(3600)
-        continue
+        if not run_sentiment_script():
+            print(f"[{datetime.now()}] ❌ Stopping this cycle due to Python sentiment failure.\n")
+            time.sleep(3600)
+            continue
+
+        if not run_dbt_sequence(analytical_models, stage="analytics"):
+            print(f"[{datetime.now()}] ❌ Stopping this cycle due to failure in analytical models.\n")
+            time.sleep(3600)
+            continue
 
-    if not run_dbt_sequence(analytical_models):
-        print(f"[{datetime.now()}] ❌ Stopping this cycle due to failure in analytical models.\n")
+        print(f"[{datetime.now()}] ✅ Hourly cycle completed successfully.\n")
+        print(f"[{datetime.now()}] Waiting 1 hour until next run...\n")
         time.sleep(3600)
-        continue
 
-    print(f"[{datetime.now()}] ✅ Hourly cycle completed successfully.\n")
-    print(f"[{datetime.now()}] Waiting 1 hour until next run...\n")
-    time.sleep(3600)
+if __name__ == "__main__":
+    metrics.init_from_env()
+    if TRIGGER_MODE == "hourly":
+        run_hourly_loop()
+    else:
+        run_event_loop()
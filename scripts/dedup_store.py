@@ -0,0 +1,167 @@
+"""
+Compact, append-only dedup index for already published RSS links
+
+- SQLite table keyed by a 64-bit hash of the link (INTEGER PRIMARY KEY = the rowid B-tree)
+- Membership checks hit the index, nothing is held in Python memory between cycles
+- New links are buffered and written in batches inside one transaction
+- Links not seen in any feed for TTL_DAYS are evicted, so the index stays bounded; the links each feed
+  listed at its last change are kept per feed (feed_links), and a feed that comes back unchanged (304)
+  refreshes them via refresh_feed(), so quiet feeds do not age out
+- Imports a legacy processed_rss_links.json once on first start
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+# -----------------------------
+# Dedup Store Configuration
+# -----------------------------
+DEDUP_DB_FILE = "processed_rss_links.sqlite"
+LEGACY_JSON_FILE = "processed_rss_links.json"
+TTL_DAYS = 30                     # forget links not seen in any feed for this long
+WRITE_BATCH_SIZE = 500            # buffered inserts before an automatic flush
+QUERY_CHUNK = 500                 # host parameters per IN (...) lookup
+
+def link_hash(link):
+    digest = hashlib.blake2b(link.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)   # fits SQLite's signed INTEGER
+
+class LinkIndex:
+    def __init__(self, path=DEDUP_DB_FILE, ttl_days=TTL_DAYS, legacy_json=LEGACY_JSON_FILE):
+        self.path = path
+        self.ttl_seconds = int(ttl_days * 86400)
+        self._pending = {}
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_links ("
+            " link_hash INTEGER PRIMARY KEY,"
+            " last_seen INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_seen_links_last_seen ON seen_links(last_seen)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS feed_links ("
+            " feed_hash INTEGER NOT NULL,"
+            " link_hash INTEGER NOT NULL,"
+            " PRIMARY KEY (feed_hash, link_hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        if legacy_json:
+            self._import_legacy(legacy_json)
+
+    def _import_legacy(self, legacy_json):
+        if not os.path.exists(legacy_json):
+            return
+        with open(legacy_json, "r") as f:
+            links = json.load(f)
+        self.add_many(links)
+        self.flush()
+        os.replace(legacy_json, f"{legacy_json}.migrated")
+        print(f"🔄 Imported {len(links)} links from {legacy_json} into {self.path}")
+
+    # -----------------------------
+    # Membership
+    # -----------------------------
+    def __contains__(self, link):
+        key = link_hash(link)
+        if key in self._pending:
+            return True
+        row = self._conn.execute("SELECT 1 FROM seen_links WHERE link_hash = ?", (key,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM seen_links").fetchone()[0] + len(self._pending)
+
+    def filter_new(self, entries, key="link"):
+        """
+        Return the entries whose link has never been published, deduplicated within the batch.
+        Links that are already known get their last_seen refreshed so they do not age out
+        while a feed still lists them.
+        """
+        by_hash = {}
+        for entry in entries:
+            link = entry.get(key)
+            if link:
+                by_hash.setdefault(link_hash(link), entry)
+
+        hashes = list(by_hash)
+        known = set(h for h in hashes if h in self._pending)
+        for start in range(0, len(hashes), QUERY_CHUNK):
+            chunk = hashes[start:start + QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT link_hash FROM seen_links WHERE link_hash IN ({placeholders})", chunk
+            )
+            known.update(r[0] for r in rows)
+
+        self._touch(known)
+        return [entry for h, entry in by_hash.items() if h not in known]
+
+    # -----------------------------
+    # Per-feed link sets
+    # -----------------------------
+    def set_feed_links(self, feed_url, links):
+        """Replace the links remembered for a feed whose content changed."""
+        feed = link_hash(feed_url)
+        with self._conn:
+            self._conn.execute("DELETE FROM feed_links WHERE feed_hash = ?", (feed,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO feed_links (feed_hash, link_hash) VALUES (?, ?)",
+                [(feed, link_hash(link)) for link in links if link]
+            )
+
+    def refresh_feed(self, feed_url):
+        """Refresh last_seen of the links a feed still lists although it returned no entries (304 / unchanged body)."""
+        with self._conn:
+            self._conn.execute(
+                "UPDATE seen_links SET last_seen = ? WHERE link_hash IN "
+                "(SELECT link_hash FROM feed_links WHERE feed_hash = ?)",
+                (int(time.time()), link_hash(feed_url))
+            )
+
+    def _touch(self, hashes):
+        now = int(time.time())
+        self._conn.executemany(
+            "UPDATE seen_links SET last_seen = ? WHERE link_hash = ?", [(now, h) for h in hashes]
+        )
+        self._conn.commit()
+
+    # -----------------------------
+    # Batched writes
+    # -----------------------------
+    def add(self, link):
+        self._pending[link_hash(link)] = int(time.time())
+        if len(self._pending) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def add_many(self, links):
+        for link in links:
+            self.add(link)
+
+    def flush(self):
+        if not self._pending:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO seen_links (link_hash, last_seen) VALUES (?, ?) "
+                "ON CONFLICT(link_hash) DO UPDATE SET last_seen = excluded.last_seen",
+                list(self._pending.items())
+            )
+        self._pending.clear()
+
+    # -----------------------------
+    # TTL eviction
+    # -----------------------------
+    def evict_expired(self):
+        cutoff = int(time.time()) - self.ttl_seconds
+        with self._conn:
+            cursor = self._conn.execute("DELETE FROM seen_links WHERE last_seen < ?", (cutoff,))
+        return cursor.rowcount
+
+    def close(self):
+        self.flush()
+        self._conn.close()
@@ -0,0 +1,97 @@
+"""
+Offline evaluation: full DistilBERT vs the TextBlob -> DistilBERT cascade (rss_cascade.py)
+
+Scores a corpus with DistilBERT on every row (the reference), then runs the cascade at one or more
+margins and reports throughput, the share of rows routed to DistilBERT and label agreement with
+the reference. Each run starts with a cold TextBlob memo and an empty in-memory prediction cache,
+so cached results never make a run look faster than it is.
+
+    python eval_cascade.py --input articles.csv --margins 0.1 0.25 0.4 [--json results.json]
+    python eval_cascade.py --rows 5000            # synthetic corpus from bench_sentiment.py
+"""
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import rss_ml
+from rss_cascade import cascade_predict, UNCERTAIN_MARGIN, TEXTBLOB_MODEL
+from sentiment_engine import SentimentEngine
+from prediction_cache import PredictionCache
+
+def load_corpus(args):
+    if args.input:
+        df = pd.read_parquet(args.input) if args.input.endswith(".parquet") else pd.read_csv(args.input)
+        df.columns = [c.lower() for c in df.columns]
+        return df[["title", "summary"]].head(args.rows) if args.rows else df[["title", "summary"]]
+    from bench_sentiment import synthetic_corpus
+    return synthetic_corpus(args.rows or 5000, dup_ratio=0.0)
+
+def reference_labels(texts, model):
+    cache = PredictionCache(rss_ml.MODEL_ID, path=":memory:")
+    started = time.perf_counter()
+    results, _ = rss_ml.predict(texts, cache, model)
+    elapsed = time.perf_counter() - started
+    cache.close()
+    return np.array([r["label"].lower() for r in results]), elapsed
+
+def evaluate_margin(df, margin, model, reference, workers):
+    engine = SentimentEngine(workers=workers) if workers else SentimentEngine()
+    cache = PredictionCache(rss_ml.MODEL_ID, path=":memory:")
+    try:
+        started = time.perf_counter()
+        predictions, _ = cascade_predict(df["title"].tolist(), df["summary"].tolist(), engine, cache, model, margin)
+        elapsed = time.perf_counter() - started
+    finally:
+        cache.close()
+        engine.close()
+
+    labels = predictions["sentiment_label"].to_numpy()
+    kept = (predictions["model"] == TEXTBLOB_MODEL).to_numpy()
+    return {
+        "margin": margin,
+        "seconds": elapsed,
+        "rows_per_second": len(df) / elapsed,
+        "routed_share": float(1.0 - kept.mean()),
+        "agreement": float((labels == reference).mean()),
+        "agreement_textblob_rows": float((labels[kept] == reference[kept]).mean()) if kept.any() else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate the sentiment cascade against full DistilBERT.")
+    parser.add_argument("--input", help="CSV or Parquet file with title and summary columns")
+    parser.add_argument("--rows", type=int, default=None, help="limit (or synthetic corpus size, default 5000)")
+    parser.add_argument("--margins", type=float, nargs="+", default=[UNCERTAIN_MARGIN])
+    parser.add_argument("--workers", type=int, default=None, help="TextBlob worker processes")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    df = load_corpus(args).reset_index(drop=True)
+    texts = rss_ml.article_texts(df["title"], df["summary"])   # same text the cascade routes
+    print(f"Corpus: {len(df)} rows")
+
+    model = rss_ml.load_model()
+    reference, reference_s = reference_labels(texts, model)
+    print(f"full DistilBERT : {reference_s:8.2f}s  ({len(df) / reference_s:,.0f} rows/s)")
+
+    runs = []
+    for margin in args.margins:
+        run = evaluate_margin(df, margin, model, reference, args.workers)
+        run["speedup"] = reference_s / run["seconds"]
+        runs.append(run)
+        kept_agreement = run["agreement_textblob_rows"]
+        print(f"cascade m={margin:<5}: {run['seconds']:8.2f}s  ({run['rows_per_second']:,.0f} rows/s, "
+              f"{run['speedup']:.1f}x)  routed {100 * run['routed_share']:.1f}%  "
+              f"agreement {100 * run['agreement']:.2f}% "
+              f"(TextBlob-kept rows {'n/a' if kept_agreement is None else f'{100 * kept_agreement:.2f}%'})")
+
+    results = {"rows": len(df), "distilbert_seconds": reference_s, "backend": rss_ml.BACKEND, "runs": runs}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
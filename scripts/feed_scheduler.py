@@ -0,0 +1,159 @@
+"""
+Adaptive per-feed polling schedule for mq_producer.py
+
+- A heap of (next due time, feed) replaces the fixed 15-minute cycle: the producer sleeps until the
+  earliest feed is due and fetches only the feeds that are due (plus any due within COALESCE_WINDOW)
+- Each feed's publish interval is learned from its items' timestamps (EWMA of the spacing between
+  distinct publish times, or the time since the newest item when the feed has gone quiet);
+  the feed is polled every POLL_FRACTION of that interval, clamped to [MIN_INTERVAL, MAX_INTERVAL]
+- Feeds without item dates fall back to shrinking the interval when content changed and
+  stretching it when it did not
+- Errors back off exponentially (ERROR_BACKOFF_BASE doubling up to ERROR_BACKOFF_MAX)
+- Every delay gets +/-JITTER so feeds on the same host drift apart instead of firing together
+- State is persisted to FEED_SCHEDULE_FILE, so a restart keeps the learned intervals and due times
+"""
+
+import os
+import json
+import time
+import heapq
+import random
+import calendar
+import metrics
+
+# -----------------------------
+# Scheduler Configuration
+# -----------------------------
+FEED_SCHEDULE_FILE = "feed_schedule.json"
+DEFAULT_INTERVAL = 15 * 60        # first poll interval for a feed with no history (the old fixed cycle)
+MIN_INTERVAL = 5 * 60             # never poll a feed more often than this
+MAX_INTERVAL = 6 * 3600           # never leave a healthy feed unpolled longer than this
+POLL_FRACTION = 0.5               # poll twice per learned publish interval
+INTERVAL_ALPHA = 0.3              # EWMA weight of the newest publish-interval sample
+STRETCH_FACTOR = 1.5              # undated feeds: interval growth when nothing changed
+SHRINK_FACTOR = 0.75              # undated feeds: interval shrink when content changed
+ERROR_BACKOFF_BASE = 60           # first retry delay after an error (seconds), doubled per failure
+ERROR_BACKOFF_MAX = 6 * 3600
+JITTER = 0.1                      # +/- share of every delay
+COALESCE_WINDOW = 30              # feeds due within this many seconds are fetched in the same round
+
+POLL_INTERVAL = metrics.gauge("feed_poll_interval_seconds", "Current polling interval per feed")
+
+def item_timestamps(feed):
+    """Epoch seconds of every dated item in a parsed feed."""
+    stamps = []
+    for item in feed.entries:
+        parsed = item.get("published_parsed") or item.get("updated_parsed")
+        if parsed:
+            stamps.append(calendar.timegm(parsed))
+    return stamps
+
+def _jittered(delay):
+    return delay * random.uniform(1.0 - JITTER, 1.0 + JITTER)
+
+class FeedScheduler:
+    def __init__(self, feeds, path=FEED_SCHEDULE_FILE):
+        self.path = path
+        self.state = {}
+        saved = {}
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                saved = json.load(f)
+        now = time.time()
+        for url in feeds:
+            state = {"interval": DEFAULT_INTERVAL, "item_interval": None, "newest": None,
+                     "failures": 0, "next_due": now}
+            state.update(saved.get(url, {}))
+            self.state[url] = state
+        self._heap = [(state["next_due"], url) for url, state in self.state.items()]
+        heapq.heapify(self._heap)
+
+    # -----------------------------
+    # Queue
+    # -----------------------------
+    def seconds_until_next(self, now=None):
+        now = time.time() if now is None else now
+        return max(0.0, self._heap[0][0] - now) if self._heap else DEFAULT_INTERVAL
+
+    def pop_due(self, now=None):
+        """Remove and return the feeds due now (or within COALESCE_WINDOW); reschedule them with record_*()."""
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now + COALESCE_WINDOW:
+            due.append(heapq.heappop(self._heap)[1])
+        return due
+
+    def _schedule(self, url, delay, now):
+        state = self.state[url]
+        state["next_due"] = now + _jittered(delay)
+        heapq.heappush(self._heap, (state["next_due"], url))
+
+    # -----------------------------
+    # Outcomes
+    # -----------------------------
+    def record_error(self, url, now=None):
+        now = time.time() if now is None else now
+        state = self.state[url]
+        state["failures"] += 1
+        delay = min(ERROR_BACKOFF_BASE * 2 ** (state["failures"] - 1), ERROR_BACKOFF_MAX)
+        self._schedule(url, delay, now)
+        return delay
+
+    def record_fetch(self, result, now=None):
+        """Learn from one fetch result (status "ok" or "not_modified") and schedule the next poll."""
+        now = time.time() if now is None else now
+        url = result["url"]
+        state = self.state[url]
+        state["failures"] = 0
+
+        stamps = sorted(set(item_timestamps(result["feed"]))) if result["status"] == "ok" else []
+        if stamps:
+            state["newest"] = max(stamps[-1], state["newest"] or 0)
+        sample = None
+        if len(stamps) >= 2:
+            sample = (stamps[-1] - stamps[0]) / (len(stamps) - 1)
+        if state["newest"] is not None:
+            # A feed quiet for longer than its usual spacing is publishing less often than we thought
+            quiet_for = now - state["newest"]
+            sample = quiet_for if sample is None else max(sample, quiet_for)
+
+        if sample is not None and sample > 0:
+            previous = state["item_interval"]
+            state["item_interval"] = sample if previous is None else \
+                INTERVAL_ALPHA * sample + (1 - INTERVAL_ALPHA) * previous
+            interval = state["item_interval"] * POLL_FRACTION
+        elif result["status"] == "ok":
+            interval = state["interval"] * SHRINK_FACTOR
+        else:
+            interval = state["interval"] * STRETCH_FACTOR
+
+        state["interval"] = min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+        POLL_INTERVAL.set(round(state["interval"]), feed=url)
+        self._schedule(url, state["interval"], now)
+        return state["interval"]
+
+    def record_round(self, due, fetched, retry_links=(), now=None):
+        """
+        Reschedule every feed popped for this round: fetched feeds learn from their result, feeds
+        missing from `fetched` failed, and feeds whose entries were not confirmed retry with backoff.
+        """
+        now = time.time() if now is None else now
+        retry_links = set(retry_links)
+        by_url = {result["url"]: result for result in fetched}
+        for url in due:
+            result = by_url.get(url)
+            if result is None or result.get("links", set()) & retry_links:
+                self.record_error(url, now)
+            else:
+                self.record_fetch(result, now)
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,137 @@
+"""
+CPU inference backends for DistilBERT sentiment with length-bucketed, token-budget batching
+
+- Texts are tokenized once without padding, sorted by token length and packed into batches whose
+  padded size (rows x longest row) stays under TOKEN_BUDGET, so short titles are no longer padded
+  to the longest summary of a fixed-size batch
+- Backends behind one callable interface (drop-in for the transformers pipeline call in rss_ml.py):
+    pytorch : fp32 model, same outputs as pipeline("sentiment-analysis")
+    int8    : torch dynamic int8 quantization of the Linear layers
+    onnx    : ONNX Runtime via optimum (optional dependency)
+- `python inference_backend.py --backend int8 --verify 2000` checks a backend against the pipeline
+"""
+
+import os
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")  # CPU only
+
+import sys
+import time
+import argparse
+import torch
+from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+# ---------- Backend Configuration ----------
+BACKENDS = ("pytorch", "int8", "onnx")
+DEFAULT_BACKEND = os.getenv("SENTIMENT_BACKEND", "pytorch")
+TOKEN_BUDGET = 8192               # padded tokens per forward pass
+MAX_BATCH_SIZE = 64
+MAX_LENGTH = 512                  # DistilBERT position limit (same truncation as the pipeline)
+
+def backend_model_id(model_name, revision, backend):
+    # Quantized/ONNX outputs differ slightly from fp32, so they get their own cache namespace
+    base = f"{model_name}@{revision}"
+    return base if backend == "pytorch" else f"{base}+{backend}"
+
+# ---------- Length-bucketed batching ----------
+def token_budget_batches(lengths, token_budget=TOKEN_BUDGET, max_batch_size=MAX_BATCH_SIZE):
+    """Yield lists of indices, sorted by length, whose padded size fits the token budget."""
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batch = []
+    longest = 0
+    for idx in order:
+        longest_with = max(longest, lengths[idx])
+        if batch and (longest_with * (len(batch) + 1) > token_budget or len(batch) >= max_batch_size):
+            yield batch
+            batch, longest_with = [], lengths[idx]
+        batch.append(idx)
+        longest = longest_with
+    if batch:
+        yield batch
+
+# ---------- Backend ----------
+class SentimentBackend:
+    def __init__(self, model_name, revision=None, backend=DEFAULT_BACKEND,
+                 token_budget=TOKEN_BUDGET, max_batch_size=MAX_BATCH_SIZE):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}', expected one of {BACKENDS}")
+        self.backend = backend
+        self.model_id = backend_model_id(model_name, revision, backend)
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, revision=revision)
+
+        if backend == "onnx":
+            try:
+                from optimum.onnxruntime import ORTModelForSequenceClassification
+            except ImportError as exc:
+                raise ImportError("The onnx backend needs 'optimum[onnxruntime]' installed") from exc
+            self.model = ORTModelForSequenceClassification.from_pretrained(
+                model_name, revision=revision, export=True
+            )
+        else:
+            model = AutoModelForSequenceClassification.from_pretrained(model_name, revision=revision)
+            model.eval()
+            if backend == "int8":
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.model = model
+        self.id2label = self.model.config.id2label
+
+    def __call__(self, texts, truncation=True, batch_size=None):
+        """Return [{"label", "score"}] in input order, like the transformers pipeline."""
+        if not texts:
+            return []
+        encoded = self.tokenizer(list(texts), truncation=truncation, max_length=MAX_LENGTH)
+        input_ids = encoded["input_ids"]
+        lengths = [len(ids) for ids in input_ids]
+        max_batch_size = batch_size or self.max_batch_size   # row cap; the token budget usually binds first
+        results = [None] * len(texts)
+
+        with torch.inference_mode():
+            for batch in token_budget_batches(lengths, self.token_budget, max_batch_size):
+                padded = self.tokenizer.pad(
+                    {"input_ids": [input_ids[i] for i in batch]}, return_tensors="pt"
+                )
+                logits = self.model(**padded).logits
+                probs = torch.softmax(torch.as_tensor(logits), dim=-1)
+                scores, label_ids = probs.max(dim=-1)
+                for i, label_id, score in zip(batch, label_ids.tolist(), scores.tolist()):
+                    results[i] = {"label": self.id2label[label_id], "score": score}
+        return results
+
+# ---------- Verification against the current pipeline ----------
+def verify(backend, texts, model_name, revision):
+    from transformers import pipeline
+    reference_model = pipeline("sentiment-analysis", model=model_name, revision=revision, device=-1)
+
+    started = time.perf_counter()
+    reference = reference_model(texts, truncation=True, batch_size=16)
+    reference_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    candidate = backend(texts, truncation=True)
+    candidate_s = time.perf_counter() - started
+
+    agree = sum(1 for r, c in zip(reference, candidate) if r["label"] == c["label"])
+    max_diff = max(abs(r["score"] - c["score"]) for r, c in zip(reference, candidate))
+    print(f"pipeline (batch_size=16): {reference_s:.2f}s  ({len(texts) / reference_s:,.0f} texts/s)")
+    print(f"{backend.backend:<24}: {candidate_s:.2f}s  ({len(texts) / candidate_s:,.0f} texts/s)")
+    print(f"label agreement: {agree}/{len(texts)} ({100.0 * agree / len(texts):.2f}%), "
+          f"max |score diff|: {max_diff:.4f}")
+    return agree / len(texts), max_diff
+
+def main(argv=None):
+    from rss_ml import MODEL_NAME, MODEL_REVISION, clean_text
+    from bench_sentiment import synthetic_corpus
+
+    parser = argparse.ArgumentParser(description="Check a DistilBERT CPU backend against the pipeline.")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND)
+    parser.add_argument("--verify", type=int, default=2000, help="number of synthetic texts to compare")
+    args = parser.parse_args(argv)
+
+    corpus = synthetic_corpus(args.verify, dup_ratio=0.0)
+    texts = [clean_text(f"{t} {s}") for t, s in zip(corpus["title"], corpus["summary"])]
+    backend = SentimentBackend(MODEL_NAME, MODEL_REVISION, args.backend)
+    verify(backend, texts, MODEL_NAME, MODEL_REVISION)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
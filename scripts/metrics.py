@@ -0,0 +1,230 @@
+"""
+Shared in-process metrics for the producer, consumer, scoring jobs and scheduler
+
+- Counter, Gauge and Histogram (fixed buckets, Prometheus semantics) with optional labels;
+  updates are a dict lookup plus an add under one lock, cheap enough for per-message paths
+- span(name, **labels): times a block into the `<name>_seconds` histogram and, when METRICS_TRACE_FILE
+  is set, appends a JSON trace record (span id, parent id, start, duration, labels)
+- Export, configured from the environment by init_from_env():
+    METRICS_PORT  -> Prometheus text format on http://127.0.0.1:<port>/metrics
+    METRICS_FILE  -> the same text written atomically every METRICS_FILE_INTERVAL seconds and at exit
+                     (node_exporter textfile collector format)
+"""
+
+import os
+import json
+import time
+import atexit
+import bisect
+import itertools
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# -----------------------------
+# Metrics Configuration
+# -----------------------------
+METRIC_PREFIX = "rss_"
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+SIZE_BUCKETS = (1, 10, 50, 100, 500, 1000, 2500, 5000, 10000, 50000, 100000)
+RATE_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_FILE_INTERVAL = 15        # seconds between textfile exports
+
+_lock = threading.Lock()
+_registry = {}                    # full name -> metric
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+# -----------------------------
+# Metric types
+# -----------------------------
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+
+    def inc(self, value=1, **labels):
+        key = _label_key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def _render(self):
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[_label_key(labels)] = value
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}         # label key -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+
+    def count(self, **labels):
+        state = self._values.get(_label_key(labels))
+        return sum(state[:-1]) if state else 0
+
+    def _render(self):
+        lines = []
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            cumulative += state[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {state[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+def _get_or_create(cls, name, help_text, **kwargs):
+    full_name = name if name.startswith(METRIC_PREFIX) else METRIC_PREFIX + name
+    metric = _registry.get(full_name)
+    if metric is None:
+        with _lock:
+            metric = _registry.setdefault(full_name, cls(full_name, help_text, **kwargs))
+    return metric
+
+def counter(name, help_text=""):
+    return _get_or_create(Counter, name, help_text)
+
+def gauge(name, help_text=""):
+    return _get_or_create(Gauge, name, help_text)
+
+def histogram(name, help_text="", buckets=LATENCY_BUCKETS):
+    return _get_or_create(Histogram, name, help_text, buckets=buckets)
+
+# -----------------------------
+# Spans
+# -----------------------------
+_span_ids = itertools.count(1)
+_span_stack = threading.local()
+_trace_lock = threading.Lock()
+
+@contextmanager
+def span(name, **labels):
+    """Time a block into the `<name>_seconds` histogram (and the trace file when enabled)."""
+    stack = getattr(_span_stack, "ids", None)
+    if stack is None:
+        stack = _span_stack.ids = []
+    span_id = next(_span_ids)
+    parent = stack[-1] if stack else None
+    stack.append(span_id)
+    started_wall = time.time()
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        stack.pop()
+        histogram(f"{name}_seconds", f"Duration of {name} spans").observe(elapsed, **labels)
+        trace_file = os.getenv("METRICS_TRACE_FILE")
+        if trace_file:
+            record = {"span": name, "id": span_id, "parent": parent, "start": started_wall,
+                      "duration": round(elapsed, 6), "status": status, "pid": os.getpid(), **labels}
+            with _trace_lock, open(trace_file, "a") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+
+# -----------------------------
+# Exporters
+# -----------------------------
+def render():
+    """Prometheus text exposition of every registered metric."""
+    lines = []
+    with _lock:
+        for name in sorted(_registry):
+            metric = _registry[name]
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric._render())
+    return "\n".join(lines) + "\n"
+
+def write_textfile(path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass
+
+def start_http_server(port, host=METRICS_HOST):
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"📊 Metrics on http://{host}:{port}/metrics")
+    return server
+
+def start_file_exporter(path, interval=METRICS_FILE_INTERVAL):
+    def loop():
+        while True:
+            time.sleep(interval)
+            write_textfile(path)
+
+    threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+    atexit.register(write_textfile, path)
+
+_initialized = False
+
+def init_from_env():
+    """Start the exporters selected by METRICS_PORT / METRICS_FILE (once per process)."""
+    global _initialized
+    if _initialized:
+        return
+    _initialized = True
+    port = os.getenv("METRICS_PORT")
+    if port:
+        start_http_server(int(port))
+    path = os.getenv("METRICS_FILE")
+    if path:
+        start_file_exporter(path)
@@ -1,11 +1,18 @@
 import os
+import sys
 import json
 import time
-from datetime import datetime, timedelta
+import signal
+import argparse
+import multiprocessing
+from datetime import datetime, timezone
 import pika
 from dotenv import load_dotenv
-from google.cloud import storage
-from google.oauth2 import service_account
+from batch_sink import NDJSONSink, OrderedUploader, GCSBackend, LocalDirBackend, SealedFile, SPOOL_DIR
+from stream_partitions import STREAM_PARTITIONS, partition_queue, declare_partitions
+from trend_aggregator import TrendAggregator, start_trend_server
+from trending_terms import TrendingTerms
+import metrics
 
 # -----------------------------
 # Load .env
@@ -18,6 +25,7 @@ load_dotenv()
 RABBITMQ_NODE = 'MQ Server/Cluster Name'
 PORT = 5672
 QUEUE_NAME = 'RSS_FEED_QUEUE'
+RECONNECT_DELAY = 5         # seconds before re-opening a dropped connection
 
 # -----------------------------
 # GCP Storage Configuration
@@ -25,12 +33,52 @@ QUEUE_NAME = 'RSS_FEED_QUEUE'
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME")  # Corrected: use a valid .env variable
 GCS_FOLDER = "raw_rss_feed"  # root folder in bucket
 SERVICE_ACCOUNT_FILE = os.getenv("GCP_SERVICE_ACCOUNT_FILE")  # Corrected: store path in .env
+SINK_BACKEND = os.getenv("SINK_BACKEND", "gcs")               # "gcs" or "local"
+LOCAL_SINK_DIR = os.getenv("LOCAL_SINK_DIR", "local_bucket")  # used when SINK_BACKEND=local
 
 # -----------------------------
 # Consumer Config
 # -----------------------------
-BATCH_SIZE = 100             # number of messages per batch
+ROLL_MAX_BYTES = 64 * 1024 * 1024   # roll output file at this compressed size
 FLUSH_INTERVAL = 15 * 60    # flush every 15 minutes (seconds)
+PREFETCH_COUNT = 10000      # unacked messages the broker may hand us (acks follow durable uploads)
+UPLOAD_WORKERS = 2          # background upload threads
+MAX_PENDING_UPLOADS = 2     # sealed files queued or uploading at once
+# Open file + pending uploads must fit in the prefetch window, or delivery stalls until the age roll
+MAX_RECORDS_PER_FILE = PREFETCH_COUNT // (MAX_PENDING_UPLOADS + 1)
+
+# -----------------------------
+# Stream Offset Checkpointing
+# -----------------------------
+CHECKPOINT_FILE = "consumer_offset_checkpoint.json"
+STREAM_START = os.getenv("STREAM_START", "next")    # where to start without a checkpoint: first | last | next
+REPLAY_PREFIX = "rss_replay"                        # output file prefix for replays
+REPLAY_IDLE_TIMEOUT = 30                            # seconds without messages before a replay is done
+FLUSH_EVENT_FILE = os.getenv("FLUSH_EVENT_FILE", "consumer_flush_event.json")  # watched by the scheduler
+MANIFEST_SUFFIX = ".uploads.json"                   # sealed files not yet covered by the checkpoint
+
+# -----------------------------
+# Partitioned scale-out (STREAM_PARTITIONS > 0, see stream_partitions.py)
+# -----------------------------
+WORKER_RESTART_DELAY = 5            # first restart delay for a worker that exited (seconds), doubled per exit
+WORKER_RESTART_MAX = 300
+WORKER_HEALTHY_AFTER = 60           # a worker up this long resets its restart backoff
+WORKER_STOP_TIMEOUT = 120           # seconds a worker gets to flush and exit on shutdown
+SHUTDOWN_DRAIN_TIMEOUT = 60         # seconds shutdown waits for failing uploads before leaving them in the spool
+
+# -----------------------------
+# Real-time trends (in-process sliding-window aggregator, see trend_aggregator.py)
+# -----------------------------
+TRENDS_ENABLED = os.getenv("TRENDS_ENABLED", "1") == "1"
+TRENDS_CHECKPOINT_INTERVAL = 60     # seconds between trend state checkpoints
+TERMS_ENABLED = os.getenv("TERMS_ENABLED", "1") == "1"   # trending terms (trending_terms.py), served at /terms
+
+# -----------------------------
+# Metrics (see metrics.py; exported via METRICS_PORT / METRICS_FILE)
+# -----------------------------
+CONSUMED = metrics.counter("consumer_messages_total", "Messages written to the sink")
+BATCH_RECORDS = metrics.histogram("sink_batch_records", "Records per sealed file", buckets=metrics.SIZE_BUCKETS)
+CHECKPOINT_OFFSET = metrics.gauge("consumer_checkpoint_offset", "Last durably written stream offset")
 
 # -----------------------------
 # Connect to RabbitMQ
@@ -43,99 +91,404 @@ def connect_rabbitmq():
             )
             print(f"✅ Connected to RabbitMQ node: {RABBITMQ_NODE}:{PORT}")
             return connection
-        except pika.exceptions.AMQPConnectionError:
+        except (pika.exceptions.AMQPConnectionError, OSError):
             print("❌ Connection failed, retrying in 5 seconds...")
             time.sleep(5)
 
 # -----------------------------
-# Upload JSON to GCS (daily folder)
+# Offset checkpoint (last stream offset that is durably written)
 # -----------------------------
-def upload_to_gcs(file_name, data):
-    credentials = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE)
-    client = storage.Client(credentials=credentials)
-    bucket = client.bucket(GCS_BUCKET_NAME)
+def load_checkpoint(path=CHECKPOINT_FILE):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f).get("offset")
+    return None
 
-    today_str = datetime.utcnow().strftime("%Y-%m-%d")
-    blob_name = f"{GCS_FOLDER}/{today_str}/{file_name}"
-    blob = bucket.blob(blob_name)
-    blob.upload_from_string(data, content_type="application/json")
-    print(f"✅ Uploaded {file_name} to GCS/{today_str}/ (records: {len(json.loads(data))})")
+def save_checkpoint(offset, path=CHECKPOINT_FILE, queue=QUEUE_NAME):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"queue": queue, "offset": offset,
+                   "updated_at": datetime.now(timezone.utc).isoformat()}, f)
+    os.replace(tmp_path, path)
+
+def write_flush_event(offset, path=FLUSH_EVENT_FILE, queue=QUEUE_NAME):
+    # Rewritten after every durable flush; the scheduler wakes up on its mtime change
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"queue": queue, "offset": offset,
+                   "flushed_at": datetime.now(timezone.utc).isoformat()}, f)
+    os.replace(tmp_path, path)
+
+# -----------------------------
+# Pending-upload manifest: sealed files that are not yet covered by the checkpoint
+# -----------------------------
+def load_manifest(path):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return []
+
+def save_manifest(entries, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(entries, f)
+    os.replace(tmp_path, path)
+
+def recover_uploads(sink, manifest_path, checkpoint):
+    """
+    Finish what a previous run sealed but never checkpointed (crash, kill, lost connection) and
+    return the advanced checkpoint. Files already in storage are kept, files still in the spool are
+    uploaded; consumption restarts after the last such file, so no offset lands in two files.
+    """
+    recovered = 0
+    for entry in sorted(load_manifest(manifest_path), key=lambda e: e["first_offset"]):
+        if checkpoint is not None and entry["last_offset"] <= checkpoint:
+            continue
+        if not sink.backend.exists(entry["object_name"]):
+            if not os.path.exists(entry["local_path"]):
+                break   # lost before it was uploaded: these offsets are consumed again
+            sink.upload(SealedFile(entry["local_path"], entry["object_name"], entry["records"]))
+        checkpoint = entry["last_offset"]
+        recovered += 1
+    if recovered:
+        print(f"♻️ Recovered {recovered} sealed files from the previous run, resuming after offset {checkpoint}")
+
+    # Anything left in this worker's spool is an unsealed file or already in storage
+    for name in os.listdir(sink.spool_dir):
+        path = os.path.join(sink.spool_dir, name)
+        if os.path.isfile(path):
+            os.remove(path)
+    save_manifest([], manifest_path)
+    return checkpoint
+
+# -----------------------------
+# Output sink: gzip NDJSON files in daily folders (GCS or local directory)
+# -----------------------------
+def create_sink(prefix="rss_batch", spool_dir=SPOOL_DIR):
+    if SINK_BACKEND == "local":
+        backend = LocalDirBackend(LOCAL_SINK_DIR)
+    else:
+        backend = GCSBackend(GCS_BUCKET_NAME, SERVICE_ACCOUNT_FILE)
+    return NDJSONSink(backend, GCS_FOLDER, spool_dir=spool_dir, prefix=prefix, max_bytes=ROLL_MAX_BYTES,
+                      max_age=FLUSH_INTERVAL, max_records=MAX_RECORDS_PER_FILE)
+
+# -----------------------------
+# Per-worker layout: each partition has its own stream, checkpoint, manifest, file prefix and spool
+# -----------------------------
+def worker_layout(partition=None):
+    if partition is None:
+        return {"queue": QUEUE_NAME, "checkpoint": CHECKPOINT_FILE, "prefix": "rss_batch",
+                "spool_dir": SPOOL_DIR, "manifest": os.path.splitext(CHECKPOINT_FILE)[0] + MANIFEST_SUFFIX}
+    stem = f"{os.path.splitext(CHECKPOINT_FILE)[0]}.p{partition}"
+    return {"queue": partition_queue(QUEUE_NAME, partition), "checkpoint": f"{stem}.json",
+            "prefix": f"rss_batch_p{partition}", "spool_dir": os.path.join(SPOOL_DIR, f"p{partition}"),
+            "manifest": stem + MANIFEST_SUFFIX}
 
 # -----------------------------
 # Consumer Logic
 # -----------------------------
-def run_consumer():
-    connection = connect_rabbitmq()
-    channel = connection.channel()
-    channel.queue_declare(
-        queue=QUEUE_NAME,
-        durable=True,
-        arguments={'x-queue-type': 'stream'}
-    )
-
-    part_number = 1
-    current_date = datetime.utcnow().date()
-    batch = []
-    last_flush_time = datetime.utcnow()
-
-    # Flush batch to GCS
+def run_consumer(replay=None, partition=None):
+    """
+    Consume RSS_FEED_QUEUE (or one partition of it) into the sink.
+
+    Normal mode resumes from the offset after the last checkpoint and advances the
+    checkpoint only once a file is durably written. With `replay` (parsed CLI args)
+    it re-reads a bounded slice of the stream into REPLAY_PREFIX files and leaves
+    the checkpoint untouched. A dropped connection is re-opened after the open file
+    and pending uploads are made durable, resuming right after the last written offset.
+    """
+    metrics.init_from_env()
+    layout = worker_layout(partition)
+    queue = layout["queue"]
+
+    if replay:
+        start_offset = replay.from_offset if replay.from_offset is not None else replay.from_timestamp
+        sink = create_sink(prefix=layout["prefix"].replace("rss_batch", REPLAY_PREFIX, 1),
+                           spool_dir=os.path.join(layout["spool_dir"], "replay"))
+    else:
+        sink = create_sink(prefix=layout["prefix"], spool_dir=layout["spool_dir"])
+        checkpoint = recover_uploads(sink, layout["manifest"], load_checkpoint(layout["checkpoint"]))
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, layout["checkpoint"], queue)
+        start_offset = checkpoint + 1 if checkpoint is not None else STREAM_START
+
+    uploader = OrderedUploader(sink, workers=UPLOAD_WORKERS, max_pending=MAX_PENDING_UPLOADS)
+    manifest = []         # sealed files not yet covered by the checkpoint (normal mode only)
+
+    # Live trends follow the tail of the whole stream in one process; partition workers only see a slice
+    trends = terms = trend_server = None
+    if TRENDS_ENABLED and not replay and partition is None:
+        trends = TrendAggregator()
+        trends.load()
+        if TERMS_ENABLED:
+            terms = TrendingTerms()
+            terms.load()
+        trend_server = start_trend_server(trends, terms=terms)
+    trends_saved_at = time.monotonic()
+    connection = channel = None
+    min_offset = None
+    last_tag = None       # delivery tag of the newest message written to the open file
+    last_offset = None    # its stream offset
+    first_offset = None   # stream offset of the first message in the open file
+    last_message_at = time.monotonic()
+    done = False
+
+    # Seal the open file and hand it to the background uploader
     def process_batch():
-        nonlocal batch, part_number
-        if batch:
-            utc_timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
-            file_name = f"rss_batch_{utc_timestamp}_part{part_number}.json"
-            upload_to_gcs(file_name, json.dumps(batch, indent=2))
-            batch.clear()
-            part_number += 1
-
-    def reset_part_number():
-        nonlocal part_number
-        part_number = 1
-        print("🔄 Part number reset to 1 for new day.")
-
-    # Callback for each message
+        sealed = sink.roll()
+        if sealed:
+            BATCH_RECORDS.observe(sealed.records)
+            if not replay and last_offset is not None:
+                # Recorded before the upload starts, so a crash mid-upload is recovered on restart
+                manifest.append({"object_name": sealed.object_name, "local_path": sealed.local_path,
+                                 "records": sealed.records, "first_offset": first_offset, "last_offset": last_offset})
+                save_manifest(manifest, layout["manifest"])
+            uploader.submit(sealed, (last_tag, last_offset))
+
+    # On shutdown, give storage a bounded time; files still failing are uploaded by the next start (manifest)
+    def drain_for_shutdown():
+        tokens = uploader.drain(timeout=SHUTDOWN_DRAIN_TIMEOUT)
+        if len(uploader):
+            print(f"⚠️ Storage unavailable: {len(uploader)} sealed files left in {sink.spool_dir}"
+                  f"{'' if replay else ', they are uploaded on the next start'}")
+        return tokens
+
+    # Ack (and checkpoint) everything up to the newest file that is durably written
+    def ack_durable(tokens, ack=True):
+        if not tokens:
+            return
+        tag, offset = tokens[-1]
+        if ack:
+            channel.basic_ack(delivery_tag=tag, multiple=True)
+        if not replay and offset is not None:
+            save_checkpoint(offset, layout["checkpoint"], queue)
+            manifest[:] = [entry for entry in manifest if entry["last_offset"] > offset]
+            save_manifest(manifest, layout["manifest"])
+            CHECKPOINT_OFFSET.set(offset)
+        write_flush_event(offset, queue=queue)
+
+    def past_replay_end(offset, properties):
+        if replay.to_offset is not None and offset is not None and offset > replay.to_offset:
+            return True
+        if replay.to_timestamp is not None and properties.timestamp is not None:
+            return properties.timestamp > replay.to_timestamp.timestamp()
+        return False
+
+    # Callback for each message (ack happens after upload, see ack_durable)
     def callback(ch, method, properties, body):
-        nonlocal batch, current_date
-        data = json.loads(body)
-        batch.append(data)
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+        nonlocal last_tag, last_offset, first_offset, last_message_at, done
+        last_message_at = time.monotonic()
+        offset = (properties.headers or {}).get("x-stream-offset")
+        if done or (min_offset is not None and offset is not None and offset < min_offset):
+            return
+        if replay and past_replay_end(offset, properties):
+            done = True
+            return
+
+        if not sink.records:
+            first_offset = offset
+        sink.write_raw(body)
+        last_tag = method.delivery_tag
+        last_offset = offset
+        CONSUMED.inc()
+        if trends:
+            trends.update_message(body, properties, offset)
+        if terms:
+            terms.update_message(body, offset)
 
-        # Flush if batch full
-        if len(batch) >= BATCH_SIZE:
+        # Roll the output file once it is large enough
+        if sink.should_roll() and not uploader.full():
             process_batch()
 
-        # Reset part number if day changed
-        today = datetime.utcnow().date()
-        if today != current_date:
-            current_date = today
-            reset_part_number()
+    try:
+        while not done:
+            connection = connect_rabbitmq()
+            try:
+                channel = connection.channel()
+                if partition is not None:
+                    declare_partitions(channel, QUEUE_NAME, STREAM_PARTITIONS or partition + 1)
+                else:
+                    channel.queue_declare(queue=queue, durable=True, arguments={'x-queue-type': 'stream'})
+                min_offset = start_offset if isinstance(start_offset, int) else None
+                print(f"▶️ Starting {queue} at stream offset: {start_offset}")
+
+                print(" [*] RSS Consumer running. Press CTRL+C to stop.")
+                channel.basic_qos(prefetch_count=PREFETCH_COUNT)
+                channel.basic_consume(
+                    queue=queue,
+                    on_message_callback=callback,
+                    arguments={'x-stream-offset': start_offset}
+                )
 
-    print(" [*] RSS Consumer running. Press CTRL+C to stop.")
-    channel.basic_qos(prefetch_count=100)
-    channel.basic_consume(queue=QUEUE_NAME, on_message_callback=callback)
+                while not done:
+                    # Process messages continuously; uploads run in the background
+                    connection.process_data_events(time_limit=1)
+                    ack_durable(uploader.completed())
 
-    try:
-        while True:
-            # Process messages continuously
-            channel.connection.process_data_events(time_limit=1)
+                    # A replay ends at its upper bound or once it caught up with the tail of the stream
+                    if replay and time.monotonic() - last_message_at >= replay.idle_timeout:
+                        print("⏹ Replay reached the end of the stream.")
+                        done = True
+
+                    # Flush based on file age (every 15 minutes)
+                    if sink.should_roll() and not uploader.full():
+                        print("⏱ Flush interval reached. Flushing batch to storage...")
+                        process_batch()
 
-            # Flush based on flush interval (every 15 minutes)
-            now = datetime.utcnow()
-            if (now - last_flush_time).total_seconds() >= FLUSH_INTERVAL:
-                print("⏱ Flush interval reached. Flushing batch to GCS...")
+                    if trends and time.monotonic() - trends_saved_at >= TRENDS_CHECKPOINT_INTERVAL:
+                        trends.save()
+                        if terms:
+                            terms.save()
+                        trends_saved_at = time.monotonic()
+
+            except pika.exceptions.AMQPError as exc:
+                # Make everything written so far durable, then resume right after it on a new connection;
+                # the old channel is gone, so nothing is acked (stream offsets drive the restart instead)
+                print(f"❌ Lost RabbitMQ connection ({type(exc).__name__}: {exc}), flushing and reconnecting...")
                 process_batch()
-                last_flush_time = now
+                ack_durable(uploader.drain(), ack=False)
+                if last_offset is not None:
+                    start_offset = last_offset + 1
+                last_tag = None
+                if connection.is_open:
+                    connection.close()
+                time.sleep(RECONNECT_DELAY)
+
+        process_batch()
+        ack_durable(drain_for_shutdown())
+        print(f"✅ Replay finished at stream offset: {last_offset}")
 
     except KeyboardInterrupt:
         print(" [*] Consumer stopped by user.")
         process_batch()  # flush remaining messages
+        ack_durable(drain_for_shutdown(), ack=connection is not None and connection.is_open)
     finally:
-        if connection.is_open:
+        uploader.close()
+        if trends:
+            trend_server.shutdown()
+            trends.save()
+            if terms:
+                terms.save()
+        if connection is not None and connection.is_open:
             connection.close()
             print("✅ RabbitMQ connection closed safely.")
 
+# -----------------------------
+# Scale-out: one worker process per stream partition under a supervisor
+# -----------------------------
+def run_worker(partition):
+    # The supervisor owns Ctrl+C: workers ignore SIGINT and flush once on the SIGTERM it sends
+    def stop(signum, frame):
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, stop)
+
+    # Each worker exports its own metrics: METRICS_PORT + partition, METRICS_FILE with a .p<N> suffix
+    if os.getenv("METRICS_PORT"):
+        os.environ["METRICS_PORT"] = str(int(os.environ["METRICS_PORT"]) + partition)
+    if os.getenv("METRICS_FILE"):
+        stem, ext = os.path.splitext(os.environ["METRICS_FILE"])
+        os.environ["METRICS_FILE"] = f"{stem}.p{partition}{ext}"
+    run_consumer(partition=partition)
+
+def run_supervisor(partitions=STREAM_PARTITIONS):
+    """
+    Run one consumer process per partition and restart any that exits, with exponential backoff.
+    A restarted worker recovers its own manifest and checkpoint, so it writes no duplicate files.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    workers = {}          # partition -> Process
+    restarts = {partition: 0 for partition in range(partitions)}
+    start_at = {partition: 0.0 for partition in range(partitions)}
+    started_at = {}
+
+    def start(partition):
+        process = ctx.Process(target=run_worker, args=(partition,), name=f"rss-consumer-p{partition}")
+        process.start()
+        workers[partition] = process
+        started_at[partition] = time.monotonic()
+        print(f"🚀 Started consumer worker for partition {partition} (pid {process.pid})")
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f" [*] Supervising {partitions} consumer workers for {QUEUE_NAME}. Press CTRL+C to stop.")
+    try:
+        while True:
+            now = time.monotonic()
+            for partition in range(partitions):
+                process = workers.get(partition)
+                if process is not None and process.is_alive():
+                    continue
+                if process is not None:
+                    # A worker that stayed up for a while starts a fresh backoff sequence
+                    if now - started_at[partition] >= WORKER_HEALTHY_AFTER:
+                        restarts[partition] = 0
+                    delay = min(WORKER_RESTART_DELAY * 2 ** restarts[partition], WORKER_RESTART_MAX)
+                    restarts[partition] += 1
+                    start_at[partition] = now + delay
+                    del workers[partition]
+                    print(f"❌ Worker for partition {partition} exited with code {process.exitcode}, "
+                          f"restarting in {delay}s...")
+                if now >= start_at[partition]:
+                    start(partition)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(" [*] Stopping consumer workers...")
+        for process in workers.values():
+            if process.is_alive():
+                process.terminate()
+        for process in workers.values():
+            process.join(WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                print(f"❌ Worker {process.name} did not stop in {WORKER_STOP_TIMEOUT}s, killing it")
+                process.kill()
+        print(" [*] Supervisor stopped.")
+
+# -----------------------------
+# CLI: normal consumption, bounded replay, or partitioned workers
+# -----------------------------
+def parse_timestamp(value):
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="RSS stream consumer with offset checkpointing and replay.")
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument("--replay-from-offset", dest="from_offset", type=int,
+                       help="replay starting at this stream offset")
+    start.add_argument("--replay-from-timestamp", dest="from_timestamp", type=parse_timestamp,
+                       help="replay starting at this ISO-8601 time (UTC if no zone given)")
+    parser.add_argument("--replay-to-offset", dest="to_offset", type=int,
+                        help="stop the replay after this stream offset")
+    parser.add_argument("--replay-to-timestamp", dest="to_timestamp", type=parse_timestamp,
+                        help="stop the replay at messages published after this time")
+    parser.add_argument("--idle-timeout", type=int, default=REPLAY_IDLE_TIMEOUT,
+                        help="end the replay after this many seconds without messages")
+    workers = parser.add_mutually_exclusive_group()
+    workers.add_argument("--partitions", type=int, default=STREAM_PARTITIONS,
+                         help="supervise one worker per stream partition (default: STREAM_PARTITIONS)")
+    workers.add_argument("--partition", type=int,
+                         help="consume only this partition in the foreground (e.g. one worker per host)")
+    args = parser.parse_args(argv)
+    is_replay = args.from_offset is not None or args.from_timestamp is not None
+    if not is_replay and (args.to_offset is not None or args.to_timestamp is not None):
+        parser.error("--replay-to-* requires --replay-from-offset or --replay-from-timestamp")
+    if is_replay and args.partition is None and args.partitions:
+        parser.error("replay a partitioned stream one partition at a time with --partition")
+    args.replay = args if is_replay else None
+    return args
+
 # -----------------------------
 # Run Script
 # -----------------------------
 if __name__ == "__main__":
-    run_consumer()
+    args = parse_args(sys.argv[1:])
+    if args.partition is not None:
+        run_consumer(args.replay, partition=args.partition)
+    elif args.partitions:
+        run_supervisor(args.partitions)
+    else:
+        run_consumer(args.replay)
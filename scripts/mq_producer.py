@@ -1,9 +1,14 @@
 import os
 import json
-import time
 import pika
-import feedparser
 from dotenv import load_dotenv
+from dedup_store import LinkIndex
+from near_dup import NearDupIndex
+from mq_publisher import ConfirmedPublisher
+from feed_fetcher import fetch_feeds, load_feed_cache, save_feed_cache
+from feed_scheduler import FeedScheduler
+from stream_partitions import STREAM_PARTITIONS, partition_for
+import metrics
 
 # -----------------------------
 # Load .env
@@ -18,6 +23,14 @@ PORT = 5672
 QUEUE_NAME = 'RSS_FEED_QUEUE'
 HEARTBEAT = 60                    # heartbeat in seconds
 BLOCKED_TIMEOUT = 300             # blocked connection timeout
+PUBLISH_BATCH_SIZE = 500          # messages per confirmed batch
+
+# -----------------------------
+# Near-duplicate handling (MinHash/LSH, see near_dup.py)
+# -----------------------------
+# tag: publish copies with near_duplicate_of set; they stay in the raw archive but rss_clean, backfill.py
+# and the stream aggregators skip them. suppress: never publish copies. off: no screening.
+NEAR_DUP_MODE = os.getenv("NEAR_DUP_MODE", "tag")   # tag | suppress | off
 
 # -----------------------------
 # RSS Feed URLs
@@ -46,48 +59,70 @@ RSS_FEEDS = [
 ]
 
 # -----------------------------
-# File to track already processed links
+# Dedup index of already processed links (SQLite, TTL-evicted)
 # -----------------------------
-PROCESSED_FILE = "processed_rss_links.json"
-
 def load_processed_links():
-    if os.path.exists(PROCESSED_FILE):
-        with open(PROCESSED_FILE, "r") as f:
-            return set(json.load(f))
-    return set()
+    return LinkIndex()
 
 def save_processed_links(links):
-    with open(PROCESSED_FILE, "w") as f:
-        json.dump(list(links), f)
+    links.flush()
 
 # -----------------------------
-# RabbitMQ Connection with reconnection
+# Near-duplicate stage: tag syndicated/republished copies or drop them before publishing
 # -----------------------------
-def connect_rabbitmq():
-    while True:
-        try:
-            connection = pika.BlockingConnection(
-                pika.ConnectionParameters(
-                    host=RABBITMQ_NODE,
-                    port=PORT,
-                    heartbeat=HEARTBEAT,
-                    blocked_connection_timeout=BLOCKED_TIMEOUT
-                )
-            )
-            print(f"✅ Connected to RabbitMQ node: {RABBITMQ_NODE}:{PORT}")
-            return connection
-        except pika.exceptions.AMQPConnectionError:
-            print("❌ Connection failed, retrying in 5 seconds...")
-            time.sleep(5)
+def screen_near_duplicates(near_dups, entries):
+    """Return (entries to publish, links of suppressed near-duplicates)."""
+    if near_dups is None:
+        return entries, []
+    publish, suppressed = [], []
+    for entry, match in near_dups.screen(entries):
+        if match is None:
+            publish.append(entry)
+        elif NEAR_DUP_MODE == "suppress":
+            suppressed.append(entry["link"])
+        else:
+            publish.append({**entry, "near_duplicate_of": match["link"],
+                            "near_duplicate_similarity": match["similarity"]})
+    tagged = sum(1 for e in publish if "near_duplicate_of" in e)
+    if tagged or suppressed:
+        print(f"🪞 Near-duplicates: {tagged} tagged, {len(suppressed)} suppressed")
+    return publish, suppressed
 
 # -----------------------------
-# Fetch RSS Feeds
+# RabbitMQ Publisher (batched, publisher confirms)
 # -----------------------------
-def fetch_rss_entries():
+def connect_rabbitmq():
+    publisher = ConfirmedPublisher(
+        pika.ConnectionParameters(
+            host=RABBITMQ_NODE,
+            port=PORT,
+            heartbeat=HEARTBEAT,
+            blocked_connection_timeout=BLOCKED_TIMEOUT
+        ),
+        QUEUE_NAME,
+        queue_arguments={'x-queue-type': 'stream'},
+        partitions=STREAM_PARTITIONS
+    )
+    publisher.connect()
+    return publisher
+
+# -----------------------------
+# Fetch RSS Feeds (concurrent, conditional GET)
+# -----------------------------
+def fetch_rss_entries(feed_cache, feeds=RSS_FEEDS):
     entries = []
-    for url in RSS_FEEDS:
-        feed = feedparser.parse(url)
+    fetched = []
+    for result in fetch_feeds(feeds, feed_cache):
+        if result["status"] == "error":
+            print(f"❌ Failed to fetch {result['url']}: {result['error']}")
+            continue
+        fetched.append(result)
+        result["links"] = set()
+        if result["status"] == "not_modified":
+            continue
+        feed = result["feed"]
         for item in feed.entries:
+            result["links"].add(item.get("link"))
             entries.append({
                 "title": item.get("title"),
                 "summary": item.get("summary"),
@@ -95,63 +130,113 @@ def fetch_rss_entries():
                 "published": item.get("published"),
                 "source": feed.feed.get("title", "Unknown")
             })
-    return entries
+    unchanged = sum(1 for r in fetched if r["status"] == "not_modified")
+    print(f"📡 Fetched {len(fetched)}/{len(feeds)} feeds ({unchanged} unchanged, {len(entries)} entries)")
+    return entries, fetched
+
+def commit_feed_cache(feed_cache, fetched, failed_links=()):
+    failed_links = set(failed_links)
+    for result in fetched:
+        # Keep the old validators for feeds with unconfirmed entries so they are refetched
+        if result["links"] & failed_links:
+            continue
+        feed_cache[result["url"]] = result["cache"]
+    save_feed_cache(feed_cache)
+
+# -----------------------------
+# Publish a batch and keep only confirmed links
+# -----------------------------
+def publish_entries(publisher, entries, msg_id):
+    # With a partitioned stream, every source is routed to one partition (routing key = partition number)
+    messages = {}
+    for entry in entries:
+        message = {"msg_id": str(msg_id), "rss_entry": entry}
+        routing_key = str(partition_for(entry["source"])) if STREAM_PARTITIONS else None
+        messages.setdefault(routing_key, []).append((entry["link"], json.dumps(message).encode("utf-8")))
+        msg_id += 1
+
+    exchange = QUEUE_NAME if STREAM_PARTITIONS else ""
+    confirmed, failed = [], []
+    for routing_key, partition_messages in messages.items():
+        for start in range(0, len(partition_messages), PUBLISH_BATCH_SIZE):
+            with metrics.span("publish_batch"):
+                batch_confirmed, batch_failed = publisher.publish_batch(
+                    partition_messages[start:start + PUBLISH_BATCH_SIZE], exchange=exchange, routing_key=routing_key
+                )
+            confirmed.extend(batch_confirmed)
+            failed.extend(batch_failed)
 
-# -----------------------------
-# Send message with reconnection retry
-# -----------------------------
-def send_message(channel, message, connection):
-    try:
-        channel.basic_publish(exchange='', routing_key=QUEUE_NAME, body=json.dumps(message))
-        print("✅ Sent:", message["rss_entry"]["title"])
-    except (pika.exceptions.StreamLostError, pika.exceptions.AMQPConnectionError):
-        print("❌ RabbitMQ connection lost. Reconnecting...")
-        connection = connect_rabbitmq()
-        channel = connection.channel()
-        channel.queue_declare(queue=QUEUE_NAME, durable=True, arguments={'x-queue-type': 'stream'})
-        channel.basic_publish(exchange='', routing_key=QUEUE_NAME, body=json.dumps(message))
-        print("🔄 Reconnected and sent message:", message["rss_entry"]["title"])
-    return channel, connection
+    print(f"✅ Published {len(confirmed)} entries with broker confirms")
+    if failed:
+        print(f"❌ {len(failed)} entries were not confirmed and will be retried next cycle")
+    return confirmed, failed, msg_id
 
 # -----------------------------
 # Producer Logic
 # -----------------------------
 def run_rss_producer():
+    metrics.init_from_env()
     processed_links = load_processed_links()
-    connection = connect_rabbitmq()
-    channel = connection.channel()
-    channel.queue_declare(queue=QUEUE_NAME, durable=True, arguments={'x-queue-type': 'stream'})
+    near_dups = NearDupIndex() if NEAR_DUP_MODE != "off" else None
+    feed_cache = load_feed_cache()
+    scheduler = FeedScheduler(RSS_FEEDS)
+    publisher = connect_rabbitmq()
 
     msg_id = 1
     print(" [*] RSS Producer running. Press CTRL+C to stop.")
 
     try:
         while True:
-            entries = fetch_rss_entries()
-            new_entries = [e for e in entries if e["link"] not in processed_links]
+            # Sleep until the earliest feed is due (heartbeats keep being serviced meanwhile)
+            wait = scheduler.seconds_until_next()
+            if wait > 0:
+                publisher.sleep(wait)
+            due = scheduler.pop_due()
+
+            with metrics.span("fetch_cycle"):
+                entries, fetched = fetch_rss_entries(feed_cache, due)
+            new_entries, suppressed = screen_near_duplicates(near_dups, processed_links.filter_new(entries))
+            # Unchanged feeds keep the links of their last change alive in the dedup index
+            for result in fetched:
+                if result["status"] == "not_modified":
+                    processed_links.refresh_feed(result["url"])
+                else:
+                    processed_links.set_feed_links(result["url"], result["links"])
+            failed = []
+            # Suppressed copies count as processed so they are not screened again next cycle
+            processed_links.add_many(suppressed)
 
             if new_entries:
-                for entry in new_entries:
-                    message = {"msg_id": str(msg_id), "rss_entry": entry}
-                    channel, connection = send_message(channel, message, connection)
-                    processed_links.add(entry["link"])
-                    msg_id += 1
+                confirmed, failed, msg_id = publish_entries(publisher, new_entries, msg_id)
+                processed_links.add_many(confirmed)
+                if near_dups:
+                    near_dups.add_many(confirmed)
 
                 # Save processed links to file
                 save_processed_links(processed_links)
             else:
-                print("⚠️ No new RSS entries found. Waiting for next interval...")
+                print(f"⚠️ No new RSS entries in {len(due)} polled feeds.")
+
+            evicted = processed_links.evict_expired()
+            if evicted:
+                print(f"🧹 Evicted {evicted} expired links from dedup index")
+            if near_dups and near_dups.evict_expired():
+                print("🧹 Evicted expired articles from near-duplicate index")
+
+            # Only remember validators once the entries behind them were published
+            commit_feed_cache(feed_cache, fetched, failed)
 
-            # Wait 15 minutes before next fetch
-            time.sleep(15 * 60)
+            # Learn each polled feed's interval; failed fetches and unconfirmed entries back off
+            scheduler.record_round(due, fetched, failed)
+            scheduler.save()
 
     except KeyboardInterrupt:
         print(" [*] Producer stopped by user.")
     finally:
-        save_processed_links(processed_links)
-        if connection.is_open:
-            connection.close()
-            print("✅ RabbitMQ connection closed safely.")
+        processed_links.close()
+        if near_dups:
+            near_dups.close()
+        publisher.close()
 
 # -----------------------------
 # Run Script
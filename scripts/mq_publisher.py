@@ -0,0 +1,205 @@
+"""
+Batched RabbitMQ publishing with asynchronous publisher confirms
+
+- Pipelines many basic_publish frames per round trip on a SelectConnection
+- Tracks outstanding delivery tags and resolves them from Basic.Ack / Basic.Nack (incl. multiple=True)
+- publish_batch() returns which message keys the broker confirmed and which it did not,
+  so callers only mark work as done after a confirm
+- A dropped connection fails the unconfirmed remainder of the batch instead of losing it silently;
+  the next batch reconnects and redeclares the queue outside the per-message path
+"""
+
+import time
+import hashlib
+import pika
+import metrics
+from stream_partitions import declare_partitions_async
+
+# -----------------------------
+# Publisher Configuration
+# -----------------------------
+MAX_IN_FLIGHT = 1000              # unconfirmed messages allowed on the wire
+CONFIRM_TIMEOUT = 30              # seconds to wait for the confirms of one batch
+CONNECT_TIMEOUT = 30              # seconds to wait for connection + channel + confirm.select
+RECONNECT_DELAY = 5               # seconds between reconnect attempts
+
+PUBLISHED = metrics.counter("published_messages_total", "Messages published, by confirm result")
+CONFIRM_SECONDS = metrics.histogram("publish_confirm_seconds", "Time from basic_publish to the broker confirm")
+
+def message_id_for(key):
+    # Stable id per logical message so re-publishes after a lost confirm can be deduplicated downstream
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+class ConfirmedPublisher:
+    def __init__(self, parameters, queue_name, queue_arguments=None,
+                 max_in_flight=MAX_IN_FLIGHT, confirm_timeout=CONFIRM_TIMEOUT, partitions=0):
+        self.parameters = parameters
+        self.queue_name = queue_name
+        self.queue_arguments = queue_arguments or {}
+        self.partitions = partitions  # > 0: queue_name is a partitioned stream (see stream_partitions.py)
+        self.max_in_flight = max_in_flight
+        self.confirm_timeout = confirm_timeout
+        self._connection = None
+        self._channel = None
+        self._ready = False
+        self._closed = True
+        self._next_tag = 0
+        self._outstanding = {}    # delivery tag -> message key
+        self._sent_at = {}        # delivery tag -> perf_counter() at publish
+        self._acked = []
+        self._nacked = []
+
+    # -----------------------------
+    # Connection lifecycle
+    # -----------------------------
+    def _on_connection_open(self, connection):
+        connection.channel(on_open_callback=self._on_channel_open)
+
+    def _on_connection_error(self, connection, error):
+        print(f"❌ RabbitMQ connection failed: {error}")
+        self._closed = True
+
+    def _on_connection_closed(self, connection, reason):
+        if self._outstanding:
+            print(f"❌ RabbitMQ connection closed with {len(self._outstanding)} unconfirmed messages: {reason}")
+        self._closed = True
+        self._ready = False
+
+    def _on_channel_open(self, channel):
+        self._channel = channel
+        channel.add_on_close_callback(lambda ch, reason: self._on_connection_closed(self._connection, reason))
+        select_confirms = lambda: channel.confirm_delivery(
+            ack_nack_callback=self._on_confirm,
+            callback=self._on_confirm_selected
+        )
+        if self.partitions:
+            declare_partitions_async(channel, self.queue_name, self.partitions, select_confirms)
+            return
+        channel.queue_declare(
+            queue=self.queue_name,
+            durable=True,
+            arguments=self.queue_arguments,
+            callback=lambda frame: select_confirms()
+        )
+
+    def _on_confirm_selected(self, frame):
+        self._next_tag = 0
+        self._ready = True
+
+    def _pump(self, done, timeout):
+        deadline = time.monotonic() + timeout
+        ioloop = self._connection.ioloop
+        while not done() and not self._closed and time.monotonic() < deadline:
+            ioloop.poll()
+            ioloop.process_timeouts()
+        return done()
+
+    def connect(self):
+        while True:
+            self._closed = False
+            self._ready = False
+            self._outstanding.clear()
+            self._connection = pika.SelectConnection(
+                self.parameters,
+                on_open_callback=self._on_connection_open,
+                on_open_error_callback=self._on_connection_error,
+                on_close_callback=self._on_connection_closed
+            )
+            if self._pump(lambda: self._ready, CONNECT_TIMEOUT):
+                print(f"✅ Connected to RabbitMQ node: {self.parameters.host}:{self.parameters.port} (confirms on)")
+                return
+            self._abort()
+            print(f"❌ Connection failed, retrying in {RECONNECT_DELAY} seconds...")
+            time.sleep(RECONNECT_DELAY)
+
+    def _abort(self):
+        if self._connection is not None and not self._connection.is_closed:
+            try:
+                self._connection.close()
+                self._pump(lambda: self._connection.is_closed, 5)
+            except pika.exceptions.AMQPError:
+                pass
+        self._closed = True
+        self._ready = False
+
+    def sleep(self, seconds):
+        # Idle between cycles while still servicing heartbeats on the open connection
+        deadline = time.monotonic() + seconds
+        if not self._closed:
+            self._pump(lambda: False, seconds)
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+
+    def close(self):
+        self._abort()
+        print("✅ RabbitMQ connection closed safely.")
+
+    # -----------------------------
+    # Confirms
+    # -----------------------------
+    def _on_confirm(self, frame):
+        method = frame.method
+        if method.multiple:
+            tags = [t for t in self._outstanding if t <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._outstanding else []
+        target = self._acked if isinstance(method, pika.spec.Basic.Ack) else self._nacked
+        now = time.perf_counter()
+        for tag in tags:
+            target.append(self._outstanding.pop(tag))
+            CONFIRM_SECONDS.observe(now - self._sent_at.pop(tag, now))
+
+    # -----------------------------
+    # Batched publish
+    # -----------------------------
+    def publish_batch(self, messages, exchange="", routing_key=None):
+        """
+        Publish `messages`, an iterable of (key, body_bytes) pairs, and wait for their confirms.
+        Returns (confirmed_keys, failed_keys). Failed keys were nacked, timed out or were
+        in flight when the connection dropped, and should be retried by the caller.
+        """
+        routing_key = routing_key or self.queue_name
+        self._acked, self._nacked = [], []
+        failed = []
+        if self._closed or not self._ready:
+            self.connect()
+
+        for key, body in messages:
+            if self._closed:
+                failed.append(key)
+                continue
+            # Keep at most max_in_flight unconfirmed messages on the wire
+            if len(self._outstanding) >= self.max_in_flight:
+                self._pump(lambda: len(self._outstanding) < self.max_in_flight // 2, self.confirm_timeout)
+                if self._closed:
+                    failed.append(key)
+                    continue
+            self._next_tag += 1
+            self._outstanding[self._next_tag] = key
+            self._sent_at[self._next_tag] = time.perf_counter()
+            self._channel.basic_publish(
+                exchange=exchange,
+                routing_key=routing_key,
+                body=body,
+                properties=pika.BasicProperties(
+                    content_type="application/json",
+                    delivery_mode=pika.DeliveryMode.Persistent,
+                    message_id=message_id_for(key),
+                    timestamp=int(time.time())
+                )
+            )
+
+        self._pump(lambda: not self._outstanding, self.confirm_timeout)
+        if self._outstanding:
+            # Unconfirmed after timeout or connection loss: report as failed and start clean next batch
+            failed.extend(self._outstanding.values())
+            self._outstanding.clear()
+            self._abort()
+        self._sent_at.clear()
+
+        failed.extend(self._nacked)
+        PUBLISHED.inc(len(self._acked), result="confirmed")
+        if failed:
+            PUBLISHED.inc(len(failed), result="failed")
+        return list(self._acked), failed
@@ -0,0 +1,179 @@
+"""
+Near-duplicate article detection for the producer (MinHash + LSH)
+
+- Title and summary are normalized (HTML, URLs and punctuation removed) and split into word 3-gram shingles
+- A NUM_PERM-value MinHash signature is computed with NumPy over all shingles at once
+- Signatures are split into BANDS bands of ROWS values; each band hashes to one bucket key in a persisted
+  SQLite LSH index, so candidates are the articles sharing at least one band (about 0.7 Jaccard and up)
+- Candidates are confirmed by the signature agreement (estimated Jaccard) >= SIMILARITY_THRESHOLD
+- Articles are only indexed once published, and entries expire after TTL_DAYS like the link index
+"""
+
+import re
+import time
+import sqlite3
+import hashlib
+import numpy as np
+from dedup_store import link_hash
+
+# -----------------------------
+# Near-Dup Configuration
+# -----------------------------
+NEAR_DUP_DB_FILE = "near_dup_index.sqlite"
+NUM_PERM = 128                    # MinHash values per signature
+BANDS = 16                        # LSH bands (BANDS * ROWS == NUM_PERM)
+ROWS = 8                          # signature values per band
+SIMILARITY_THRESHOLD = 0.8        # estimated Jaccard needed to call two articles near-duplicates
+SHINGLE_SIZE = 3                  # words per shingle
+MIN_TOKENS = 8                    # shorter texts are never treated as near-duplicates
+TTL_DAYS = 14
+QUERY_CHUNK = 500
+SEED = 1                          # fixed: signatures in the index must stay comparable across runs
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+
+TAG_RE = re.compile(r"<[^>]+>")
+URL_RE = re.compile(r"http\S+|www\.\S+")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = WORD_RE.findall(URL_RE.sub(" ", TAG_RE.sub(" ", text.lower())))
+    if len(words) < MIN_TOKENS:
+        return set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _hash32(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+def _signed64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big", signed=True)
+
+# -----------------------------
+# MinHash
+# -----------------------------
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, (1 << 32) - 1, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, (1 << 32) - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set):
+        hashes = np.fromiter((_hash32(s) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+        # Universal hashing (a*x + b) mod p for every permutation x shingle pair, then the column minimum
+        permuted = ((hashes[:, None] * self.a[None, :] + self.b[None, :]) % MERSENNE_PRIME) & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+def band_keys(signature, bands=BANDS, rows=ROWS):
+    return [_signed64(bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes())
+            for band in range(bands)]
+
+def similarity(sig_a, sig_b):
+    return float(np.mean(sig_a == sig_b))
+
+# -----------------------------
+# Persisted LSH index
+# -----------------------------
+class NearDupIndex:
+    def __init__(self, path=NEAR_DUP_DB_FILE, threshold=SIMILARITY_THRESHOLD, ttl_days=TTL_DAYS):
+        self.path = path
+        self.threshold = threshold
+        self.ttl_seconds = int(ttl_days * 86400)
+        self.hasher = MinHasher()
+        self._staged = {}             # link -> (doc_id, signature, band keys) from the last screen()
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " doc_id INTEGER PRIMARY KEY,"
+            " link TEXT NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " added INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lsh_buckets ("
+            " band_key INTEGER NOT NULL,"
+            " doc_id INTEGER NOT NULL,"
+            " PRIMARY KEY (band_key, doc_id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_added ON documents(added)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_lsh_buckets_doc ON lsh_buckets(doc_id)")
+        self._conn.commit()
+
+    def _stored_candidates(self, keys):
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            "SELECT d.doc_id, d.link, d.signature FROM documents d WHERE d.doc_id IN ("
+            f" SELECT doc_id FROM lsh_buckets WHERE band_key IN ({placeholders}))", keys
+        )
+        return [(doc_id, link, np.frombuffer(sig, dtype=np.uint32)) for doc_id, link, sig in rows]
+
+    def screen(self, entries):
+        """
+        Return [(entry, match)] in input order, where match is None for original articles or
+        {"link", "similarity"} of the earlier article it nearly duplicates. Earlier entries of
+        the same batch count as well. Originals are staged for add_many() after publishing.
+        """
+        self._staged = {}
+        batch_buckets = {}            # band key -> [(link, signature)] for this batch
+        results = []
+        for entry in entries:
+            link = entry.get("link")
+            doc_shingles = shingles(f"{entry.get('title') or ''} {entry.get('summary') or ''}")
+            if not link or not doc_shingles:
+                results.append((entry, None))
+                continue
+            doc_id = link_hash(link)
+            signature = self.hasher.signature(doc_shingles)
+            keys = band_keys(signature)
+
+            candidates = [(d, l, s) for d, l, s in self._stored_candidates(keys) if d != doc_id]
+            for key in keys:
+                candidates.extend((None, l, s) for l, s in batch_buckets.get(key, ()) if l != link)
+            best = None
+            for _, cand_link, cand_sig in candidates:
+                score = similarity(signature, cand_sig)
+                if score >= self.threshold and (best is None or score > best["similarity"]):
+                    best = {"link": cand_link, "similarity": round(score, 3)}
+
+            results.append((entry, best))
+            if best is None:
+                self._staged[link] = (doc_id, signature, keys)
+                for key in keys:
+                    batch_buckets.setdefault(key, []).append((link, signature))
+        return results
+
+    def add_many(self, links):
+        """Index the staged originals among `links` (the ones that were actually published)."""
+        now = int(time.time())
+        docs, buckets = [], []
+        for link in links:
+            staged = self._staged.pop(link, None)
+            if staged is None:
+                continue
+            doc_id, signature, keys = staged
+            docs.append((doc_id, link, signature.tobytes(), now))
+            buckets.extend((key, doc_id) for key in keys)
+        if not docs:
+            return 0
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (doc_id, link, signature, added) VALUES (?, ?, ?, ?)", docs
+            )
+            self._conn.executemany("INSERT OR IGNORE INTO lsh_buckets (band_key, doc_id) VALUES (?, ?)", buckets)
+        return len(docs)
+
+    def evict_expired(self):
+        cutoff = int(time.time()) - self.ttl_seconds
+        with self._conn:
+            expired = [r[0] for r in self._conn.execute("SELECT doc_id FROM documents WHERE added < ?", (cutoff,))]
+            for start in range(0, len(expired), QUERY_CHUNK):
+                chunk = expired[start:start + QUERY_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                self._conn.execute(f"DELETE FROM lsh_buckets WHERE doc_id IN ({placeholders})", chunk)
+                self._conn.execute(f"DELETE FROM documents WHERE doc_id IN ({placeholders})", chunk)
+        return len(expired)
+
+    def close(self):
+        self._conn.close()
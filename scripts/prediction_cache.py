@@ -0,0 +1,102 @@
+"""
+Persistent DistilBERT prediction cache for rss_ml.py
+
+- SQLite table keyed by a 64-bit hash of (model identifier, clean_text)
+- Only cache misses are sent to the model; hits skip inference entirely
+- The stored model identifier is checked on open: a different model/revision/backend clears the cache
+- Size-bounded: least recently used entries are evicted once MAX_ENTRIES is exceeded
+"""
+
+import time
+import sqlite3
+import hashlib
+
+# ---------- Cache Configuration ----------
+CACHE_DB_FILE = "distilbert_prediction_cache.sqlite"
+MAX_ENTRIES = 1_000_000           # rows kept before LRU eviction
+EVICT_TO_FRACTION = 0.9           # evict down to this share of MAX_ENTRIES
+QUERY_CHUNK = 500                 # host parameters per IN (...) lookup
+
+class PredictionCache:
+    def __init__(self, model_id, path=CACHE_DB_FILE, max_entries=MAX_ENTRIES):
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Callers serialize access (see sentiment_service.py), so the handle may move between threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            " text_hash INTEGER PRIMARY KEY,"
+            " label TEXT NOT NULL,"
+            " score REAL NOT NULL,"
+            " last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_predictions_last_used ON predictions(last_used)")
+        self._check_model()
+
+    def _check_model(self):
+        row = self._conn.execute("SELECT value FROM cache_meta WHERE key = 'model_id'").fetchone()
+        with self._conn:
+            if row is not None and row[0] != self.model_id:
+                print(f"🔄 Model changed ({row[0]} -> {self.model_id}), clearing prediction cache")
+                self._conn.execute("DELETE FROM predictions")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache_meta (key, value) VALUES ('model_id', ?)", (self.model_id,)
+            )
+
+    def _key(self, text):
+        digest = hashlib.blake2b(f"{self.model_id}\0{text}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "big", signed=True)
+
+    def get_many(self, texts):
+        """Return a list aligned with `texts`: {"label", "score"} for hits, None for misses."""
+        keys = [self._key(text) for text in texts]
+        found = {}
+        unique = list(set(keys))
+        for start in range(0, len(unique), QUERY_CHUNK):
+            chunk = unique[start:start + QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT text_hash, label, score FROM predictions WHERE text_hash IN ({placeholders})", chunk
+            )
+            for text_hash, label, score in rows:
+                found[text_hash] = {"label": label, "score": score}
+
+        now = int(time.time())
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE predictions SET last_used = ? WHERE text_hash = ?", [(now, k) for k in found]
+            )
+        results = [found.get(key) for key in keys]
+        hits = sum(1 for r in results if r is not None)
+        self.hits += hits
+        self.misses += len(results) - hits
+        return results
+
+    def put_many(self, texts, predictions):
+        now = int(time.time())
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO predictions (text_hash, label, score, last_used) VALUES (?, ?, ?, ?)",
+                [(self._key(t), p["label"], float(p["score"]), now) for t, p in zip(texts, predictions)]
+            )
+
+    def evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        if count <= self.max_entries:
+            return 0
+        excess = count - int(self.max_entries * EVICT_TO_FRACTION)
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM predictions WHERE text_hash IN ("
+                " SELECT text_hash FROM predictions ORDER BY last_used LIMIT ?)", (excess,)
+            )
+        return excess
+
+    def close(self):
+        self.evict()
+        self._conn.close()
@@ -0,0 +1,186 @@
+"""
+Cheap-first sentiment cascade: TextBlob triage, DistilBERT only for uncertain articles
+
+- Every article is scored with the memoized TextBlob engine (title and summary)
+- Articles are routed to DistilBERT when the lexicon result is uncertain:
+    low_polarity : |mean(title, summary polarity)| < UNCERTAIN_MARGIN
+    conflict     : title and summary lean opposite ways (one positive, the other negative)
+  The rest keep the TextBlob decision; TextBlob-neutral rows are always routed, so every accepted
+  row is positive/negative, the same label space as DistilBERT (SST-2)
+- One unified row per article goes to FACT_RSS_SENTIMENT_UNIFIED, with the model that produced it
+- Opt-in: the dbt marts still aggregate FACT_RSS_SENTIMENT (rss_sentiment.py) and do not read the unified
+  table. Run it with `python rss_cascade.py`, POST /jobs/cascade, or EXTRA_SENTIMENT_JOBS=cascade in
+  dbt_hourly_scheduler.py, which then runs it after the main sentiment job
+- Rows are streamed from Snowflake in chunks and merged chunk by chunk (see snowflake_batches.py)
+- `python eval_cascade.py` measures the throughput gain and agreement with full-DistilBERT labels offline
+"""
+
+import os
+os.environ["CUDA_VISIBLE_DEVICES"] = ""  # Force CPU
+
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from sentiment_engine import SentimentEngine, label_scores
+from prediction_cache import PredictionCache
+from snowflake_batches import stream_query
+import rss_ml
+from rss_sentiment import connect_snowflake
+import metrics
+
+# -------------------------------
+# Cascade Configuration
+# -------------------------------
+UNCERTAIN_MARGIN = float(os.getenv("CASCADE_MARGIN", "0.25"))   # |polarity| below this goes to DistilBERT
+TEXTBLOB_MODEL = "textblob"
+DISTILBERT_MODEL = "distilbert"
+TARGET_TABLE = "FACT_RSS_SENTIMENT_UNIFIED"
+DELTA_TABLE = "FACT_RSS_SENTIMENT_UNIFIED_DELTA"   # session-scoped temp table for one chunk
+READ_CHUNK_ROWS = 10_000
+
+ROUTED = metrics.counter("cascade_rows_total", "Cascade rows by deciding model and route reason")
+
+INCREMENTAL_QUERY = f"""
+SELECT e.EVENT_ID, e.TITLE, e.SUMMARY, e.SOURCE_ID, e.PUBLISHED_AT
+FROM FACT_RSS_ENRICHED e
+WHERE NOT EXISTS (
+    SELECT 1 FROM {TARGET_TABLE} u WHERE u.EVENT_ID = e.EVENT_ID
+)
+"""
+
+# -------------------------------
+# Triage and cascade
+# -------------------------------
+def triage(title_scores, summary_scores, margin=UNCERTAIN_MARGIN):
+    """Return (combined polarity, route reason per row: "" | "low_polarity" | "conflict")."""
+    title_scores = np.asarray(title_scores, dtype=np.float64)
+    summary_scores = np.asarray(summary_scores, dtype=np.float64)
+    title_labels = label_scores(title_scores)
+    summary_labels = label_scores(summary_scores)
+    combined = (title_scores + summary_scores) / 2.0
+    conflict = ((title_labels == "positive") & (summary_labels == "negative")) | \
+               ((title_labels == "negative") & (summary_labels == "positive"))
+    # TextBlob-neutral rows are always routed, so kept rows stay in DistilBERT's positive/negative label space
+    low = (np.abs(combined) < margin) | (label_scores(combined) == "neutral")
+    reasons = np.select([conflict, low], ["conflict", "low_polarity"], default="")
+    return combined, reasons
+
+def cascade_predict(titles, summaries, engine, cache, sentiment_model=None, margin=UNCERTAIN_MARGIN):
+    """
+    Score articles through the cascade; returns (DataFrame aligned with the inputs, sentiment_model).
+    Columns: sentiment_label, sentiment_score (signed, -1..1), confidence, model, route_reason.
+    """
+    titles, summaries = rss_ml.fill_text(titles), rss_ml.fill_text(summaries)
+    combined, reasons = triage(engine.polarity(titles), engine.polarity(summaries), margin)
+    out = pd.DataFrame({
+        "sentiment_label": label_scores(combined),
+        "sentiment_score": combined,
+        "confidence": np.minimum(np.abs(combined), 1.0),
+        "model": TEXTBLOB_MODEL,
+        "route_reason": reasons,
+    })
+
+    routed = np.flatnonzero(reasons != "")
+    if len(routed):
+        texts = rss_ml.article_texts([titles[i] for i in routed], [summaries[i] for i in routed])
+        results, sentiment_model = rss_ml.predict(texts, cache, sentiment_model)
+        labels = [r["label"].lower() for r in results]
+        scores = np.array([r["score"] for r in results])
+        out.loc[routed, "sentiment_label"] = labels
+        out.loc[routed, "sentiment_score"] = np.where(np.array(labels) == "negative", -scores, scores)
+        out.loc[routed, "confidence"] = scores
+        out.loc[routed, "model"] = DISTILBERT_MODEL
+    ROUTED.inc(len(out) - len(routed), model=TEXTBLOB_MODEL, reason="")
+    for reason in ("conflict", "low_polarity"):
+        ROUTED.inc(int((reasons == reason).sum()), model=DISTILBERT_MODEL, reason=reason)
+    return out, sentiment_model
+
+# -------------------------------
+# Write the unified predictions
+# -------------------------------
+def ensure_target_table(conn):
+    conn.cursor().execute(f"""
+        CREATE TABLE IF NOT EXISTS {TARGET_TABLE} (
+            EVENT_ID VARCHAR(32),
+            TITLE VARCHAR,
+            SUMMARY VARCHAR,
+            SOURCE_ID VARCHAR(32),
+            PUBLISHED_AT TIMESTAMP_TZ(9),
+            SENTIMENT_LABEL VARCHAR,
+            SENTIMENT_SCORE FLOAT,
+            CONFIDENCE FLOAT,
+            MODEL VARCHAR,
+            MODEL_VERSION VARCHAR,
+            ROUTE_REASON VARCHAR,
+            SCORED_AT TIMESTAMP_LTZ(9)
+        )
+    """)
+
+def write_results(conn, df):
+    from snowflake.connector.pandas_tools import write_pandas
+    with metrics.span("snowflake_write", table=TARGET_TABLE):
+        success, nchunks, nrows, _ = write_pandas(
+            conn, df, DELTA_TABLE, auto_create_table=True, table_type="temporary",
+            overwrite=True, quote_identifiers=False
+        )
+        if not success:
+            print("❌ Failed to stage cascade predictions in Snowflake")
+            return 0
+
+        columns = ", ".join(df.columns)
+        values = ", ".join(f"d.{col}" for col in df.columns)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            MERGE INTO {TARGET_TABLE} t
+            USING {DELTA_TABLE} d
+                ON t.EVENT_ID = d.EVENT_ID
+            WHEN NOT MATCHED THEN
+                INSERT ({columns}, SCORED_AT)
+                VALUES ({values}, CURRENT_TIMESTAMP())
+        """)
+        return cursor.fetchone()[0]
+
+def to_output(df, predictions):
+    out = df[["EVENT_ID", "TITLE", "SUMMARY", "SOURCE_ID", "PUBLISHED_AT"]].reset_index(drop=True)
+    out = pd.concat([out, predictions.reset_index(drop=True)], axis=1)
+    out.columns = [c.upper() for c in out.columns]
+    out["MODEL_VERSION"] = np.where(out["MODEL"] == DISTILBERT_MODEL, rss_ml.MODEL_ID, TEXTBLOB_MODEL)
+    return out
+
+# -------------------------------
+# Run
+# -------------------------------
+def run_job(conn, engine, cache, sentiment_model=None, margin=UNCERTAIN_MARGIN):
+    """Cascade-score unscored articles on an open connection; returns (rows merged, sentiment_model)."""
+    ensure_target_table(conn)
+    merged = 0
+    for chunk in stream_query(conn, INCREMENTAL_QUERY, chunk_rows=READ_CHUNK_ROWS):
+        predictions, sentiment_model = cascade_predict(
+            chunk["TITLE"].tolist(), chunk["SUMMARY"].tolist(), engine, cache, sentiment_model, margin
+        )
+        merged += write_results(conn, to_output(chunk, predictions))
+    if merged == 0:
+        print("⚠️ No unscored rows found. Nothing to do.")
+    return merged, sentiment_model
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TextBlob -> DistilBERT sentiment cascade.")
+    parser.add_argument("--margin", type=float, default=UNCERTAIN_MARGIN,
+                        help="route rows with |TextBlob polarity| below this to DistilBERT")
+    args = parser.parse_args(argv)
+
+    metrics.init_from_env()
+    conn = connect_snowflake()
+    engine = SentimentEngine()
+    cache = PredictionCache(rss_ml.MODEL_ID)
+    try:
+        rows, _ = run_job(conn, engine, cache, margin=args.margin)
+        print(f"🎯 Cascade finished: {rows} rows written to {TARGET_TABLE}")
+    finally:
+        cache.close()
+        engine.close()
+        conn.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
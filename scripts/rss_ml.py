@@ -5,48 +5,74 @@ Author: ChatGPT (CPU-safe, chunked DistilBERT)
 Upgraded Features:
 - Processes dataset in chunks to reduce RAM usage
 - CPU-only execution to prevent WinError 1114
-- Truncates FACT_RSS_PREDICTIONS before writing new results
+- Streams articles from Snowflake in Arrow-backed chunks and writes each scored chunk to a swap
+  table, which replaces FACT_RSS_PREDICTIONS atomically once every chunk is written
 - Ensures column names are quoted for Snowflake compatibility
+- Caches predictions on disk by clean_text + model id, so only new texts reach DistilBERT
+- Length-bucketed, token-budget batching with optional int8 / ONNX Runtime CPU backends
 """
 
 import os
 os.environ["CUDA_VISIBLE_DEVICES"] = ""  # Force CPU
 
-import pandas as pd
 import re
-import snowflake.connector
-from cryptography.hazmat.primitives import serialization
-from transformers import pipeline
-from snowflake.connector.pandas_tools import write_pandas
+import time
+import pandas as pd
+from prediction_cache import PredictionCache
+from snowflake_batches import stream_query
+from inference_backend import SentimentBackend, backend_model_id, DEFAULT_BACKEND
+import metrics
+
+# ---------- Model ----------
+# Pinned explicitly (same model the default "sentiment-analysis" pipeline resolves to),
+# so the prediction cache can tell when the model changes.
+MODEL_NAME = "distilbert-base-uncased-finetuned-sst-2-english"
+MODEL_REVISION = "af0f99b"
+BACKEND = DEFAULT_BACKEND          # pytorch | int8 | onnx (env SENTIMENT_BACKEND)
+MODEL_ID = backend_model_id(MODEL_NAME, MODEL_REVISION, BACKEND)
+CHUNK_SIZE = 2000                  # texts per length-sorted chunk; batches inside follow the token budget
+READ_CHUNK_ROWS = 10_000           # articles read, scored and written per streamed chunk
+TARGET_TABLE = "FACT_RSS_PREDICTIONS"
+SWAP_TABLE = "FACT_RSS_PREDICTIONS_SWAP"   # filled chunk by chunk, then swapped with TARGET_TABLE
+
+ROWS_SCORED = metrics.counter("inference_rows_total", "Rows scored, by model")
+ROWS_PER_SECOND = metrics.histogram("inference_rows_per_second", "Scoring throughput per chunk",
+                                    buckets=metrics.RATE_BUCKETS)
+CACHE_LOOKUPS = metrics.counter("prediction_cache_lookups_total", "Prediction cache lookups, by result")
 
 # ---------- Snowflake Connection ----------
-key_path = r"rsa_key.p8"
-with open(key_path, "rb") as key_file:
-    private_key = serialization.load_pem_private_key(key_file.read(), password=None)
-
-conn = snowflake.connector.connect(
-    user="Username",
-    account="Snowflake Account Name",
-    private_key=private_key,
-    authenticator="snowflake_jwt",
-    warehouse="RSS_WH",
-    database="RSS_DB",
-    schema="RSS_SCH",
-    client_session_keep_alive=True,
-    insecure_mode=True
-)
-
-# ---------- Fetch Full Dataset ----------
-query = """
+# Snowflake and cryptography are imported where they are used, so predict() and eval_cascade.py
+# work without snowflake-connector-python installed
+def connect_snowflake():
+    import snowflake.connector
+    from cryptography.hazmat.primitives import serialization
+    key_path = r"rsa_key.p8"
+    with open(key_path, "rb") as key_file:
+        private_key = serialization.load_pem_private_key(key_file.read(), password=None)
+
+    return snowflake.connector.connect(
+        user="Username",
+        account="Snowflake Account Name",
+        private_key=private_key,
+        authenticator="snowflake_jwt",
+        warehouse="RSS_WH",
+        database="RSS_DB",
+        schema="RSS_SCH",
+        client_session_keep_alive=True,
+        insecure_mode=True
+    )
+
+# ---------- Stream Full Dataset ----------
+QUERY = """
 SELECT EVENT_ID, TITLE, SUMMARY, SOURCE_ID, PUBLISHED_AT
-FROM FACT_RSS_ENRICHED LIMIT 5000;
+FROM FACT_RSS_ENRICHED
 """
-df = pd.read_sql(query, conn)
-df.columns = [c.lower() for c in df.columns]
 
-# ---------- Combine and Clean Text ----------
-df["text"] = df["title"].fillna('') + ' ' + df["summary"].fillna('')
+def stream_articles(conn, chunk_rows=READ_CHUNK_ROWS):
+    # The next chunk downloads while DistilBERT works on the current one
+    return stream_query(conn, QUERY, chunk_rows=chunk_rows, lowercase=True)
 
+# ---------- Combine and Clean Text ----------
 def clean_text(text):
     text = text.lower()
     text = re.sub(r"http\S+|www\S+", "", text)
@@ -54,71 +80,130 @@ def clean_text(text):
     text = re.sub(r"\s+", " ", text).strip()
     return text
 
-df["clean_text"] = df["text"].apply(clean_text)
+def fill_text(values):
+    # Missing titles/summaries arrive as None or NaN; NaN would otherwise become the text "nan"
+    return pd.Series(values, dtype=object).fillna('').tolist()
 
-# ---------- Load DistilBERT Sentiment Pipeline ----------
-print("Loading DistilBERT sentiment model (CPU only)...")
-sentiment_model = pipeline("sentiment-analysis", device=-1)  # CPU
+def article_texts(titles, summaries):
+    """Cleaned "title summary" text per article, as prepare_text() builds it."""
+    return [clean_text(f"{t} {s}") for t, s in zip(fill_text(titles), fill_text(summaries))]
 
-# ---------- Predict Sentiment in Chunks ----------
-print("Predicting sentiments using DistilBERT (chunked)...")
-chunk_size = 500
-all_results = []
+def prepare_text(df):
+    df["text"] = df["title"].fillna('') + ' ' + df["summary"].fillna('')
+    df["clean_text"] = df["text"].apply(clean_text)
+    return df
 
-for start in range(0, len(df), chunk_size):
-    end = start + chunk_size
-    chunk_texts = df["clean_text"].iloc[start:end].tolist()
-    chunk_results = sentiment_model(chunk_texts, truncation=True, batch_size=16)
-    all_results.extend(chunk_results)
-    print(f"Processed rows {start} to {min(end, len(df))}")
+# ---------- Load DistilBERT Sentiment Pipeline ----------
+def load_model():
+    print(f"Loading DistilBERT sentiment model (CPU only, {BACKEND} backend)...")
+    return SentimentBackend(MODEL_NAME, MODEL_REVISION, BACKEND)
+
+# ---------- Predict Sentiment in Chunks (cache misses only) ----------
+def predict(texts, cache, sentiment_model=None):
+    """Return (results, sentiment_model); the model is only loaded when there are cache misses."""
+    results = cache.get_many(texts)
+    misses = {}
+    for i, (text, result) in enumerate(zip(texts, results)):
+        if result is None:
+            misses.setdefault(text, []).append(i)
+    CACHE_LOOKUPS.inc(len(texts) - sum(len(v) for v in misses.values()), result="hit")
+    CACHE_LOOKUPS.inc(sum(len(v) for v in misses.values()), result="miss")
+
+    miss_texts = list(misses)
+    if miss_texts and sentiment_model is None:
+        sentiment_model = load_model()
+    for start in range(0, len(miss_texts), CHUNK_SIZE):
+        chunk_texts = miss_texts[start:start + CHUNK_SIZE]
+        started = time.perf_counter()
+        chunk_results = sentiment_model(chunk_texts, truncation=True)
+        ROWS_SCORED.inc(len(chunk_texts), model="distilbert")
+        ROWS_PER_SECOND.observe(len(chunk_texts) / max(time.perf_counter() - started, 1e-9), model="distilbert")
+        cache.put_many(chunk_texts, chunk_results)
+        for text, result in zip(chunk_texts, chunk_results):
+            for i in misses[text]:
+                results[i] = result
+    return results, sentiment_model
 
 # ---------- Map Predictions ----------
-labels = [r["label"].upper() for r in all_results]
-scores = [r["score"] for r in all_results]
-
 label_map = {"POSITIVE": 1, "NEGATIVE": -1, "NEUTRAL": 0}
-df["PREDICTED_LABEL"] = [label_map.get(lbl, 0) for lbl in labels]
-df["PREDICTED_SENTIMENT"] = labels
-df["CONFIDENCE"] = scores
-
-# ---------- Prepare DataFrame for Snowflake ----------
-df_pred = df[[
-    "event_id",
-    "title",
-    "summary",
-    "source_id",
-    "published_at",
-    "PREDICTED_LABEL",
-    "PREDICTED_SENTIMENT",
-    "CONFIDENCE"
-]].copy()
-
-# ---------- Truncate existing table ----------
-print("Truncating FACT_RSS_PREDICTIONS before inserting new results...")
-conn.cursor().execute("TRUNCATE TABLE FACT_RSS_PREDICTIONS")
 
-# ---------- Write Predictions Back to Snowflake ----------
-success, nchunks, nrows, _ = write_pandas(
-    conn,
-    df_pred,
-    "FACT_RSS_PREDICTIONS",
-    quote_identifiers=False  # ensures exact column names are preserved
-)
-print(f"✅ Snowflake write success: {success}, rows written: {nrows}")
+def apply_predictions(df, all_results):
+    labels = [r["label"].upper() for r in all_results]
+    scores = [r["score"] for r in all_results]
+
+    df["PREDICTED_LABEL"] = [label_map.get(lbl, 0) for lbl in labels]
+    df["PREDICTED_SENTIMENT"] = labels
+    df["CONFIDENCE"] = scores
 
-conn.close()
+    # ---------- Prepare DataFrame for Snowflake ----------
+    # Drop the working text columns instead of copying the output columns into a new frame
+    return df.drop(columns=["text", "clean_text"])
+
+# ---------- Write Predictions Back to Snowflake ----------
+def create_swap_table(conn):
+    conn.cursor().execute(f"CREATE OR REPLACE TABLE {SWAP_TABLE} LIKE {TARGET_TABLE}")
+
+def write_predictions(conn, df_pred, table=SWAP_TABLE):
+    from snowflake.connector.pandas_tools import write_pandas
+    with metrics.span("snowflake_write", table=table):
+        success, nchunks, nrows, _ = write_pandas(
+            conn,
+            df_pred,
+            table,
+            quote_identifiers=False  # ensures exact column names are preserved
+        )
+    if not success:
+        raise RuntimeError(f"write_pandas into {table} failed")
+    return nrows
+
+def publish_swap_table(conn):
+    # Readers see either the previous predictions or the complete new set, never a partial table
+    cursor = conn.cursor()
+    cursor.execute(f"ALTER TABLE {SWAP_TABLE} SWAP WITH {TARGET_TABLE}")
+    cursor.execute(f"DROP TABLE IF EXISTS {SWAP_TABLE}")
+    print(f"✅ {TARGET_TABLE} replaced with the new predictions")
 
 # ---------- Example Predictions ----------
-examples = [
-    "The company achieved record profits this quarter.",
-    "The company did not achieve record profits this quarter.",
-    "Neutral update with no major impact."
-]
-
-example_results = sentiment_model(examples, truncation=True, batch_size=8)
-print("\nExample Predictions:")
-for text, r in zip(examples, example_results):
-    print(f"Input: {text}")
-    print(f"Predicted Sentiment: {r['label']} (Confidence: {r['score']:.2f})")
-
-print("\n🎯 Full RSS Sentiment Analysis Completed with Snowflake Write-Back (CPU-safe, chunked)!")
+def print_examples(sentiment_model):
+    examples = [
+        "The company achieved record profits this quarter.",
+        "The company did not achieve record profits this quarter.",
+        "Neutral update with no major impact."
+    ]
+
+    example_results = sentiment_model(examples, truncation=True, batch_size=8)
+    print("\nExample Predictions:")
+    for text, r in zip(examples, example_results):
+        print(f"Input: {text}")
+        print(f"Predicted Sentiment: {r['label']} (Confidence: {r['score']:.2f})")
+
+def run_job(conn, cache, sentiment_model=None):
+    """Predict and write FACT_RSS_PREDICTIONS on an open connection; returns (rows, sentiment_model)."""
+    create_swap_table(conn)
+    rows = 0
+    print("Predicting sentiments using DistilBERT (streamed chunks)...")
+    for df in stream_articles(conn):
+        df = prepare_text(df)
+        all_results, sentiment_model = predict(df["clean_text"].tolist(), cache, sentiment_model)
+        rows += write_predictions(conn, apply_predictions(df, all_results))
+    print(f"✅ {rows} predictions written to {SWAP_TABLE}")
+    publish_swap_table(conn)
+    return rows, sentiment_model
+
+def main():
+    metrics.init_from_env()
+    conn = connect_snowflake()
+    cache = PredictionCache(MODEL_ID)
+    sentiment_model = None
+    try:
+        rows, sentiment_model = run_job(conn, cache)
+    finally:
+        cache.close()
+        conn.close()
+
+    if sentiment_model is not None:
+        print_examples(sentiment_model)
+    print("\n🎯 Full RSS Sentiment Analysis Completed with Snowflake Write-Back (CPU-safe, chunked)!")
+
+if __name__ == "__main__":
+    main()
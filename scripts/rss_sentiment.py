@@ -1,85 +1,175 @@
-import pandas as pd
-from textblob import TextBlob
-import snowflake.connector
-from snowflake.connector.pandas_tools import write_pandas
-from cryptography.hazmat.primitives import serialization
+import sys
+import time
+import argparse
+from sentiment_engine import SentimentEngine, label_scores
+from snowflake_batches import stream_query
+import metrics
+
+TARGET_TABLE = "FACT_RSS_SENTIMENT"
+DELTA_TABLE = "FACT_RSS_SENTIMENT_DELTA"   # session-scoped temp table holding the newly scored rows
+READ_CHUNK_ROWS = 20_000                   # rows scored and merged per chunk (bounds peak memory)
+
+ROWS_SCORED = metrics.counter("inference_rows_total", "Rows scored, by model")
+ROWS_PER_SECOND = metrics.histogram("inference_rows_per_second", "Scoring throughput per chunk",
+                                    buckets=metrics.RATE_BUCKETS)
 
 # -------------------------------
 # 1. Load private key for Snowflake
 # -------------------------------
-key_path = r"rsa_key.p8"
-with open(key_path, "rb") as key_file:
-    private_key = serialization.load_pem_private_key(
-        key_file.read(),
-        password=None  # use b"your_passphrase" if key is encrypted
-    )
+# The Snowflake client and cryptography are imported where they are used, so score_sentiment
+# (and bench_pipeline.py) work without snowflake-connector-python installed
+def load_private_key(key_path=r"rsa_key.p8"):
+    from cryptography.hazmat.primitives import serialization
+    with open(key_path, "rb") as key_file:
+        return serialization.load_pem_private_key(
+            key_file.read(),
+            password=None  # use b"your_passphrase" if key is encrypted
+        )
 
 # -------------------------------
 # 2. Connect to Snowflake
 # -------------------------------
-conn = snowflake.connector.connect(
-    user="Username",
-    account="Snowflake Account Name",
-    private_key=private_key,
-    authenticator="snowflake_jwt",
-    warehouse="RSS_WH",
-    database="RSS_DB",
-    schema="RSS_SCH",
-    client_session_keep_alive=True,
-    insecure_mode=True  # temporary to bypass OCSP issues
-)
+def connect_snowflake():
+    import snowflake.connector
+    return snowflake.connector.connect(
+        user="Username",
+        account="Snowflake Account Name",
+        private_key=load_private_key(),
+        authenticator="snowflake_jwt",
+        warehouse="RSS_WH",
+        database="RSS_DB",
+        schema="RSS_SCH",
+        client_session_keep_alive=True,
+        insecure_mode=True  # temporary to bypass OCSP issues
+    )
 
 # -------------------------------
-# 3. Read base enriched table
+# 3. Stream enriched rows that are not scored yet
 # -------------------------------
-query = "SELECT * FROM fact_rss_enriched"
-df = pd.read_sql(query, conn)
+# Anti-join on EVENT_ID: only articles without a sentiment row are read and scored,
+# so the hourly cost follows the number of new articles instead of the whole history.
+INCREMENTAL_QUERY = f"""
+SELECT e.*
+FROM fact_rss_enriched e
+WHERE NOT EXISTS (
+    SELECT 1 FROM {TARGET_TABLE} s WHERE s.EVENT_ID = e.EVENT_ID
+)
+"""
+FULL_QUERY = "SELECT * FROM fact_rss_enriched"
 
-print("✅ Data loaded from Snowflake")
-print("Columns returned:", df.columns.tolist())
-print(df.head(3))
+def stream_unscored(conn, full_refresh=False, chunk_rows=READ_CHUNK_ROWS):
+    """Yield unscored rows as Arrow-backed chunks; the next chunk downloads while this one is scored."""
+    query = FULL_QUERY if full_refresh else INCREMENTAL_QUERY
+    return stream_query(conn, query, chunk_rows=chunk_rows)
 
 # -------------------------------
 # 4. Calculate sentiment
 # -------------------------------
-def sentiment_score(text):
-    if not isinstance(text, str):
-        return 0
-    return TextBlob(text).sentiment.polarity
-
-def sentiment_label(score):
-    if score > 0.1:
-        return "positive"
-    elif score < -0.1:
-        return "negative"
-    else:
-        return "neutral"
+def score_sentiment(df, engine=None):
+    # Handle case differences automatically
+    title_col = next((col for col in df.columns if col.lower() == "title"), None)
+    summary_col = next((col for col in df.columns if col.lower() == "summary"), None)
 
-# Handle case differences automatically
-title_col = next((col for col in df.columns if col.lower() == "title"), None)
-summary_col = next((col for col in df.columns if col.lower() == "summary"), None)
+    if not title_col or not summary_col:
+        raise KeyError("❌ Could not find 'title' or 'summary' columns in the dataframe.")
 
-if not title_col or not summary_col:
-    raise KeyError("❌ Could not find 'title' or 'summary' columns in the dataframe.")
+    own_engine = engine is None
+    engine = engine or SentimentEngine()
+    started = time.perf_counter()
+    try:
+        df['title_sentiment_score'] = engine.polarity(df[title_col].tolist())
+        df['summary_sentiment_score'] = engine.polarity(df[summary_col].tolist())
+    finally:
+        if own_engine:
+            engine.close()
+    df['title_sentiment_label'] = label_scores(df['title_sentiment_score'].to_numpy())
+    df['summary_sentiment_label'] = label_scores(df['summary_sentiment_score'].to_numpy())
 
-df['title_sentiment_score'] = df[title_col].apply(sentiment_score)
-df['summary_sentiment_score'] = df[summary_col].apply(sentiment_score)
-df['title_sentiment_label'] = df['title_sentiment_score'].apply(sentiment_label)
-df['summary_sentiment_label'] = df['summary_sentiment_score'].apply(sentiment_label)
+    ROWS_SCORED.inc(len(df), model="textblob")
+    ROWS_PER_SECOND.observe(len(df) / max(time.perf_counter() - started, 1e-9), model="textblob")
+    return df
 
-print("✅ Sentiment analysis complete")
+# -------------------------------
+# 5. Merge results into Snowflake
+# -------------------------------
+def ensure_target_columns(conn):
+    # "scored_at" records when a row was scored; the sentiment marts use it to find new rows
+    conn.cursor().execute(
+        f'ALTER TABLE {TARGET_TABLE} ADD COLUMN IF NOT EXISTS "scored_at" TIMESTAMP_LTZ(9)'
+    )
+
+def prepare_target(conn, full_refresh=False):
+    ensure_target_columns(conn)
+    if full_refresh:
+        print(f"Truncating {TARGET_TABLE} before a full rescore...")
+        conn.cursor().execute(f"TRUNCATE TABLE {TARGET_TABLE}")
+
+def write_results(conn, df):
+    from snowflake.connector.pandas_tools import write_pandas
+    with metrics.span("snowflake_write", table=TARGET_TABLE):
+        success, nchunks, nrows, _ = write_pandas(
+            conn, df, DELTA_TABLE, schema='RSS_SCH',
+            auto_create_table=True, table_type="temporary", overwrite=True
+        )
+        if not success:
+            print("❌ Failed to stage scored rows in Snowflake")
+            return 0
+
+        # MERGE keeps the write idempotent: a rerun over the same delta inserts nothing twice
+        columns = ", ".join(f'"{col}"' for col in df.columns)
+        values = ", ".join(f'd."{col}"' for col in df.columns)
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            MERGE INTO {TARGET_TABLE} t
+            USING {DELTA_TABLE} d
+                ON t.EVENT_ID = d."EVENT_ID"
+            WHEN NOT MATCHED THEN
+                INSERT ({columns}, "scored_at")
+                VALUES ({values}, CURRENT_TIMESTAMP())
+        """)
+        return cursor.fetchone()[0]
 
 # -------------------------------
-# 5. Write results back to Snowflake
+# 6. Run
 # -------------------------------
-success, nchunks, nrows, _ = write_pandas(
-    conn, df, 'FACT_RSS_SENTIMENT', schema='RSS_SCH', overwrite=True
-)
+def run_job(conn, engine=None, full_refresh=False):
+    """
+    Score unscored rows on an open connection; returns the number of rows merged.
+
+    Rows are streamed in READ_CHUNK_ROWS chunks and each scored chunk is merged as soon as
+    it is done, so memory stays flat however many rows are pending.
+    """
+    own_engine = engine is None
+    engine = engine or SentimentEngine()
+    prepare_target(conn, full_refresh)
+    rows_read = merged = 0
+    try:
+        for chunk in stream_unscored(conn, full_refresh=full_refresh):
+            rows_read += len(chunk)
+            merged += write_results(conn, score_sentiment(chunk, engine))
+    finally:
+        if own_engine:
+            engine.close()
+    if rows_read == 0:
+        print("⚠️ No unscored rows found. Nothing to do.")
+    else:
+        print(f"✅ Scored {rows_read} rows, merged {merged} new rows into RSS_SCH.{TARGET_TABLE} "
+              f"({'full refresh' if full_refresh else 'incremental'}; memo hits: {engine.hits}, scored: {engine.misses})")
+    return merged
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TextBlob sentiment scoring for FACT_RSS_ENRICHED.")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="rescore every enriched row instead of only unscored ones")
+    args = parser.parse_args(argv)
 
-if success:
-    print(f"✅ Inserted {nrows} rows into RSS_SCH.FACT_RSS_SENTIMENT")
-else:
-    print("❌ Failed to write data to Snowflake")
+    metrics.init_from_env()
+    conn = connect_snowflake()
+    try:
+        run_job(conn, full_refresh=args.full_refresh)
+    finally:
+        conn.close()
+        print("✅ Connection closed")
 
-conn.close()
-print("✅ Connection closed")
+if __name__ == "__main__":
+    main(sys.argv[1:])
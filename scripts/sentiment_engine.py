@@ -0,0 +1,113 @@
+"""
+Parallel, memoized TextBlob scoring engine
+
+- Normalizes text (whitespace) and memoizes polarity by a hash of the normalized text,
+  so syndicated titles/summaries that repeat are scored once
+- Scores the remaining unique texts in chunks on a process pool (TextBlob is pure Python, so threads do not help)
+- Labels come from one vectorized NumPy threshold step instead of a row-wise apply
+"""
+
+import os
+import hashlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from textblob import TextBlob
+
+# -------------------------------
+# Engine Configuration
+# -------------------------------
+POSITIVE_THRESHOLD = 0.1
+NEGATIVE_THRESHOLD = -0.1
+DEFAULT_WORKERS = os.cpu_count() or 1
+CHUNK_SIZE = 256                  # texts per task sent to a worker process
+PARALLEL_MIN_TEXTS = 2000         # below this many cache misses a pool costs more than it saves
+MEMO_MAX_ENTRIES = 500_000        # polarity memo entries kept per engine (oldest evicted first)
+
+def normalize_text(text):
+    if not isinstance(text, str):
+        return ""
+    return " ".join(text.split())
+
+def text_key(normalized):
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+
+def _score_chunk(texts):
+    return [TextBlob(text).sentiment.polarity for text in texts]
+
+# -------------------------------
+# Vectorized labels
+# -------------------------------
+def label_scores(scores):
+    scores = np.asarray(scores, dtype=np.float64)
+    return np.select(
+        [scores > POSITIVE_THRESHOLD, scores < NEGATIVE_THRESHOLD],
+        ["positive", "negative"],
+        default="neutral"
+    )
+
+# -------------------------------
+# Scoring engine
+# -------------------------------
+class SentimentEngine:
+    def __init__(self, workers=DEFAULT_WORKERS, chunk_size=CHUNK_SIZE,
+                 parallel_min_texts=PARALLEL_MIN_TEXTS, memo_max_entries=MEMO_MAX_ENTRIES):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.parallel_min_texts = parallel_min_texts
+        self.memo_max_entries = memo_max_entries
+        self._memo = {}
+        self._pool = None
+        self.hits = 0
+        self.misses = 0
+
+    def _score_unique(self, texts):
+        if self.workers > 1 and len(texts) >= self.parallel_min_texts:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+            return [score for chunk in self._pool.map(_score_chunk, chunks) for score in chunk]
+        return _score_chunk(texts)
+
+    def _remember(self, key, score):
+        if len(self._memo) >= self.memo_max_entries:
+            # dicts keep insertion order, so this drops the oldest entry
+            self._memo.pop(next(iter(self._memo)))
+        self._memo[key] = score
+
+    def polarity(self, texts):
+        """Return TextBlob polarity for every item of `texts` as a float64 array (0.0 for non-text)."""
+        keys = []
+        scored = {}                       # this call's scores by key, so memo eviction cannot lose one
+        misses = {}
+        for text in texts:
+            normalized = normalize_text(text)
+            if not normalized:
+                keys.append(None)
+                continue
+            key = text_key(normalized)
+            keys.append(key)
+            if key in scored or key in misses:
+                continue
+            if key in self._memo:
+                scored[key] = self._memo[key]
+            else:
+                misses[key] = normalized
+
+        self.misses += len(misses)
+        self.hits += sum(1 for key in keys if key is not None) - len(misses)
+        if misses:
+            scored.update(zip(misses, self._score_unique(list(misses.values()))))
+
+        scores = np.zeros(len(keys), dtype=np.float64)
+        for i, key in enumerate(keys):
+            if key is not None:
+                scores[i] = scored[key]
+        # Only now store the new scores, evicting the oldest entries if the memo is full
+        for key in misses:
+            self._remember(key, scored[key])
+        return scores
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
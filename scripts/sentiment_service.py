@@ -0,0 +1,187 @@
+"""
+Resident sentiment inference worker
+
+Loads the TextBlob engine (with its process pool), the DistilBERT backend, the prediction
+cache and the Snowflake connection once, then serves scoring jobs over a local HTTP endpoint
+so the hourly scheduler no longer pays a Python + model + connection cold start per cycle.
+
+    POST /jobs/textblob     {"full_refresh": false}   -> rss_sentiment.run_job
+    POST /jobs/distilbert   {}                        -> rss_ml.run_job
+    POST /jobs/cascade      {"margin": 0.25}          -> rss_cascade.run_job (TextBlob triage + DistilBERT)
+    GET  /health                                       -> state and last job timings
+    GET  /metrics                                      -> Prometheus text (see metrics.py)
+
+Every job response reports its latency:
+    {"job": "textblob", "status": "ok", "rows": 42, "latency_seconds": 3.1}
+"""
+
+import os
+os.environ["CUDA_VISIBLE_DEVICES"] = ""  # Force CPU
+
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import rss_sentiment
+import rss_ml
+import rss_cascade
+from sentiment_engine import SentimentEngine
+from prediction_cache import PredictionCache
+import metrics
+
+# -----------------------------
+# Service Configuration
+# -----------------------------
+SERVICE_HOST = os.getenv("SENTIMENT_SERVICE_HOST", "127.0.0.1")   # local only
+SERVICE_PORT = int(os.getenv("SENTIMENT_SERVICE_PORT", "8765"))
+
+JOB_SECONDS = metrics.histogram("sentiment_job_seconds", "Sentiment job latency, by job and status")
+
+# -----------------------------
+# Warm state shared by all jobs
+# -----------------------------
+class InferenceWorker:
+    def __init__(self, preload_model=True):
+        self._lock = threading.Lock()     # one job at a time on the shared connection/models
+        self._conn = None
+        self.engine = SentimentEngine()
+        self.cache = PredictionCache(rss_ml.MODEL_ID)
+        self.sentiment_model = rss_ml.load_model() if preload_model else None
+        self.started_at = datetime.now()
+        self.jobs_run = 0
+        self.last_job = None
+
+    def _connection(self):
+        if self._conn is None or self._conn.is_closed():
+            print(f"[{datetime.now()}] 🔌 Opening Snowflake connection...")
+            self._conn = rss_sentiment.connect_snowflake()
+        return self._conn
+
+    def busy(self):
+        return self._lock.locked()
+
+    def run(self, job, params):
+        with self._lock:
+            started = time.perf_counter()
+            result = {"job": job, "started_at": datetime.now().isoformat()}
+            try:
+                conn = self._connection()
+                if job == "textblob":
+                    rows = rss_sentiment.run_job(conn, self.engine, bool(params.get("full_refresh")))
+                elif job == "distilbert":
+                    rows, self.sentiment_model = rss_ml.run_job(conn, self.cache, self.sentiment_model)
+                    self.cache.evict()
+                elif job == "cascade":
+                    margin = float(params.get("margin", rss_cascade.UNCERTAIN_MARGIN))
+                    rows, self.sentiment_model = rss_cascade.run_job(
+                        conn, self.engine, self.cache, self.sentiment_model, margin
+                    )
+                    self.cache.evict()
+                else:
+                    raise ValueError(f"unknown job '{job}'")
+                result.update(status="ok", rows=int(rows or 0))
+            except Exception as exc:
+                # Drop the connection so the next job starts on a fresh one
+                self.close_connection()
+                result.update(status="error", error=f"{type(exc).__name__}: {exc}")
+            result["latency_seconds"] = round(time.perf_counter() - started, 3)
+            JOB_SECONDS.observe(result["latency_seconds"], job=job, status=result["status"])
+            self.jobs_run += 1
+            self.last_job = result
+            print(f"[{datetime.now()}] {'✅' if result['status'] == 'ok' else '❌'} Job {job}: {result}")
+            return result
+
+    def health(self):
+        return {
+            "status": "busy" if self.busy() else "ok",
+            "started_at": self.started_at.isoformat(),
+            "model_loaded": self.sentiment_model is not None,
+            "jobs_run": self.jobs_run,
+            "last_job": self.last_job,
+            "textblob_memo": {"hits": self.engine.hits, "scored": self.engine.misses},
+            "prediction_cache": {"hits": self.cache.hits, "misses": self.cache.misses},
+        }
+
+    def close_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def close(self):
+        self.close_connection()
+        self.engine.close()
+        self.cache.close()
+
+# -----------------------------
+# HTTP endpoint
+# -----------------------------
+def make_handler(worker):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, worker.health())
+            elif self.path == "/metrics":
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self.path.startswith("/jobs/"):
+                self._send(404, {"error": "not found"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                params = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send(400, {"error": "invalid JSON body"})
+                return
+            result = worker.run(self.path[len("/jobs/"):], params)
+            self._send(200 if result["status"] == "ok" else 500, result)
+
+        def log_message(self, fmt, *args):
+            pass  # job results are already logged by the worker
+
+    return Handler
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resident sentiment inference worker.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--lazy-model", action="store_true",
+                        help="load DistilBERT on the first job that needs it instead of at startup")
+    args = parser.parse_args(argv)
+
+    metrics.init_from_env()
+    worker = InferenceWorker(preload_model=not args.lazy_model)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(worker))
+    print(f"[{datetime.now()}] 🧠 Sentiment service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(" [*] Sentiment service stopped by user.")
+    finally:
+        server.server_close()
+        worker.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
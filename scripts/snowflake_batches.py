@@ -0,0 +1,98 @@
+"""
+Streaming Snowflake reads as fixed-size pandas chunks
+
+- Uses the connector's Arrow result batches (cursor.fetch_pandas_batches) instead of pd.read_sql,
+  so rows arrive as columnar batches and the full result is never held in memory at once
+- Batches are re-chunked to CHUNK_ROWS rows, so downstream scoring/writes see a steady chunk size
+- A background thread keeps up to PREFETCH_CHUNKS chunks ready, so downloading the next batches
+  overlaps with scoring the current one while peak memory stays bounded
+"""
+
+import queue
+import threading
+import time
+import pandas as pd
+import metrics
+
+# -----------------------------
+# Reader Configuration
+# -----------------------------
+CHUNK_ROWS = 10_000               # rows per chunk handed to the caller
+PREFETCH_CHUNKS = 2               # chunks read ahead while the caller works
+
+_DONE = object()
+
+READ_SECONDS = metrics.histogram("snowflake_read_seconds", "Wait for the next Arrow result batch")
+ROWS_READ = metrics.counter("snowflake_rows_read_total", "Rows streamed from Snowflake")
+
+def rechunk(frames, chunk_rows=CHUNK_ROWS):
+    """Regroup an iterable of DataFrames into DataFrames of exactly chunk_rows rows (last one may be short)."""
+    buffer, buffered = [], 0
+    for frame in frames:
+        if frame.empty:
+            continue
+        buffer.append(frame)
+        buffered += len(frame)
+        while buffered >= chunk_rows:
+            combined = pd.concat(buffer, ignore_index=True) if len(buffer) > 1 else buffer[0]
+            yield combined.iloc[:chunk_rows].reset_index(drop=True)
+            rest = combined.iloc[chunk_rows:]
+            buffer, buffered = ([rest], len(rest)) if len(rest) else ([], 0)
+    if buffered:
+        yield pd.concat(buffer, ignore_index=True) if len(buffer) > 1 else buffer[0].reset_index(drop=True)
+
+def _prefetch(iterator, depth):
+    chunks = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def reader():
+        try:
+            for chunk in iterator:
+                while not stop.is_set():
+                    try:
+                        chunks.put(chunk, timeout=1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            chunks.put(_DONE)
+        except BaseException as exc:        # re-raised in the consuming thread
+            chunks.put(exc)
+
+    thread = threading.Thread(target=reader, name="snowflake-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def stream_query(conn, query, chunk_rows=CHUNK_ROWS, prefetch=PREFETCH_CHUNKS, lowercase=False):
+    """Execute `query` and yield its result as DataFrames of chunk_rows rows."""
+    cursor = conn.cursor()
+    cursor.execute(query)
+
+    def frames():
+        try:
+            batches = cursor.fetch_pandas_batches()
+            while True:
+                started = time.perf_counter()
+                frame = next(batches, None)
+                if frame is None:
+                    return
+                READ_SECONDS.observe(time.perf_counter() - started)
+                ROWS_READ.inc(len(frame))
+                if lowercase:
+                    frame.columns = [c.lower() for c in frame.columns]
+                yield frame
+        finally:
+            cursor.close()
+
+    chunks = rechunk(frames(), chunk_rows)
+    return _prefetch(chunks, prefetch) if prefetch else chunks
@@ -0,0 +1,51 @@
+"""
+Source-partitioned RSS stream (super-stream layout) shared by mq_producer.py and mq_consumer.py
+
+- STREAM_PARTITIONS > 0 splits the stream into <name>-0 .. <name>-(N-1) stream queues bound to a
+  direct exchange <name> with routing keys "0" .. "N-1", the layout `rabbitmq-streams add_super_stream`
+  creates, so the partitions can also be read by stream-protocol clients
+- partition_for(source) is a stable hash (CRC32) of the feed source, so all items of one source land
+  in one partition and keep their order; Python's hash() is salted per process and cannot be used
+- STREAM_PARTITIONS = 0 keeps the single RSS_FEED_QUEUE stream
+"""
+
+import os
+import zlib
+
+# -----------------------------
+# Partitioning Configuration
+# -----------------------------
+STREAM_PARTITIONS = int(os.getenv("STREAM_PARTITIONS", "0"))
+STREAM_ARGUMENTS = {"x-queue-type": "stream"}
+
+def partition_for(source, partitions=STREAM_PARTITIONS):
+    return zlib.crc32((source or "").encode("utf-8")) % partitions
+
+def partition_queue(name, partition):
+    return f"{name}-{partition}"
+
+def declare_partitions(channel, name, partitions=STREAM_PARTITIONS):
+    """Declare the exchange, partition streams and bindings on a BlockingConnection channel (idempotent)."""
+    channel.exchange_declare(exchange=name, exchange_type="direct", durable=True)
+    for partition in range(partitions):
+        queue = partition_queue(name, partition)
+        channel.queue_declare(queue=queue, durable=True, arguments=STREAM_ARGUMENTS)
+        channel.queue_bind(queue=queue, exchange=name, routing_key=str(partition))
+
+def declare_partitions_async(channel, name, partitions, on_done):
+    """Same as declare_partitions for a SelectConnection channel; calls on_done() when finished."""
+    steps = [lambda cb: channel.exchange_declare(exchange=name, exchange_type="direct", durable=True, callback=cb)]
+    for partition in range(partitions):
+        queue = partition_queue(name, partition)
+        steps.append(lambda cb, q=queue: channel.queue_declare(
+            queue=q, durable=True, arguments=STREAM_ARGUMENTS, callback=cb))
+        steps.append(lambda cb, q=queue, key=str(partition): channel.queue_bind(
+            queue=q, exchange=name, routing_key=key, callback=cb))
+
+    def run(index):
+        if index == len(steps):
+            on_done()
+        else:
+            steps[index](lambda frame: run(index + 1))
+
+    run(0)
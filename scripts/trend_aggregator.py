@@ -0,0 +1,248 @@
+"""
+In-process sliding-window sentiment trends, fed from the mq_consumer.py callback
+
+- Fixed ring of time buckets (BUCKET_SECONDS each, NUM_BUCKETS deep) x source slots, held in NumPy
+  arrays: article counts per sentiment label and a polarity sum, so memory is bounded up front
+- A ring slot is reused lazily: the absolute bucket number stored next to it tells whether it still
+  belongs to the current window, so nothing has to sweep expired buckets
+- Titles are scored with the memoized TextBlob engine (same thresholds as FACT_RSS_SENTIMENT)
+- Snapshots are served over a small local HTTP API, without any warehouse query:
+    GET /trends?window=3600                  -> per-source totals for the last hour
+    GET /trends/timeline?window=3600&source= -> per-bucket totals (all sources or one)
+    GET /terms?limit=20                      -> top and trending terms (when trending_terms.py is attached)
+    GET /health
+- State is checkpointed to disk together with the last stream offset it includes, so a restarted
+  consumer that re-reads messages after its durable offset does not count them twice
+"""
+
+import os
+import json
+import time
+import threading
+import numpy as np
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from sentiment_engine import SentimentEngine, POSITIVE_THRESHOLD, NEGATIVE_THRESHOLD
+
+# -----------------------------
+# Aggregator Configuration
+# -----------------------------
+BUCKET_SECONDS = 60                # width of one time bucket
+NUM_BUCKETS = 24 * 60              # ring depth: 24 hours of one-minute buckets
+MAX_SOURCES = 256                  # source slots; later sources share the last ("other") slot
+OTHER_SOURCE = "__other__"
+LABELS = ("negative", "neutral", "positive")
+DEFAULT_WINDOW = 60 * 60           # snapshot window when the request does not give one
+TRENDS_CHECKPOINT_FILE = "trend_aggregator_state.npz"
+TRENDS_HOST = os.getenv("TRENDS_HOST", "127.0.0.1")   # local only
+TRENDS_PORT = int(os.getenv("TRENDS_PORT", "8766"))
+
+def bucket_start(bucket, bucket_seconds=BUCKET_SECONDS):
+    return datetime.fromtimestamp(bucket * bucket_seconds, tz=timezone.utc).isoformat()
+
+# -----------------------------
+# Ring-buffer aggregator
+# -----------------------------
+class TrendAggregator:
+    def __init__(self, bucket_seconds=BUCKET_SECONDS, num_buckets=NUM_BUCKETS,
+                 max_sources=MAX_SOURCES, engine=None):
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = num_buckets
+        self.max_sources = max_sources
+        self.engine = engine or SentimentEngine(workers=1)   # one title at a time, memo only
+        self._lock = threading.Lock()                         # callback thread vs API threads
+        self.bucket_ids = np.full(num_buckets, -1, dtype=np.int64)
+        self.counts = np.zeros((num_buckets, max_sources, len(LABELS)), dtype=np.int32)
+        self.polarity = np.zeros((num_buckets, max_sources), dtype=np.float64)
+        self.sources = {}
+        self.last_offset = None        # newest stream offset included in the arrays
+        self.late_dropped = 0          # events older than the whole ring
+        self.errors = 0
+
+    def _source_slot(self, source):
+        slot = self.sources.get(source)
+        if slot is None:
+            if len(self.sources) < self.max_sources - 1:
+                slot = len(self.sources)
+            else:
+                slot = self.max_sources - 1
+                source = OTHER_SOURCE
+            self.sources.setdefault(source, slot)
+        return slot
+
+    def _bucket_slot(self, bucket):
+        slot = bucket % self.num_buckets
+        if self.bucket_ids[slot] != bucket:
+            # Slot still holds an expired bucket: clear it before reuse
+            self.bucket_ids[slot] = bucket
+            self.counts[slot] = 0
+            self.polarity[slot] = 0.0
+        return slot
+
+    def update(self, entry, event_time=None, offset=None):
+        """Add one rss_entry; returns False when it was skipped (already counted or too old)."""
+        if offset is not None and self.last_offset is not None and offset <= self.last_offset:
+            return False
+        now_bucket = int(time.time() // self.bucket_seconds)
+        bucket = now_bucket if event_time is None else min(int(event_time // self.bucket_seconds), now_bucket)
+        score = float(self.engine.polarity([entry.get("title")])[0])
+        label = 2 if score > POSITIVE_THRESHOLD else 0 if score < NEGATIVE_THRESHOLD else 1
+
+        with self._lock:
+            if offset is not None:
+                self.last_offset = offset
+            if bucket <= now_bucket - self.num_buckets:
+                self.late_dropped += 1
+                return False
+            slot = self._bucket_slot(bucket)
+            source_slot = self._source_slot(entry.get("source") or "Unknown")
+            self.counts[slot, source_slot, label] += 1
+            self.polarity[slot, source_slot] += score
+        return True
+
+    def update_message(self, body, properties=None, offset=None):
+        # Never let a malformed message or scoring failure disturb the sink path
+        try:
+            entry = json.loads(body).get("rss_entry") or {}
+            if entry.get("near_duplicate_of"):
+                return False          # syndicated copy, already counted under the original
+            event_time = getattr(properties, "timestamp", None)
+            return self.update(entry, event_time, offset)
+        except Exception as exc:
+            self.errors += 1
+            print(f"⚠️ Trend aggregator skipped a message: {exc}")
+            return False
+
+    # -------- Snapshots --------
+    def _window_mask(self, window_seconds):
+        now_bucket = int(time.time() // self.bucket_seconds)
+        buckets = max(1, min(self.num_buckets, -(-int(window_seconds) // self.bucket_seconds)))
+        return (self.bucket_ids > now_bucket - buckets) & (self.bucket_ids <= now_bucket), buckets
+
+    def snapshot(self, window_seconds=DEFAULT_WINDOW):
+        with self._lock:
+            mask, buckets = self._window_mask(window_seconds)
+            counts = self.counts[mask].sum(axis=0, dtype=np.int64)
+            polarity = self.polarity[mask].sum(axis=0)
+            names = {slot: name for name, slot in self.sources.items()}
+
+        totals = counts.sum(axis=1)
+        sources = []
+        active = np.flatnonzero(totals)
+        for slot in active[np.argsort(-totals[active], kind="stable")]:
+            total = int(totals[slot])
+            row = {"source": names.get(int(slot), OTHER_SOURCE), "total": total}
+            for i, label in enumerate(LABELS):
+                row[label] = int(counts[slot, i])
+                row[f"{label}_pct"] = round(100.0 * int(counts[slot, i]) / total, 2)
+            row["mean_polarity"] = round(float(polarity[slot]) / total, 4)
+            sources.append(row)
+        overall = counts.sum(axis=0)
+        return {
+            "as_of": datetime.now(timezone.utc).isoformat(),
+            "window_seconds": buckets * self.bucket_seconds,
+            "total": int(overall.sum()),
+            **{label: int(overall[i]) for i, label in enumerate(LABELS)},
+            "sources": sources,
+        }
+
+    def timeline(self, window_seconds=DEFAULT_WINDOW, source=None):
+        with self._lock:
+            mask, buckets = self._window_mask(window_seconds)
+            slot = self.sources.get(source) if source else None
+            if source and slot is None:
+                return {"window_seconds": buckets * self.bucket_seconds, "source": source, "buckets": []}
+            ids = self.bucket_ids[mask]
+            counts = self.counts[mask] if slot is None else self.counts[mask][:, slot:slot + 1]
+            counts = counts.sum(axis=1, dtype=np.int64)
+
+        rows = []
+        for i in np.argsort(ids):
+            row = {"bucket_start": bucket_start(int(ids[i]), self.bucket_seconds), "total": int(counts[i].sum())}
+            row.update({label: int(counts[i, j]) for j, label in enumerate(LABELS)})
+            rows.append(row)
+        return {"window_seconds": buckets * self.bucket_seconds, "source": source, "buckets": rows}
+
+    # -------- Checkpointing --------
+    def save(self, path=TRENDS_CHECKPOINT_FILE):
+        with self._lock:
+            meta = {"bucket_seconds": self.bucket_seconds, "sources": self.sources,
+                    "last_offset": self.last_offset, "saved_at": datetime.now(timezone.utc).isoformat()}
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, bucket_ids=self.bucket_ids, counts=self.counts,
+                         polarity=self.polarity, meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+
+    def load(self, path=TRENDS_CHECKPOINT_FILE):
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as state:
+            meta = json.loads(str(state["meta"]))
+            if (meta["bucket_seconds"] != self.bucket_seconds
+                    or state["counts"].shape != self.counts.shape):
+                print("🔄 Trend checkpoint has a different ring layout, starting empty")
+                return False
+            with self._lock:
+                self.bucket_ids = state["bucket_ids"].copy()
+                self.counts = state["counts"].copy()
+                self.polarity = state["polarity"].copy()
+                self.sources = meta["sources"]
+                self.last_offset = meta["last_offset"]
+        print(f"📈 Restored trend state up to stream offset {self.last_offset}")
+        return True
+
+    def health(self):
+        return {"sources": len(self.sources), "last_offset": self.last_offset,
+                "late_dropped": self.late_dropped, "errors": self.errors,
+                "bucket_seconds": self.bucket_seconds, "num_buckets": self.num_buckets}
+
+# -----------------------------
+# Local HTTP API
+# -----------------------------
+def make_handler(aggregator, terms=None):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            try:
+                window = int(query.get("window", [DEFAULT_WINDOW])[0])
+            except ValueError:
+                self._send(400, {"error": "window must be an integer number of seconds"})
+                return
+            if url.path == "/trends":
+                self._send(200, aggregator.snapshot(window))
+            elif url.path == "/trends/timeline":
+                self._send(200, aggregator.timeline(window, query.get("source", [None])[0]))
+            elif url.path == "/terms" and terms is not None:
+                try:
+                    limit = int(query.get("limit", [20])[0])
+                except ValueError:
+                    self._send(400, {"error": "limit must be an integer"})
+                    return
+                self._send(200, terms.report(limit))
+            elif url.path == "/health":
+                self._send(200, aggregator.health())
+            else:
+                self._send(404, {"error": "not found"})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+def start_trend_server(aggregator, host=TRENDS_HOST, port=TRENDS_PORT, terms=None):
+    """Serve snapshots from a daemon thread; returns the server (call shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(aggregator, terms))
+    threading.Thread(target=server.serve_forever, name="trend-api", daemon=True).start()
+    print(f"📈 Trend API listening on http://{host}:{port}/trends")
+    return server
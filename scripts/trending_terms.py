@@ -0,0 +1,261 @@
+"""
+Memory-bounded trending-term detection over the RSS stream
+
+- Titles and summaries are tokenized inline (HTML stripped, stopwords dropped) into unigrams and bigrams
+- Per time window:
+    Count-Min Sketch   : fixed DEPTH x WIDTH counter table; one blake2b digest per term gives two 64-bit
+                         hashes and row i uses h1 + i*h2 (double hashing), so updates are one vectorized add
+    Space-Saving top-k : at most TOP_K monitored terms, the candidates that can be reported as trending
+- Baseline: when a window closes its sketch is folded into an EWMA sketch of the same shape
+  (the EWMA of counters is itself a valid sketch), so the baseline rate of any term costs no extra memory
+- A term is trending when its current-window count is far above its baseline scaled to the elapsed part
+  of the window (Poisson z-score), with a minimum count so rare terms do not flap
+- Memory is fixed by WIDTH, DEPTH and TOP_K however large the vocabulary grows
+"""
+
+import os
+import re
+import json
+import math
+import time
+import heapq
+import hashlib
+import threading
+import numpy as np
+from datetime import datetime, timezone
+
+# -----------------------------
+# Sketch Configuration
+# -----------------------------
+WINDOW_SECONDS = 60 * 60          # one trend window
+SKETCH_WIDTH = 1 << 16            # counters per Count-Min row
+SKETCH_DEPTH = 4                  # Count-Min rows (independent hashes)
+TOP_K = 2000                      # Space-Saving monitored terms per window
+BASELINE_ALPHA = 0.2              # EWMA weight of the window that just closed
+MIN_BASELINE_WINDOWS = 3          # closed windows needed before anything is flagged
+MIN_TREND_COUNT = 5               # current-window occurrences needed to be flagged
+Z_THRESHOLD = 4.0                 # Poisson z-score over the baseline to be flagged
+TERMS_CHECKPOINT_FILE = "trending_terms_state.npz"
+
+# -----------------------------
+# Tokenizer
+# -----------------------------
+TAG_RE = re.compile(r"<[^>]+>")
+URL_RE = re.compile(r"http\S+|www\.\S+")
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[.-][a-z0-9+#]+)*")
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers him his how i if in into is it its itself just me more most my new no nor not now of off
+on once only or other our ours out over own same she should so some such than that the their theirs them
+then there these they this those through to too under until up very via was we were what when where which
+while who whom why will with would you your yours says said read continue reading post appeared first
+""".split())
+
+def tokenize(text):
+    if not isinstance(text, str) or not text:
+        return []
+    text = URL_RE.sub(" ", TAG_RE.sub(" ", text.lower()))
+    return [t for t in TOKEN_RE.findall(text) if len(t) > 1 and t not in STOPWORDS and not t.isdigit()]
+
+def extract_terms(text):
+    """Unigrams plus bigrams of adjacent kept tokens."""
+    tokens = tokenize(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+def term_hashes(terms):
+    digests = [hashlib.blake2b(term.encode("utf-8"), digest_size=16).digest() for term in terms]
+    h1 = np.fromiter((int.from_bytes(d[:8], "little") for d in digests), dtype=np.uint64, count=len(terms))
+    h2 = np.fromiter((int.from_bytes(d[8:], "little") | 1 for d in digests), dtype=np.uint64, count=len(terms))
+    return h1, h2
+
+# -----------------------------
+# Count-Min Sketch
+# -----------------------------
+class CountMinSketch:
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, dtype=np.int32):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=dtype)
+        self._rows = np.arange(depth, dtype=np.uint64)[:, None]
+
+    def _columns(self, h1, h2):
+        # uint64 arithmetic wraps on overflow, which is what double hashing wants
+        return ((h1[None, :] + self._rows * h2[None, :]) % np.uint64(self.width)).astype(np.intp)
+
+    def add_hashed(self, h1, h2, count=1):
+        columns = self._columns(h1, h2)
+        rows = np.broadcast_to(np.arange(self.depth)[:, None], columns.shape)
+        np.add.at(self.table, (rows, columns), count)
+
+    def estimate_hashed(self, h1, h2):
+        columns = self._columns(h1, h2)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def estimate(self, terms):
+        return self.estimate_hashed(*term_hashes(terms))
+
+# -----------------------------
+# Space-Saving top-k
+# -----------------------------
+class SpaceSaving:
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.counts = {}              # term -> [count, overestimation error]
+        self._heap = []               # (count, term), lazily invalidated
+
+    def add(self, term, count=1):
+        entry = self.counts.get(term)
+        if entry is not None:
+            entry[0] += count
+        elif len(self.counts) < self.k:
+            entry = self.counts[term] = [count, 0]
+        else:
+            # Replace the current minimum; the newcomer inherits its count as error bound
+            while True:
+                low, victim = heapq.heappop(self._heap)
+                victim_entry = self.counts.get(victim)
+                if victim_entry is not None and victim_entry[0] == low:
+                    break
+            del self.counts[victim]
+            entry = self.counts[term] = [low + count, low]
+        heapq.heappush(self._heap, (entry[0], term))
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(c, t) for t, (c, _) in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def top(self, n=None):
+        items = sorted(self.counts.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(term, count, error) for term, (count, error) in items[:n]]
+
+# -----------------------------
+# Windowed trending-term detector
+# -----------------------------
+class TrendingTerms:
+    def __init__(self, window_seconds=WINDOW_SECONDS, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, top_k=TOP_K):
+        self.window_seconds = window_seconds
+        self.top_k = top_k
+        self._lock = threading.Lock()
+        self.current = CountMinSketch(width, depth)
+        self.baseline = CountMinSketch(width, depth, dtype=np.float32)
+        self.candidates = SpaceSaving(top_k)
+        self.window_start = self._window_of(time.time())
+        self.windows_closed = 0
+        self.last_offset = None
+        self.last_closed = None       # report of the previous window, kept for the API
+
+    def _window_of(self, now):
+        return int(now // self.window_seconds) * self.window_seconds
+
+    def _roll(self, now):
+        start = self._window_of(now)
+        if start == self.window_start:
+            return
+        self.last_closed = self._report(20, self.window_seconds)
+        missed = (start - self.window_start) // self.window_seconds - 1
+        table = self.baseline.table
+        table *= (1.0 - BASELINE_ALPHA)
+        table += BASELINE_ALPHA * self.current.table
+        if missed > 0:
+            # Empty windows in between decay the baseline as if they had been counted
+            table *= (1.0 - BASELINE_ALPHA) ** min(missed, 1000)
+        self.windows_closed += 1 + max(missed, 0)
+        self.current.table[:] = 0
+        self.candidates = SpaceSaving(self.top_k)
+        self.window_start = start
+
+    def update_text(self, texts, offset=None, now=None):
+        """Count the terms of one article (title, summary, ...); returns how many terms were added."""
+        if offset is not None and self.last_offset is not None and offset <= self.last_offset:
+            return 0
+        terms = [term for text in texts for term in extract_terms(text)]
+        with self._lock:
+            self._roll(time.time() if now is None else now)
+            if offset is not None:
+                self.last_offset = offset
+            if not terms:
+                return 0
+            self.current.add_hashed(*term_hashes(terms))
+            for term in terms:
+                self.candidates.add(term)
+        return len(terms)
+
+    def update_message(self, body, offset=None):
+        try:
+            entry = json.loads(body).get("rss_entry") or {}
+            if entry.get("near_duplicate_of"):
+                return 0
+            return self.update_text([entry.get("title"), entry.get("summary")], offset)
+        except Exception as exc:
+            print(f"⚠️ Trending terms skipped a message: {exc}")
+            return 0
+
+    # -------- Reporting --------
+    def _report(self, limit, elapsed):
+        top = self.candidates.top()
+        warming_up = self.windows_closed < MIN_BASELINE_WINDOWS
+        trending = []
+        if top:
+            terms = [term for term, _, _ in top]
+            h1, h2 = term_hashes(terms)
+            current = self.current.estimate_hashed(h1, h2)
+            baseline = self.baseline.estimate_hashed(h1, h2)
+            expected = baseline.astype(np.float64) * min(1.0, elapsed / self.window_seconds)
+            for i, (term, count, error) in enumerate(top):
+                # Both structures overestimate; the smaller one is the tighter bound
+                observed = int(min(count, current[i]))
+                z = (observed - expected[i]) / math.sqrt(expected[i] + 1.0)
+                if not warming_up and observed >= MIN_TREND_COUNT and z >= Z_THRESHOLD:
+                    trending.append({"term": term, "count": observed, "expected": round(float(expected[i]), 2),
+                                     "z_score": round(float(z), 2),
+                                     "ratio": round((observed + 1.0) / (float(expected[i]) + 1.0), 2)})
+        trending.sort(key=lambda row: row["z_score"], reverse=True)
+        return {
+            "window_start": datetime.fromtimestamp(self.window_start, tz=timezone.utc).isoformat(),
+            "window_seconds": self.window_seconds,
+            "elapsed_seconds": round(elapsed, 1),
+            "warming_up": warming_up,
+            "top": [{"term": t, "count": c, "max_error": e} for t, c, e in top[:limit]],
+            "trending": trending[:limit],
+        }
+
+    def report(self, limit=20):
+        with self._lock:
+            self._roll(time.time())
+            live = self._report(limit, max(1.0, time.time() - self.window_start))
+            live["previous_window"] = self.last_closed
+            return live
+
+    # -------- Checkpointing --------
+    def save(self, path=TERMS_CHECKPOINT_FILE):
+        with self._lock:
+            meta = {"window_seconds": self.window_seconds, "window_start": self.window_start,
+                    "windows_closed": self.windows_closed, "last_offset": self.last_offset,
+                    "candidates": self.candidates.counts}
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, current=self.current.table, baseline=self.baseline.table,
+                         meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+
+    def load(self, path=TERMS_CHECKPOINT_FILE):
+        if not os.path.exists(path):
+            return False
+        with np.load(path) as state:
+            meta = json.loads(str(state["meta"]))
+            if (meta["window_seconds"] != self.window_seconds
+                    or state["current"].shape != self.current.table.shape):
+                print("🔄 Trending-terms checkpoint has a different sketch layout, starting empty")
+                return False
+            with self._lock:
+                self.current.table[:] = state["current"]
+                self.baseline.table[:] = state["baseline"]
+                self.window_start = meta["window_start"]
+                self.windows_closed = meta["windows_closed"]
+                self.last_offset = meta["last_offset"]
+                for term, (count, error) in meta["candidates"].items():
+                    self.candidates.counts[term] = [count, error]
+                self.candidates._heap = [(c, t) for t, (c, _) in self.candidates.counts.items()]
+                heapq.heapify(self.candidates._heap)
+        print(f"🔤 Restored trending-terms state up to stream offset {self.last_offset}")
+        return True
@@ -0,0 +1,55 @@
+import os
+import gzip
+import json
+from datetime import date
+
+import pyarrow.parquet as pq
+from batch_sink import LocalDirBackend
+from backfill import run_backfill, OUTPUT_FILE
+
+def write_raw(root, day, stamp, links):
+    folder = os.path.join(root, "raw_rss_feed", day)
+    os.makedirs(folder, exist_ok=True)
+    with gzip.open(os.path.join(folder, f"rss_batch_{stamp}_part1.ndjson.gz"), "wt", encoding="utf-8") as f:
+        for i, link in enumerate(links):
+            entry = {"title": f"{link} is good news", "summary": "<p>fine</p>", "link": link, "source": "Test"}
+            f.write(json.dumps({"msg_id": str(i), "rss_entry": entry}) + "\n")
+
+def partitions(output):
+    result = {}
+    for name in sorted(os.listdir(output)):
+        table = pq.read_table(os.path.join(output, name, OUTPUT_FILE))
+        result[name] = sorted(table["link"].to_pylist())
+    return result
+
+def backfill(root, output, start, end):
+    return run_backfill(LocalDirBackend(root), date.fromisoformat(start), date.fromisoformat(end), output, workers=1)
+
+def test_one_run_keeps_latest_load(tmp_path):
+    root, output = str(tmp_path / "bucket"), str(tmp_path / "out")
+    write_raw(root, "2025-01-01", "20250101T100000", ["a", "b"])
+    write_raw(root, "2025-01-02", "20250102T100000", ["b", "c"])
+    stats = backfill(root, output, "2025-01-01", "2025-01-02")
+    assert partitions(output) == {"load_date=2025-01-01": ["a"], "load_date=2025-01-02": ["b", "c"]}
+    assert (stats["files"], stats["rows_in"], stats["rows_out"]) == (2, 4, 3)
+
+def test_separate_runs_dedupe_against_output(tmp_path):
+    root, output = str(tmp_path / "bucket"), str(tmp_path / "out")
+    write_raw(root, "2025-01-01", "20250101T100000", ["a", "b"])
+    write_raw(root, "2025-01-02", "20250102T100000", ["b", "c"])
+    backfill(root, output, "2025-01-01", "2025-01-01")
+    stats = backfill(root, output, "2025-01-02", "2025-01-02")
+    assert partitions(output) == {"load_date=2025-01-01": ["a"], "load_date=2025-01-02": ["b", "c"]}
+    assert stats["rows_superseded"] == 1
+    # Rerunning the older day alone skips links that already have a newer load
+    backfill(root, output, "2025-01-01", "2025-01-01")
+    assert partitions(output) == {"load_date=2025-01-01": ["a"], "load_date=2025-01-02": ["b", "c"]}
+
+def test_day_without_rows_clears_its_partition(tmp_path):
+    root, output = str(tmp_path / "bucket"), str(tmp_path / "out")
+    write_raw(root, "2025-01-01", "20250101T100000", ["b"])
+    backfill(root, output, "2025-01-01", "2025-01-01")
+    assert partitions(output) == {"load_date=2025-01-01": ["b"]}
+    write_raw(root, "2025-01-02", "20250102T100000", ["b"])
+    backfill(root, output, "2025-01-01", "2025-01-02")
+    assert partitions(output) == {"load_date=2025-01-02": ["b"]}
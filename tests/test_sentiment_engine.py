@@ -0,0 +1,21 @@
+import numpy as np
+from textblob import TextBlob
+from sentiment_engine import SentimentEngine
+
+def blob_polarity(texts):
+    return np.array([TextBlob(text).sentiment.polarity for text in texts])
+
+def test_polarity_matches_textblob():
+    engine = SentimentEngine(workers=1)
+    texts = ["good day", "bad   day", None, "", "good day"]
+    scores = engine.polarity(texts)
+    assert np.allclose(scores, [*blob_polarity(["good day", "bad day"]), 0.0, 0.0, blob_polarity(["good day"])[0]])
+    assert (engine.hits, engine.misses) == (1, 2)
+
+def test_polarity_with_full_memo_keeps_earlier_hits():
+    # "good day" is a hit, then evicted while the two new texts are stored
+    engine = SentimentEngine(workers=1, memo_max_entries=2)
+    engine.polarity(["good day", "bad day"])
+    texts = ["good day", "awful thing", "nice thing"]
+    assert np.allclose(engine.polarity(texts), blob_polarity(texts))
+    assert len(engine._memo) == 2